@@ -0,0 +1,213 @@
+import configparser
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
+CACHE_MAX_AGE_DAYS = 30
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+PRUNE_EVERY = 200  # Stored responses between two prunes of the cache directory
+
+
+class APIHandler:
+    def __init__(self, cache_dir='response_cache', timeout=30,
+                 max_age_days=CACHE_MAX_AGE_DAYS, max_bytes=CACHE_MAX_BYTES):
+        """Initialize the handler with keep-alive sessions and a bounded on-disk response cache.
+
+        Cached responses unused for max_age_days are deleted, and the least
+        recently used ones go first once the cache exceeds max_bytes (None
+        disables either bound).
+        """
+        self.cache_dir = os.path.join(os.path.dirname(__file__), cache_dir)
+        self.timeout = timeout
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        # requests.Session is not thread-safe, so each fetch thread keeps its own (and its own connections)
+        self.local = threading.local()
+        self.sessions = []
+        self.lock = threading.Lock()
+        self.stores = 0  # Responses stored since the last prune
+        self.stats = {'requests': 0, 'not_modified': 0, 'bytes': 0, 'pruned': 0}
+        self.prune()
+
+    @classmethod
+    def from_config(cls, path=DEFAULT_CONFIG, section='api'):
+        """Read the response cache bounds from the [api] section of config.ini."""
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        if not parser.has_section(section):
+            return cls()
+        options = parser[section]
+        max_age = options.get('cache_max_age_days', str(CACHE_MAX_AGE_DAYS)).strip()
+        max_mb = options.get('cache_max_mb', str(CACHE_MAX_BYTES // (1024 * 1024))).strip()
+        return cls(max_age_days=float(max_age) if max_age else None,
+                   max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else None)
+
+    @property
+    def session(self):
+        """Return the calling thread's keep-alive session, creating it on first use."""
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.headers.update({
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive',
+            })
+            with self.lock:
+                self.sessions.append(session)
+        return session
+
+    def cache_path(self, cache_key):
+        """Return the cache file path for a key (any JSON-serializable value)."""
+        digest = hashlib.sha1(json.dumps(cache_key, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def load_cached(self, cache_key):
+        """Return the cached response entry for a key, or None."""
+        path = self.cache_path(cache_key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def store_cached(self, cache_key, entry):
+        """Write a response entry to the cache atomically, pruning the cache every PRUNE_EVERY stores."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.cache_path(cache_key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.stores += 1
+            due = self.stores >= PRUNE_EVERY
+            if due:
+                self.stores = 0
+        if due:
+            self.prune()
+
+    def prune(self, now=None):
+        """Delete cached responses unused for max_age_days, then the least recently used beyond max_bytes.
+
+        A file's modification time is when it was last stored or revalidated.
+        Returns the number of files deleted.
+        """
+        if not os.path.isdir(self.cache_dir) or (self.max_age_days is None and self.max_bytes is None):
+            return 0
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # Replaced or removed by another thread meanwhile
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()  # Least recently used first
+
+        expired = 0
+        if self.max_age_days is not None:
+            cutoff = (now or time.time()) - self.max_age_days * 86400
+            while expired < len(entries) and entries[expired][0] < cutoff:
+                expired += 1
+        doomed = entries[:expired]
+        kept = entries[expired:]
+        if self.max_bytes is not None:
+            total = sum(size for _, size, _ in kept)
+            over = 0
+            while total > self.max_bytes and over < len(kept):
+                total -= kept[over][1]
+                over += 1
+            doomed += kept[:over]
+
+        removed = 0
+        for _, _, path in doomed:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            with self.lock:
+                self.stats['pruned'] += removed
+            logger.debug("Pruned %d cached responses from %s", removed, self.cache_dir)
+        return removed
+
+    def request(self, method, url, cache_key=None, headers=None, **kwargs):
+        """Send a request and return the response body as text.
+
+        When cache_key is given, validators from the cached copy are sent as
+        If-None-Match/If-Modified-Since and a 304 answer is served from disk.
+        """
+        headers = dict(headers or {})
+        cached = self.load_cached(cache_key) if cache_key is not None else None
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += len(response.content)
+
+        if response.status_code == 304 and cached:
+            with self.lock:
+                self.stats['not_modified'] += 1
+            try:
+                os.utime(self.cache_path(cache_key))  # Still in use, so it is pruned last
+            except OSError:
+                pass
+            return cached['body']
+
+        response.raise_for_status()
+        if cache_key is not None:
+            self.store_cached(cache_key, {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+                'body': response.text,
+            })
+        return response.text
+
+    def post(self, url, data=None, cache_key=None, headers=None):
+        return self.request('POST', url, cache_key=cache_key, headers=headers, data=data)
+
+    def get(self, url, params=None, cache_key=None, headers=None):
+        return self.request('GET', url, cache_key=cache_key, headers=headers, params=params)
+
+    def clear_cache(self):
+        """Delete all cached responses."""
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def close(self):
+        """Close every thread's session."""
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.close()
+
+
+# Shared handler so every fetch reuses the same connection pool
+_shared_handler = None
+_shared_lock = threading.Lock()
+
+
+def get_api_handler():
+    """Return the process-wide APIHandler, creating it on first use."""
+    global _shared_handler
+    with _shared_lock:
+        if _shared_handler is None:
+            _shared_handler = APIHandler.from_config()
+        return _shared_handler
@@ -0,0 +1,126 @@
+import json
+from datetime import datetime
+
+import pandas as pd
+import pytz
+from investpy.utils import constant as cst
+from investpy.utils.extra import random_user_agent
+from lxml.html import fromstring
+
+from api.api_handler import get_api_handler
+from utils.countdown import fetch_utc_offset
+
+CALENDAR_URL = "https://www.investing.com/economic-calendar/Service/getCalendarFilteredData"
+
+
+def gmt_offset_name(seconds):
+    """Return a UTC offset in seconds in the "GMT +h:mm" form investpy uses."""
+    hour_diff, rest = divmod(abs(int(seconds)), 3600)
+    min_diff = rest // 60
+    if hour_diff == 0 and min_diff == 0:
+        return "GMT"
+    return "GMT " + ("+" if seconds > 0 else "-") + str(hour_diff) + ":" + ("00" if min_diff < 30 else "30")
+
+
+def local_time_zone():
+    """Return the local GMT offset now in the "GMT +h:mm" form investpy uses.
+
+    Release times are converted back with the same offset, see utils.countdown.fetch_utc_offset.
+    """
+    return gmt_offset_name(fetch_utc_offset())
+
+
+def parse_rows(html):
+    """Parse one page of calendar HTML into investpy-style record dicts."""
+    results = []
+    curr_date = None
+    for row in fromstring(html).xpath(".//tr"):
+        row_id = row.get("id")
+        if row_id is None:
+            # Day separator rows carry the date as a timestamp
+            day_cell = row.xpath("td")
+            if day_cell and day_cell[0].get("id", "").startswith("theDay"):
+                timestamp = int(day_cell[0].get("id").replace("theDay", ""))
+                curr_date = datetime.fromtimestamp(timestamp, tz=pytz.timezone("GMT")).strftime("%d/%m/%Y")
+            continue
+        if "eventRowId_" not in row_id:
+            continue
+
+        event_id = row_id.replace("eventRowId_", "")
+        record = {'id': event_id, 'date': curr_date, 'time': None, 'zone': None, 'currency': None,
+                  'importance': None, 'event': None, 'actual': None, 'forecast': None, 'previous': None}
+        for cell in row.xpath("td"):
+            css_class = cell.get("class") or ""
+            if "first left" in css_class:
+                record['time'] = cell.text_content()
+            elif "flagCur" in css_class:
+                flag = cell.xpath("span")
+                record['zone'] = flag[0].get("title").lower() if flag else None
+                record['currency'] = cell.text_content().strip() or None
+            elif "sentiment" in css_class:
+                rating = cell.get("data-img_key")
+                if rating is not None:
+                    record['importance'] = cst.IMPORTANCE_RATINGS[int(rating.replace("bull", ""))]
+            elif css_class == "left event":
+                record['event'] = cell.text_content().strip()
+            elif cell.get("id") == "eventActual_" + event_id:
+                record['actual'] = cell.text_content().strip() or None
+            elif cell.get("id") == "eventForecast_" + event_id:
+                record['forecast'] = cell.text_content().strip() or None
+            elif cell.get("id") == "eventPrevious_" + event_id:
+                record['previous'] = cell.text_content().strip() or None
+        results.append(record)
+    return results
+
+
+class InvestpyWrapper:
+    """Drop-in replacement for investpy.economic_calendar built on the shared APIHandler.
+
+    Requests reuse one keep-alive session, ask for gzip, and send ETag /
+    If-Modified-Since validators from the on-disk response cache, which is keyed
+    by query window and page.
+    """
+    def __init__(self, api_handler=None, url=CALENDAR_URL, time_zone=None):
+        self.api_handler = api_handler or get_api_handler()
+        self.url = url
+        self.time_zone = time_zone  # None: the local offset at the time of each request
+        # A fixed user agent keeps the session looking like one client between requests
+        self.headers = {
+            "User-Agent": random_user_agent(),
+            "X-Requested-With": "XMLHttpRequest",
+            "Accept": "text/html",
+        }
+
+    def economic_calendar(self, from_date, to_date):
+        """Fetch the calendar between two DD/MM/YYYY dates as a DataFrame like investpy's."""
+        start_date = datetime.strptime(from_date, "%d/%m/%Y")
+        end_date = datetime.strptime(to_date, "%d/%m/%Y")
+        if start_date >= end_date:
+            raise ValueError("to_date should be greater than from_date, both formatted as 'dd/mm/yyyy'.")
+
+        # Countdowns convert release times back with the offset in effect now, so a DST change applies to both
+        time_zone = self.time_zone or local_time_zone()
+        data = {
+            "dateFrom": start_date.strftime("%Y-%m-%d"),
+            "dateTo": end_date.strftime("%Y-%m-%d"),
+            "timeZone": cst.TIMEZONES[time_zone][0],
+            "timeFilter": cst.TIME_FILTERS["time_only"],
+            "currentTab": "custom",
+            "submitFilters": 1,
+            "limit_from": 0,
+        }
+
+        results = []
+        last_id = None
+        while True:
+            cache_key = ['economic_calendar', from_date, to_date, time_zone, data["limit_from"]]
+            body = self.api_handler.post(self.url, data=data, cache_key=cache_key, headers=self.headers)
+            page = parse_rows(json.loads(body)["data"])
+            # The service repeats the last page once there is nothing more to load
+            if not page or page[-1]['id'] == last_id:
+                break
+            results.extend(page)
+            last_id = page[-1]['id']
+            data["limit_from"] += 1
+        return pd.DataFrame(results)
+
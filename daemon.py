@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import configparser
+import os
+import signal
+from utils.logger import setup_logging
+
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'config', 'config.ini')
+
+
+async def serve(host, port, fetch, logger):
+    """Run the ingestion daemon and its HTTP API until SIGINT/SIGTERM."""
+    from db.db_handler import open_store
+    from server.calendar_daemon import CalendarDaemon
+    from server.http_api import CalendarAPI
+    from utils.cache_handler import CacheHandler
+    from utils.cache_retention import RetentionPolicy
+    from utils.cache_snapshot import snapshot_enabled
+
+    loop = asyncio.get_running_loop()
+    cache_handler = CacheHandler(journaled=True, retention=RetentionPolicy.from_config(), snapshot=snapshot_enabled(),
+                                 store=open_store())
+    daemon = CalendarDaemon(cache_handler, fetch=fetch)
+    daemon.start(loop)
+    api = CalendarAPI(daemon, host, port)
+    await api.start()
+    print(f"Serving the economic calendar on http://{host}:{api.port} (Ctrl+C to stop)")
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))  # Windows
+    await stop.wait()
+
+    logger.info("Shutting down daemon")
+    await api.close()
+    await daemon.shutdown()
+
+
+def main():
+    # Headless entry point: no wx import anywhere on this path
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    options = config['daemon'] if config.has_section('daemon') else {}
+
+    parser = argparse.ArgumentParser(description="Bullion Bell headless calendar service")
+    parser.add_argument('--host', default=options.get('host', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(options.get('port', 8765)))
+    parser.add_argument('--no-fetch', action='store_true', help="serve the existing cache without fetching")
+    args = parser.parse_args()
+
+    logger = setup_logging('BullionBellDaemon.log')
+    logger.info("Starting daemon")
+    asyncio.run(serve(args.host, args.port, not args.no_fetch, logger))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,86 @@
-import investpy
+import logging
 import threading
 import wx
+from db.fetch_coordinator import get_fetch_coordinator
+from db.ingest_pipeline import get_ingest_pipeline
+from utils.event_table import EventTable
+from utils.logger import summarize
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
 
 # Define a custom event type for data fetching
 EVT_DATA_FETCHED = wx.NewEventType()
 EVT_DATA_FETCHED_BINDER = wx.PyEventBinder(EVT_DATA_FETCHED, 1)
 
-class DataWorker(threading.Thread):
-    def __init__(self, from_date, to_date, parent):
-        threading.Thread.__init__(self)
+class DataWorker:
+    def __init__(self, from_date, to_date, parent, segments=None, coordinator=None, pipeline=None):
         self.from_date = from_date
         self.to_date = to_date
         self.parent = parent
+        self.segments = segments  # Optional (from_date, to_date) pairs planned by fetch_planner
+        self.coordinator = coordinator or get_fetch_coordinator()
+        self.pipeline = pipeline or get_ingest_pipeline()
+        self.subscription = None
+        self.chunks_received = 0
+        self.lock = threading.Lock()
+        self.pending = 0  # Chunks still being normalized
+        self.failed = None  # Chunks the fetch gave up on, once it has finished
+
+    def start(self):
+        # Fetches run on the shared coordinator; overlapping requests join the same in-flight job
+        segments = self.segments if self.segments is not None else [(self.from_date, self.to_date)]
+        self.subscription = self.coordinator.subscribe(
+            segments, on_chunk=self.on_chunk, on_complete=self.on_complete
+        )
+
+    def cancel(self):
+        """Stop delivering results, e.g. because the parent screen was destroyed."""
+        if self.subscription is not None:
+            self.subscription.cancel()
 
-    def run(self):
-        # Fetch data from investpy (make sure investpy is installed and up to date)
+    def on_chunk(self, records):
+        # Each chunk is normalized (in a worker process if it is large) and posted as soon as it is ready
+        self.chunks_received += 1
+        logger.debug("Chunk received: %s", summarize(records))
+        with self.lock:
+            self.pending += 1
+        self.pipeline.submit(records).add_done_callback(self.on_table)
+
+    def on_table(self, future):
         try:
-            data = investpy.economic_calendar(from_date=self.from_date, to_date=self.to_date)
-            print("Raw Data Fetched:", data)  # Debugging statement to see the raw fetched data
-
-            if data is not None and not data.empty:  # Check if data is not empty
-                # Convert DataFrame to a list of dictionaries for easier handling
-                data_list = data.to_dict(orient='records')
-                wx.CallAfter(self.send_data_to_main_thread, data_list)
-            else:
-                wx.CallAfter(self.send_data_to_main_thread, None)
-        except Exception as e:
-            print(f"Error fetching data: {e}")
-            # Send None in case of error
+            wx.CallAfter(self.send_data_to_main_thread, future.result(), False)
+        except Exception:
+            logger.exception("Error normalizing fetched chunk")
+        with self.lock:
+            self.pending -= 1
+            finished = self.pending == 0 and self.failed is not None
+        if finished:
+            self.send_complete()
+
+    def on_complete(self, failed):
+        # The completion is posted after the last chunk, which may still be normalizing
+        with self.lock:
+            self.failed = failed
+            finished = self.pending == 0
+        if finished:
+            self.send_complete()
+
+    def send_complete(self):
+        failed = self.failed
+        if failed:
+            logger.warning("Chunks that could not be fetched: %s", failed)
+        if failed and not self.chunks_received:
+            # Send None when nothing could be fetched at all
             wx.CallAfter(self.send_data_to_main_thread, None)
+        else:
+            wx.CallAfter(self.send_data_to_main_thread, EventTable.empty(), True)
 
-    def send_data_to_main_thread(self, data):
+    def send_data_to_main_thread(self, data, complete=True):
+        # The screen may have been destroyed while the fetch was running
+        if not self.parent:
+            return
         # Create and post an event to the main thread with fetched data
         event = wx.PyCommandEvent(EVT_DATA_FETCHED, id=self.parent.GetId())
         event.data = data
+        event.complete = complete  # False for partial chunks, True once the fetch has finished
         wx.PostEvent(self.parent, event)
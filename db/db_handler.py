@@ -0,0 +1,181 @@
+import configparser
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, time
+from utils.cache_journal import CacheJournal
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
+DEFAULT_JSON_CACHE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'utils', 'cache.json')
+
+# Columns stored for every calendar event (mirrors the investpy record keys)
+EVENT_FIELDS = ['id', 'date', 'time', 'zone', 'currency', 'importance', 'event', 'actual', 'forecast', 'previous']
+
+
+def database_enabled(path=DEFAULT_CONFIG, section='cache'):
+    """Return True if config.ini stores the cache in SQLite ([cache] format = sqlite)."""
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    return parser.get(section, 'format', fallback='json').strip().lower() == 'sqlite'
+
+
+def open_store(path=DEFAULT_CONFIG):
+    """Return the DBHandler that backs the app's CacheHandler, or None unless config.ini selects sqlite."""
+    if not database_enabled(path):
+        return None
+    return DBHandler(json_cache=DEFAULT_JSON_CACHE)
+
+
+class DBHandler:
+    def __init__(self, db_file='events.db', json_cache=None):
+        """Initialize the DBHandler and create the schema if needed.
+
+        If the database is new and a JSON cache file is given, its records (and
+        any journal next to it) are migrated once into the database. db_file is
+        relative to the db package; ':memory:' keeps the database in memory.
+
+        DBHandler answers range queries on its own, and is also a store for
+        CacheHandler(store=...), which keeps recent days and a date index over
+        them in memory, reads older days through records() and hands only the
+        changed rows to add_to_cache and delete.
+        """
+        self.db_file = db_file if db_file == ':memory:' else os.path.join(os.path.dirname(__file__), db_file)
+        is_new = db_file == ':memory:' or not os.path.exists(self.db_file)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.create_schema()
+
+        if is_new and json_cache and os.path.exists(json_cache):
+            self.migrate_from_json(json_cache)
+
+    def create_schema(self):
+        """Create the events table and its indexes."""
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id TEXT PRIMARY KEY,
+                    day INTEGER NOT NULL,
+                    date TEXT, time TEXT, zone TEXT, currency TEXT, importance TEXT,
+                    event TEXT, actual TEXT, forecast TEXT, previous TEXT
+                )
+            """)
+            # The primary key already indexes id; day is what range queries hit
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_events_day ON events (day)")
+
+    @staticmethod
+    def to_row(record):
+        """Convert an investpy record dict into a row tuple (day ordinal first)."""
+        if not isinstance(record['id'], str):
+            # Stored as text, an int id would come back as a different key than the one in the cache
+            raise TypeError(f"Event ids must be strings, got {type(record['id']).__name__} {record['id']!r}")
+        day = datetime.strptime(record['date'], '%d/%m/%Y').toordinal()
+        return [record['id'], day] + [record.get(field) for field in EVENT_FIELDS[1:]]
+
+    def select(self, where='', params=()):
+        """Return the events matching a WHERE clause as dicts, ordered by day and time."""
+        with self.lock:
+            cursor = self.conn.execute(
+                f"SELECT {', '.join(EVENT_FIELDS)} FROM events {where} ORDER BY day, time, rowid", params
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_cached_data(self, start_date, end_date):
+        """Retrieve events within the specified date range using the day index."""
+        # Events are dated at midnight, so a start with a time of day excludes its own date (as in CacheHandler)
+        first_day = start_date.toordinal()
+        if start_date.time() != time.min:
+            first_day += 1
+        return self.select("WHERE day BETWEEN ? AND ?", (first_day, end_date.toordinal()))
+
+    def records(self, first_day=None, last_day=None):
+        """Return the events dated between two ordinal days (default: all), as SnapshotReader.records does."""
+        conditions = []
+        params = []
+        if first_day is not None:
+            conditions.append("day >= ?")
+            params.append(first_day)
+        if last_day is not None:
+            conditions.append("day <= ?")
+            params.append(last_day)
+        return self.select(f"WHERE {' AND '.join(conditions)}" if conditions else '', params)
+
+    def all_records(self):
+        """Return every stored event, ordered by day."""
+        return self.select()
+
+    def add_to_cache(self, new_data):
+        """Insert new events and update only the ones whose values changed; return the rows written."""
+        rows = [self.to_row(record) for record in new_data]
+        columns = ['id', 'day'] + EVENT_FIELDS[1:]
+        updates = ', '.join(f"{col} = excluded.{col}" for col in columns[1:])
+        # Skip the write entirely when nothing about the row differs
+        changed = ' OR '.join(f"{col} IS NOT excluded.{col}" for col in columns[1:])
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                f"INSERT INTO events ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates} WHERE {changed}",
+                rows
+            )
+            return self.conn.total_changes - before
+
+    def delete(self, ids):
+        """Delete the events with the given ids."""
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM events WHERE id = ?", [(record_id,) for record_id in ids])
+
+    def replace(self, records):
+        """Replace every stored event with records in one transaction."""
+        rows = [self.to_row(record) for record in records]
+        columns = ['id', 'day'] + EVENT_FIELDS[1:]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM events")
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO events ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+
+    def migrate_from_json(self, json_file):
+        """One-time import of records from the legacy JSON cache file and its journal."""
+        try:
+            with open(json_file, 'r') as f:
+                records = json.load(f).get("data", [])
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Could not migrate the JSON cache %s: %s", json_file, e)
+            return 0
+        # Changes journaled since cache.json was last compacted belong in the database too
+        CacheJournal(json_file).replay(records)
+        self.add_to_cache(records)
+        logger.info("Migrated %d events from %s to %s", len(records), json_file, self.db_file)
+        return len(records)
+
+    def count(self):
+        """Return the number of stored events."""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def clear_cache(self):
+        """Delete all stored events."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM events")
+
+    def close(self):
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+# Example usage
+if __name__ == "__main__":
+    db_handler = DBHandler(json_cache=DEFAULT_JSON_CACHE)
+    print(f"Events stored: {db_handler.count()}")
+
+    start_date = datetime.strptime("27/09/2024", '%d/%m/%Y')
+    end_date = datetime.strptime("30/09/2024", '%d/%m/%Y')
+    print(f"Events in range: {len(db_handler.get_cached_data(start_date, end_date))}")
+    db_handler.close()
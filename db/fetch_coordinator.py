@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from db.fetch_planner import group_segments, segment_days
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+
+class FetchJob:
+    """One in-flight fetch, shared by every subscription whose window overlaps it."""
+    def __init__(self, days):
+        self.days = days  # Set of dates this job downloads
+        self.subscribers = []
+        self.delivered = []  # Chunks fanned out so far, replayed to subscriptions that join late
+        self.cancel_event = threading.Event()
+        self.thread = None  # Or, on an AsyncCore, the future of its task
+
+
+class Subscription:
+    """A caller waiting on one or more jobs; returned by FetchCoordinator.subscribe."""
+    def __init__(self, coordinator, on_chunk, on_complete):
+        self.coordinator = coordinator
+        self.on_chunk = on_chunk
+        self.on_complete = on_complete
+        self.pending_jobs = set()
+        self.failed = []
+        self.active = True
+        self.backlog = deque()  # Chunks waiting to be passed to on_chunk, in order
+        self.delivering = False  # A thread is draining the backlog; completion waits for it
+
+    def cancel(self):
+        """Stop receiving results; jobs left without subscribers are cancelled."""
+        self.coordinator.unsubscribe(self)
+
+
+class FetchCoordinator:
+    """Single-flight coordinator for calendar fetches.
+
+    A request only starts a job for the days no in-flight job already covers and
+    attaches to the jobs that do, so overlapping requests share one download.
+    Jobs left without subscribers are cancelled after a short grace period, so
+    quickly leaving and reopening the calendar reuses the running job.
+    """
+    def __init__(self, engine, cancel_grace=1.0, core=None):
+        self.engine = engine
+        self.cancel_grace = cancel_grace
+        self.core = core  # AsyncCore to run jobs on; None runs each job on its own thread
+        self.jobs = []  # In-flight jobs
+        self.lock = threading.Lock()
+
+    def subscribe(self, segments, on_chunk=None, on_complete=None):
+        """Request the DD/MM/YYYY segments and return a Subscription.
+
+        on_chunk(records) is called for every chunk of every job the subscription
+        is attached to, and on_complete(failed_chunks) once all of them finish.
+        Both are called from worker threads, except that chunks an in-flight
+        job delivered before this call are replayed on the calling thread
+        before subscribe returns. on_chunk is never called concurrently for one
+        subscription: chunks arriving while others are being delivered (e.g.
+        during the replay) are queued and passed on in order by the thread
+        already delivering.
+        """
+        subscription = Subscription(self, on_chunk, on_complete)
+        wanted = segment_days(segments)
+        new_job = None
+        with self.lock:
+            for job in self.jobs:
+                if job.days & wanted:
+                    job.subscribers.append(subscription)
+                    subscription.pending_jobs.add(job)
+                    if on_chunk is not None:
+                        subscription.backlog.extend(job.delivered)
+                    wanted -= job.days
+            if wanted:
+                new_job = FetchJob(wanted)
+                new_job.subscribers.append(subscription)
+                subscription.pending_jobs.add(new_job)
+                self.jobs.append(new_job)
+            replay = subscription.delivering = bool(subscription.backlog)
+            complete = not subscription.pending_jobs
+
+        if replay:
+            # A joined job may finish meanwhile; finish_job leaves completing this subscription to us
+            complete = self.deliver(subscription)
+
+        if new_job is not None:
+            if self.core is not None:
+                new_job.thread = self.core.spawn(self.run_job_async(new_job))
+            else:
+                new_job.thread = threading.Thread(target=self.run_job, args=(new_job,), daemon=True)
+                new_job.thread.start()
+        if complete and on_complete is not None:
+            on_complete([])
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Detach a subscription from its jobs, cancelling jobs nobody waits for."""
+        with self.lock:
+            subscription.active = False
+            for job in subscription.pending_jobs:
+                if subscription in job.subscribers:
+                    job.subscribers.remove(subscription)
+                if not job.subscribers:
+                    if self.core is not None:
+                        self.core.call_later(self.cancel_grace, self.cancel_if_abandoned, job)
+                    else:
+                        timer = threading.Timer(self.cancel_grace, self.cancel_if_abandoned, args=(job,))
+                        timer.daemon = True
+                        timer.start()
+            subscription.pending_jobs.clear()
+
+    def cancel_if_abandoned(self, job):
+        """Cancel a job that still has no subscribers once the grace period is over."""
+        with self.lock:
+            if job.subscribers or job not in self.jobs:
+                return
+            job.cancel_event.set()
+            # A cancelled job must not pick up new subscribers
+            self.jobs.remove(job)
+
+    def deliver(self, subscription):
+        """Pass a subscription's queued chunks to its on_chunk in order, on the calling thread.
+
+        The caller has marked the subscription as delivering. Chunks queued by
+        other threads meanwhile are passed on by this loop as well. Returns True
+        if the subscription's jobs all finished meanwhile, since finish_job
+        leaves completing a delivering subscription to the deliverer.
+        """
+        while True:
+            with self.lock:
+                if not subscription.active or not subscription.backlog:
+                    subscription.backlog.clear()
+                    subscription.delivering = False
+                    return subscription.active and not subscription.pending_jobs
+                records = subscription.backlog.popleft()
+            subscription.on_chunk(records)
+
+    def fan_out(self, job):
+        """Return an on_chunk callback that passes a job's chunks to its live subscribers."""
+        def on_chunk(records):
+            idle = []
+            with self.lock:
+                job.delivered.append(records)
+                for subscription in job.subscribers:
+                    if not subscription.active or subscription.on_chunk is None:
+                        continue
+                    subscription.backlog.append(records)
+                    if not subscription.delivering:
+                        subscription.delivering = True
+                        idle.append(subscription)
+            # Subscriptions already being delivered to pick the chunk up from their backlog
+            for subscription in idle:
+                if self.deliver(subscription) and subscription.on_complete is not None:
+                    subscription.on_complete(subscription.failed)
+        return on_chunk
+
+    def run_job(self, job):
+        """Fetch a job's days and fan the chunks out to its live subscribers."""
+        try:
+            _, failed = self.engine.fetch(group_segments(sorted(job.days)), on_chunk=self.fan_out(job),
+                                          cancel_event=job.cancel_event)
+        except Exception:
+            logger.exception("Error fetching data")
+            failed = group_segments(sorted(job.days))
+        self.finish_job(job, failed)
+
+    async def run_job_async(self, job):
+        """Coroutine version of run_job() for an AsyncCore loop."""
+        try:
+            _, failed = await self.engine.fetch_async(group_segments(sorted(job.days)), on_chunk=self.fan_out(job),
+                                                      cancel_event=job.cancel_event)
+        except asyncio.CancelledError:
+            # Shutting down: stop the job without telling subscribers it finished
+            job.cancel_event.set()
+            with self.lock:
+                if job in self.jobs:
+                    self.jobs.remove(job)
+            raise
+        except Exception:
+            logger.exception("Error fetching data")
+            failed = group_segments(sorted(job.days))
+        self.finish_job(job, failed)
+
+    def finish_job(self, job, failed):
+        """Retire a finished job and complete the subscriptions that were only waiting on it."""
+        finished = []
+        with self.lock:
+            if job in self.jobs:
+                self.jobs.remove(job)
+            for subscription in job.subscribers:
+                subscription.pending_jobs.discard(job)
+                subscription.failed.extend(failed)
+                if subscription.active and not subscription.pending_jobs and not subscription.delivering:
+                    finished.append(subscription)
+            job.subscribers = []
+            job.delivered = []
+        for subscription in finished:
+            if subscription.on_complete is not None:
+                subscription.on_complete(subscription.failed)
+
+    def in_flight(self):
+        """Return the number of jobs currently running."""
+        with self.lock:
+            return len(self.jobs)
+
+
+# Shared coordinator so every screen's fetches go through the same single-flight gate
+_shared_coordinator = None
+_shared_core = None  # AsyncCore the shared coordinator runs its jobs on
+_shared_lock = threading.Lock()
+
+
+def set_fetch_core(core):
+    """Run the shared coordinator's jobs on core; call once at startup, before anything fetches.
+
+    Raises RuntimeError if the coordinator was already created on another core
+    (or without one), since its jobs could then bypass the core.
+    """
+    global _shared_core
+    with _shared_lock:
+        if _shared_coordinator is not None and _shared_coordinator.core is not core:
+            raise RuntimeError("The shared fetch coordinator was created before set_fetch_core")
+        _shared_core = core
+
+
+def get_fetch_coordinator():
+    """Return the process-wide FetchCoordinator, creating it on first use on the core given to set_fetch_core."""
+    global _shared_coordinator
+    with _shared_lock:
+        if _shared_coordinator is None:
+            from api.investpy_wrapper import InvestpyWrapper
+            from db.fetch_engine import FetchEngine
+            _shared_coordinator = FetchCoordinator(FetchEngine(InvestpyWrapper()), core=_shared_core)
+        return _shared_coordinator
+
+
+def benchmark(clicks=20, interval=0.05):
+    """Count backend calls when the calendar is opened repeatedly in a burst."""
+    import time
+    from datetime import date, timedelta
+    from db.fetch_engine import FakeBackend, FetchEngine
+
+    backend = FakeBackend(latency=0.3)
+    coordinator = FetchCoordinator(FetchEngine(backend, max_workers=4, chunk_days=7))
+    received = []
+    subscriptions = []
+    for click in range(clicks):
+        # Each click asks for yesterday .. +7 days; later clicks drift by a day to overlap partially
+        start = date(2024, 10, 1) + timedelta(days=click // 10)
+        segments = [(start.strftime('%d/%m/%Y'), (start + timedelta(days=8)).strftime('%d/%m/%Y'))]
+        # Navigating away destroys the previous screen, cancelling its subscription
+        if subscriptions:
+            subscriptions[-1].cancel()
+        subscriptions.append(coordinator.subscribe(segments, on_chunk=received.append))
+        time.sleep(interval)
+
+    while coordinator.in_flight():
+        time.sleep(0.05)
+    print(f"{clicks} overlapping requests -> {backend.calls} backend calls "
+          f"(one DataWorker per click would make {clicks * 2}), {len(received)} chunks delivered")
+
+
+if __name__ == "__main__":
+    benchmark()
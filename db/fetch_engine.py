@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from db.fetch_planner import fetch_range
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+
+def split_range(from_date, to_date, chunk_days=7):
+    """Split a DD/MM/YYYY range into consecutive chunks of at most chunk_days days."""
+    start = datetime.strptime(from_date, '%d/%m/%Y')
+    end = datetime.strptime(to_date, '%d/%m/%Y')
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+        chunks.append((start.strftime('%d/%m/%Y'), chunk_end.strftime('%d/%m/%Y')))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def retry_delay(from_date, to_date, attempt, error, backoff):
+    """Log a failed attempt and return the seconds to wait before the next one (exponential backoff)."""
+    delay = backoff * (2 ** attempt)
+    logger.warning("Error fetching %s - %s (attempt %d): %s; retrying in %ss",
+                   from_date, to_date, attempt + 1, error, delay)
+    return delay
+
+
+def fetch_chunk(backend, from_date, to_date, retries=3, backoff=1.0):
+    """Fetch one chunk, retrying with exponential backoff before giving up."""
+    for attempt in range(retries + 1):
+        try:
+            return fetch_range(backend, from_date, to_date)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            time.sleep(retry_delay(from_date, to_date, attempt, e, backoff))
+
+
+async def fetch_chunk_async(backend, from_date, to_date, retries=3, backoff=1.0, cancel_event=None):
+    """Coroutine version of fetch_chunk: each attempt runs on the loop's executor, the backoff on the loop.
+
+    Waiting on the loop leaves the shared executor's threads free for other
+    work; a set cancel_event stops retrying.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(retries + 1):
+        try:
+            return await loop.run_in_executor(None, fetch_range, backend, from_date, to_date)
+        except Exception as e:
+            if attempt == retries or (cancel_event is not None and cancel_event.is_set()):
+                raise
+            await asyncio.sleep(retry_delay(from_date, to_date, attempt, e, backoff))
+
+
+class FetchEngine:
+    def __init__(self, backend=None, max_workers=4, chunk_days=7, retries=3, backoff=1.0):
+        """Initialize the engine with a bounded worker pool size and retry policy."""
+        if backend is None:
+            import investpy as backend
+        self.backend = backend
+        self.max_workers = max_workers
+        self.chunk_days = chunk_days
+        self.retries = retries
+        self.backoff = backoff
+
+    def fetch(self, segments, on_chunk=None, cancel_event=None):
+        """Fetch the segments concurrently and return (records, failed_chunks).
+
+        on_chunk(records) is called from the calling thread as each chunk completes,
+        so partial results can be streamed before the whole range has arrived.
+        Setting cancel_event drops the chunks that have not started yet.
+        """
+        chunks = [chunk for from_date, to_date in segments
+                  for chunk in split_range(from_date, to_date, self.chunk_days)]
+        data_list = []
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(fetch_chunk, self.backend, from_date, to_date, self.retries, self.backoff):
+                    (from_date, to_date)
+                for from_date, to_date in chunks
+            }
+            for future in as_completed(futures):
+                if cancel_event is not None and cancel_event.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                try:
+                    records = future.result()
+                except Exception as e:
+                    # A failed chunk does not discard the chunks that succeeded
+                    logger.error("Giving up on %s: %s", futures[future], e)
+                    failed.append(futures[future])
+                    continue
+                data_list.extend(records)
+                if on_chunk is not None and records:
+                    on_chunk(records)
+        return data_list, failed
+
+    async def fetch_async(self, segments, on_chunk=None, cancel_event=None):
+        """Coroutine version of fetch() for an AsyncCore loop.
+
+        Chunks run on the loop's default executor, which every job shares,
+        with at most max_workers in flight for this fetch; retries back off on
+        the loop rather than in an executor thread. on_chunk is called on the
+        loop thread.
+        """
+        limit = asyncio.Semaphore(self.max_workers)
+
+        async def run_chunk(chunk):
+            async with limit:
+                if cancel_event is not None and cancel_event.is_set():
+                    return chunk, [], None
+                try:
+                    records = await fetch_chunk_async(self.backend, chunk[0], chunk[1], self.retries, self.backoff,
+                                                      cancel_event)
+                except Exception as e:
+                    return chunk, None, e
+                return chunk, records, None
+
+        chunks = [chunk for from_date, to_date in segments
+                  for chunk in split_range(from_date, to_date, self.chunk_days)]
+        tasks = [asyncio.ensure_future(run_chunk(chunk)) for chunk in chunks]
+        data_list = []
+        failed = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                chunk, records, error = await next_done
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if error is not None:
+                    # A failed chunk does not discard the chunks that succeeded
+                    logger.error("Giving up on %s: %s", chunk, error)
+                    failed.append(chunk)
+                    continue
+                data_list.extend(records)
+                if on_chunk is not None and records:
+                    on_chunk(records)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return data_list, failed
+
+
+class FakeColumn(list):
+    """Column of a FakeFrame, with tolist() like a pandas Series."""
+    def tolist(self):
+        return list(self)
+
+
+class FakeFrame:
+    """Minimal stand-in for the DataFrame returned by investpy."""
+    def __init__(self, records):
+        self.records = records
+        self.empty = not records
+        self.columns = list(records[0]) if records else []
+
+    def __getitem__(self, column):
+        return FakeColumn(record.get(column) for record in self.records)
+
+
+class FakeBackend:
+    """investpy stand-in that injects latency and random failures per call."""
+    def __init__(self, latency=0.5, failure_rate=0.0, events_per_day=40):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.events_per_day = events_per_day
+        self.calls = 0
+
+    def economic_calendar(self, from_date, to_date):
+        import random
+        self.calls += 1
+        start = datetime.strptime(from_date, '%d/%m/%Y')
+        days = (datetime.strptime(to_date, '%d/%m/%Y') - start).days + 1
+        # Latency grows with the number of days scraped, like the real pages
+        time.sleep(self.latency * (1 + days / 7))
+        if random.random() < self.failure_rate:
+            raise ConnectionError("injected failure")
+        records = []
+        for day in range(days):
+            date = (start + timedelta(days=day)).strftime('%d/%m/%Y')
+            records.extend({'id': f"{date}-{i}", 'date': date} for i in range(self.events_per_day))
+        return FakeFrame(records)
+
+
+def benchmark(from_date='01/01/2024', to_date='31/03/2024', latency=0.2, failure_rate=0.1):
+    """Compare a single blocking fetch with chunked concurrent fetching on a fake backend."""
+    backend = FakeBackend(latency=latency)
+    started = time.perf_counter()
+    single = fetch_range(backend, from_date, to_date)
+    print(f"Single call: {len(single)} records in {time.perf_counter() - started:.2f}s")
+
+    for workers in (1, 4, 8):
+        backend = FakeBackend(latency=latency, failure_rate=failure_rate)
+        engine = FetchEngine(backend, max_workers=workers, chunk_days=7, retries=3, backoff=0.05)
+        first_chunk = []
+        started = time.perf_counter()
+        records, failed = engine.fetch(
+            [(from_date, to_date)],
+            on_chunk=lambda chunk: first_chunk or first_chunk.append(time.perf_counter() - started)
+        )
+        print(f"{workers} workers: {len(records)} records in {time.perf_counter() - started:.2f}s, "
+              f"first chunk after {first_chunk[0]:.2f}s, {backend.calls} calls, {len(failed)} failed chunks")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from utils.cache_retention import is_pending
+
+
+def stale_days(cache_handler, start_date, end_date, today=None):
+    """Return the dates in the window that need to be fetched again.
+
+    A day is stale if it is today or in the future, if nothing is cached for it,
+    or if any of its cached events is still missing its actual value.
+    """
+    today = (today or datetime.now()).date()
+    cached_data = cache_handler.get_cached_data(
+        datetime.combine(start_date.date(), datetime.min.time()),
+        datetime.combine(end_date.date(), datetime.min.time())
+    )
+
+    # Group the cached records by day so each day is judged once
+    days = {}
+    for record in cached_data:
+        days.setdefault(record['date'], []).append(record)
+
+    stale = []
+    day = start_date.date()
+    while day <= end_date.date():
+        records = days.get(day.strftime('%d/%m/%Y'))
+        if day >= today or not records or any(is_pending(record) for record in records):
+            stale.append(day)
+        day += timedelta(days=1)
+    return stale
+
+
+def group_segments(days):
+    """Group sorted dates into contiguous (from_date, to_date) DD/MM/YYYY segments."""
+    segments = []
+    for day in days:
+        if segments and day - segments[-1][1] == timedelta(days=1):
+            segments[-1][1] = day
+        else:
+            segments.append([day, day])
+    return [(first.strftime('%d/%m/%Y'), last.strftime('%d/%m/%Y')) for first, last in segments]
+
+
+def segment_days(segments):
+    """Return the set of dates covered by DD/MM/YYYY segments."""
+    days = set()
+    for from_date, to_date in segments:
+        day = datetime.strptime(from_date, '%d/%m/%Y').date()
+        last = datetime.strptime(to_date, '%d/%m/%Y').date()
+        while day <= last:
+            days.add(day)
+            day += timedelta(days=1)
+    return days
+
+
+def plan_fetch(cache_handler, start_date, end_date, today=None):
+    """Split the window into the contiguous (from_date, to_date) segments to fetch.
+
+    Dates are returned in the DD/MM/YYYY format expected by investpy.
+    """
+    return group_segments(stale_days(cache_handler, start_date, end_date, today))
+
+
+def fetch_range(backend, from_date, to_date):
+    """Fetch a single DD/MM/YYYY range from the backend as a list of records."""
+    # investpy rejects ranges where both ends are the same day
+    query_to = to_date
+    if from_date == to_date:
+        query_to = (datetime.strptime(to_date, '%d/%m/%Y') + timedelta(days=1)).strftime('%d/%m/%Y')
+    data = backend.economic_calendar(from_date=from_date, to_date=query_to)
+    if data is None or data.empty:
+        return []
+    # Building the dicts from column lists is several times faster than to_dict(orient='records')
+    columns = list(data.columns)
+    records = [dict(zip(columns, row)) for row in zip(*(data[column].tolist() for column in columns))]
+    if query_to != to_date:
+        records = [record for record in records if record['date'] == from_date]
+    return records
+
@@ -0,0 +1,296 @@
+import configparser
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from utils.event_table import RECORD_FIELDS, EventTable, pack_strings, unpack_strings
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
+OFFLOAD_THRESHOLD = 2000  # Chunks with at least this many rows are normalized in a worker process
+
+
+def clean_value(value):
+    """Return value as a stripped string, or None if it is missing (None, NaN or blank)."""
+    if value is None or value != value:  # NaN is the only value not equal to itself
+        return None
+    text = value.strip() if isinstance(value, str) else str(value)
+    return text or None
+
+
+def clean_records(records):
+    """Normalize raw calendar rows before they are encoded.
+
+    Text is stripped, blank and NaN cells become None, importance is lower
+    case, rows without an id or a valid DD/MM/YYYY date are dropped, and when
+    an id repeats (pages can overlap) the last row wins.
+    """
+    valid_dates = {}
+    rows = {}
+    for record in records:
+        row = {field: clean_value(record.get(field)) for field in RECORD_FIELDS}
+        date = row['date']
+        if row['id'] is None or date is None:
+            continue
+        valid = valid_dates.get(date)
+        if valid is None:
+            try:
+                datetime.strptime(date, '%d/%m/%Y')
+                valid = True
+            except ValueError:
+                valid = False
+            valid_dates[date] = valid
+        if not valid:
+            continue
+        if row['importance'] is not None:
+            row['importance'] = row['importance'].lower()
+        rows.pop(row['id'], None)  # Re-insert so the row keeps the position of its last occurrence
+        rows[row['id']] = row
+    return list(rows.values())
+
+
+def normalize_records(records):
+    """Clean raw calendar rows and encode them as an EventTable."""
+    return EventTable.from_records(clean_records(records))
+
+
+def pack_columns(records):
+    """Pack raw rows into one string block per field for sending to a worker process.
+
+    Joining a column is a single C call, so the parent holds the GIL for far
+    less time than pickling the dicts would take.
+    """
+    columns = {}
+    for field in RECORD_FIELDS:
+        values = [record.get(field) for record in records]
+        try:
+            columns[field] = pack_strings(values)
+        except TypeError:
+            # Numbers or NaN from a DataFrame: convert the column cell by cell
+            columns[field] = pack_strings([clean_value(value) for value in values])
+    return columns
+
+
+def normalize_columns(columns, count):
+    """Worker process entry point: normalize packed columns and return the table's buffers."""
+    values = [unpack_strings(columns[field], count) for field in RECORD_FIELDS]
+    records = [dict(zip(RECORD_FIELDS, row)) for row in zip(*values)]
+    return normalize_records(records).to_buffers()
+
+
+class IngestPipeline:
+    """Turns fetched rows into EventTables, in worker processes for large chunks.
+
+    Cleaning and encoding rows is pure Python that holds the GIL, so on a fetch
+    thread it starves the wx main loop during large backfills. Chunks of at
+    least threshold rows are packed into one string block per column,
+    normalized in a process pool and sent back as numpy arrays and string
+    blocks, leaving the parent only a few memory copies. Smaller chunks are
+    normalized inline on the pipeline's own thread, where a process round trip
+    would cost more than it saves. Nothing runs on the thread that submits a
+    chunk, which is the AsyncCore loop when fetches run on the core.
+    """
+    def __init__(self, threshold=OFFLOAD_THRESHOLD, max_workers=2):
+        self.threshold = threshold  # None normalizes every chunk inline
+        self.max_workers = max_workers
+        self.executor = None  # Started on the first large chunk
+        self.thread = None  # Packs and inline-normalizes chunks; started on the first chunk
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path=DEFAULT_CONFIG, section='ingest'):
+        """Read the pipeline options from the [ingest] section of config.ini."""
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        if not parser.has_section(section):
+            return cls()
+        options = parser[section]
+        threshold = options.get('offload_threshold', str(OFFLOAD_THRESHOLD)).strip()
+        return cls(threshold=int(threshold) if threshold else None, max_workers=options.getint('workers', 2))
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                # Spawn rather than fork: forking a process that runs wx and other threads is unsafe
+                self.executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self.executor
+
+    def get_thread(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = ThreadPoolExecutor(1, thread_name_prefix='ingest')
+            return self.thread
+
+    def warm_up(self):
+        """Start the worker processes and import the normalization code in them ahead of the first large chunk."""
+        executor = self.get_executor()
+        return [executor.submit(normalize_columns, pack_columns([]), 0) for _ in range(self.max_workers)]
+
+    def offloads(self, records):
+        return self.threshold is not None and len(records) >= self.threshold
+
+    def submit(self, records):
+        """Return a Future for the EventTable of records, normalized off the calling thread."""
+        future = Future()
+
+        def settled(task):
+            # A chunk dropped by shutdown, or a failure before the chunk reached a worker
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None and not future.done():
+                future.set_exception(task.exception())
+
+        self.get_thread().submit(self.process, records, future).add_done_callback(settled)
+        return future
+
+    def process(self, records, future):
+        """Normalize records into future, inline or by handing them to a worker process."""
+        if not self.offloads(records):
+            self.normalize_inline(records, future)
+            return
+        try:
+            remote = self.get_executor().submit(normalize_columns, pack_columns(records), len(records))
+        except (BrokenProcessPool, RuntimeError, OSError) as e:
+            self.disable(e)
+            self.normalize_inline(records, future)
+            return
+
+        def done(remote):
+            try:
+                future.set_result(EventTable.from_buffers(remote.result()))
+            except BrokenProcessPool as e:
+                self.disable(e)
+                self.normalize_inline(records, future)
+            except Exception as e:
+                future.set_exception(e)
+
+        remote.add_done_callback(done)
+
+    def normalize(self, records):
+        """Return the EventTable of records, blocking until it is ready."""
+        return self.submit(records).result()
+
+    @staticmethod
+    def normalize_inline(records, future):
+        try:
+            future.set_result(normalize_records(records))
+        except Exception as e:
+            future.set_exception(e)
+
+    def disable(self, error):
+        """Stop offloading after the process pool failed, e.g. in a frozen build without worker support."""
+        logger.warning("Worker processes unavailable (%s); normalizing chunks inline", error)
+        self.threshold = None
+
+    def shutdown(self):
+        """Stop the pipeline thread and the worker processes; queued chunks are dropped."""
+        with self.lock:
+            thread, self.thread = self.thread, None
+            executor, self.executor = self.executor, None
+        if thread is not None:
+            thread.shutdown(wait=True, cancel_futures=True)
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_shared_pipeline = None
+_shared_lock = threading.Lock()
+
+
+def get_ingest_pipeline():
+    """Return the process-wide IngestPipeline, creating it on first use."""
+    global _shared_pipeline
+    with _shared_lock:
+        if _shared_pipeline is None:
+            _shared_pipeline = IngestPipeline.from_config()
+        return _shared_pipeline
+
+
+def shutdown_ingest_pipeline():
+    """Stop the shared pipeline's worker processes, if any were started."""
+    with _shared_lock:
+        pipeline = _shared_pipeline
+    if pipeline is not None:
+        pipeline.shutdown()
+
+
+def benchmark(num_rows=50000, chunk_rows=5000, fetch_threads=4, tick=0.005):
+    """Measure UI event-loop latency while a 50k-row backfill is normalized, inline and offloaded.
+
+    A thread stands in for the wx main loop: it wakes every tick and records
+    how late each wake-up is, which is how long it waited for the GIL. The
+    chunks are normalized by fetch_threads threads, like FetchEngine's workers.
+    """
+    import random
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.value_parser import synthetic_calendar
+
+    records = synthetic_calendar(days=num_rows // 80 + 1)[:num_rows]
+    # Pages can repeat rows; blank and padded cells need cleaning
+    for record in random.sample(records, num_rows // 100):
+        record['forecast'] = '  '
+        record['event'] = f"  {record['event']} "
+    records.extend(dict(record) for record in random.sample(records, num_rows // 50))
+    chunks = [records[start:start + chunk_rows] for start in range(0, len(records), chunk_rows)]
+
+    def ui_latency(ingest):
+        lateness = []
+        stop = threading.Event()
+
+        def ui_loop():
+            while not stop.is_set():
+                expected = time.perf_counter() + tick
+                time.sleep(tick)
+                lateness.append(time.perf_counter() - expected)
+
+        ui = threading.Thread(target=ui_loop)
+        ui.start()
+        time.sleep(0.2)
+        started = time.perf_counter()
+        tables = ingest()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        ui.join()
+        lateness.sort()
+        return tables, elapsed, lateness
+
+    def report(name, elapsed, lateness):
+        print(f"{name:<24} ingest {elapsed * 1000:6.0f} ms, UI wake-up lateness "
+              f"p50 {lateness[len(lateness) // 2] * 1000:5.2f} ms, p99 {lateness[int(len(lateness) * 0.99)] * 1000:6.2f} ms, "
+              f"max {lateness[-1] * 1000:6.2f} ms")
+
+    _, _, idle = ui_latency(lambda: time.sleep(1.0))
+    report("Idle", 1.0, idle)
+
+    def run(pipeline):
+        with ThreadPoolExecutor(fetch_threads) as pool:
+            return list(pool.map(pipeline.normalize, chunks))
+
+    inline = IngestPipeline(threshold=None)
+    inline_tables, elapsed, lateness = ui_latency(lambda: run(inline))
+    inline.shutdown()
+    report("Inline (before)", elapsed, lateness)
+
+    pipeline = IngestPipeline(threshold=OFFLOAD_THRESHOLD)
+    started = time.perf_counter()
+    for future in pipeline.warm_up():
+        future.result()
+    warm_up = time.perf_counter() - started
+    offloaded_tables, elapsed, lateness = ui_latency(lambda: run(pipeline))
+    report("Process pool", elapsed, lateness)
+    pipeline.shutdown()
+    print(f"{len(records)} rows in {len(chunks)} chunks of {chunk_rows}; "
+          f"worker start-up {warm_up * 1000:.0f} ms, paid once before the first large chunk")
+
+    for inline, offloaded in zip(inline_tables, offloaded_tables):
+        assert inline.to_records() == offloaded.to_records()
+    print(f"Offloaded tables match inline ones ({sum(len(table) for table in offloaded_tables)} rows)")
+
+
+if __name__ == "__main__":
+    benchmark()
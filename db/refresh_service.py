@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from db.fetch_planner import plan_fetch
+from utils.cache_retention import is_pending
+from utils.countdown import fetch_utc_offset, release_time
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+
+class SystemClock:
+    """Wall clock used by the refresh service outside of simulations."""
+    def now(self):
+        return datetime.now()
+
+    def wait(self, event, seconds):
+        """Sleep up to seconds or until event is set; return True if it was set."""
+        return event.wait(seconds)
+
+
+class SimulatedClock:
+    """Clock whose waits advance simulated time instantly; stops at stop_at."""
+    def __init__(self, start, stop_at):
+        self.current = start
+        self.stop_at = stop_at
+
+    def now(self):
+        return self.current
+
+    def wait(self, event, seconds):
+        self.current += timedelta(seconds=seconds)
+        if self.current >= self.stop_at:
+            event.set()
+        return event.is_set()
+
+
+class RefreshService:
+    """Background refresh that polls tightly around high-importance releases.
+
+    While a high-importance event is about to be released, or was released
+    without an actual value yet, the service polls its day every few seconds.
+    Otherwise it sleeps until shortly before the next such release, or at most
+    idle_interval, and then refreshes the stale days of the calendar window.
+    """
+    def __init__(self, cache_handler, coordinator, on_update=None, clock=None,
+                 tight_interval=5, idle_interval=3600, lead=30, watch_window=900, importance='high'):
+        self.cache_handler = cache_handler
+        self.coordinator = coordinator
+        self.on_update = on_update  # Called with each fetched list of records
+        self.clock = clock or SystemClock()
+        self.tight_interval = tight_interval  # Seconds between polls while watching a release
+        self.idle_interval = idle_interval    # Longest sleep when nothing is due
+        self.lead = lead                      # Seconds before a release to start polling
+        self.watch_window = watch_window      # Seconds after a release to keep polling for its actual
+        self.importance = importance
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.wakeup = None  # Set when running as a task on an AsyncCore
+        self.fetch_count = 0
+
+    def start(self, core=None):
+        """Start refreshing, as a task on core or on its own thread."""
+        self.stop_event.clear()
+        if core is not None:
+            self.wakeup = core.wakeup()
+            core.spawn(self.run_async())
+            return
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop refreshing."""
+        self.stop_event.set()
+        if self.wakeup is not None:
+            self.wakeup.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+
+    def upcoming_releases(self, now):
+        """Return (release time, record) for pending watched events around now, sorted."""
+        start = datetime.combine((now - timedelta(days=1)).date(), datetime.min.time())
+        end = datetime.combine((now + timedelta(days=8)).date(), datetime.min.time())
+        releases = []
+        offset = fetch_utc_offset()  # Release times are in the offset the calendar is fetched in
+        # Merges may update these records in place on another thread meanwhile
+        with self.cache_handler.lock:
+            for record in self.cache_handler.get_cached_data(start, end):
+                if record.get('importance') != self.importance or not is_pending(record):
+                    continue
+                released_at = release_time(record, offset)
+                if released_at is not None and released_at + timedelta(seconds=self.watch_window) >= now:
+                    releases.append((released_at, record))
+        releases.sort(key=lambda item: item[0])
+        return releases
+
+    def watched(self, now, releases):
+        """Return the releases inside the tight polling window."""
+        return [(released_at, record) for released_at, record in releases
+                if released_at - timedelta(seconds=self.lead) <= now]
+
+    def next_delay(self, now, releases):
+        """Return the number of seconds to sleep before the next poll."""
+        if self.watched(now, releases):
+            return self.tight_interval
+        for released_at, _ in releases:
+            until = (released_at - timedelta(seconds=self.lead) - now).total_seconds()
+            if until > 0:
+                return max(self.tight_interval, min(self.idle_interval, until))
+        return self.idle_interval
+
+    def segments_to_refresh(self, now, releases):
+        """Return the DD/MM/YYYY segments to fetch on this wake-up."""
+        watched = self.watched(now, releases)
+        if watched:
+            days = sorted({released_at.date() for released_at, _ in watched})
+            return [(day.strftime('%d/%m/%Y'), day.strftime('%d/%m/%Y')) for day in days]
+        # Nothing imminent: refresh the stale days of the usual calendar window
+        with self.cache_handler.lock:
+            return plan_fetch(self.cache_handler, now - timedelta(days=1), now + timedelta(days=7), today=now)
+
+    def fetch(self, segments):
+        """Fetch segments through the coordinator and wait until they are done."""
+        done = threading.Event()
+        self.fetch_count += 1
+        subscription = self.coordinator.subscribe(segments, on_chunk=self.deliver,
+                                                  on_complete=lambda failed: done.set())
+        # Do not hang shutdown on a slow fetch, and let the coordinator drop the job if nobody else wants it
+        while not done.wait(0.5):
+            if self.stop_event.is_set():
+                subscription.cancel()
+                return
+
+    async def fetch_async(self, segments):
+        """Fetch segments through the coordinator and await completion without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def on_complete(failed):
+            # The coordinator may call back from any thread
+            loop.call_soon_threadsafe(lambda: done.done() or done.set_result(failed))
+
+        self.fetch_count += 1
+        subscription = self.coordinator.subscribe(segments, on_chunk=self.deliver, on_complete=on_complete)
+        try:
+            await done
+        except asyncio.CancelledError:
+            subscription.cancel()
+            raise
+
+    def deliver(self, records):
+        if self.on_update is not None:
+            self.on_update(records)
+        else:
+            self.cache_handler.add_to_cache(records)
+
+    def run(self):
+        """Main refresh loop."""
+        while not self.stop_event.is_set():
+            now = self.clock.now()
+            segments = self.segments_to_refresh(now, self.upcoming_releases(now))
+            if segments:
+                try:
+                    self.fetch(segments)
+                except Exception:
+                    logger.exception("Error refreshing data")
+            now = self.clock.now()
+            if self.clock.wait(self.stop_event, self.next_delay(now, self.upcoming_releases(now))):
+                break
+
+    async def run_async(self):
+        """Main refresh loop as a task on an AsyncCore; sleeps on the loop instead of a thread."""
+        while not self.stop_event.is_set():
+            now = self.clock.now()
+            segments = self.segments_to_refresh(now, self.upcoming_releases(now))
+            if segments:
+                try:
+                    await self.fetch_async(segments)
+                except Exception:
+                    logger.exception("Error refreshing data")
+            now = self.clock.now()
+            await self.wakeup.wait(self.next_delay(now, self.upcoming_releases(now)))
+
@@ -1,15 +1,31 @@
+import multiprocessing
 import sys
-import wx
-from ui.bullion_ui import MainApp  # Import the MainApp UI class
-from utils.logger import setup_logging  # Import the logging setup function
+from utils.startup_profiler import StartupProfiler
 
 
 def main():
+    # Optional startup profiling: python main.py --profile-startup
+    # Installed before wx and the logging setup are imported, so their cost is measured too
+    profiler = None
+    if '--profile-startup' in sys.argv:
+        profiler = StartupProfiler()
+        profiler.install()
+
+    import wx
+    from utils.logger import setup_logging  # Import the logging setup function
+
     # Setup logging
     logger = setup_logging()
     logger.info("Starting application")
+    if profiler:
+        profiler.mark("wx and logging ready")
 
     try:
+        # Import the UI lazily so only wx and the main screen load before the first frame
+        from ui.bullion_ui import MainApp  # Import the MainApp UI class
+        if profiler:
+            profiler.mark("UI imported")
+
         # Initialize the wxPython application
         app = wx.App(False)
 
@@ -17,6 +33,11 @@ def main():
         main_window = MainApp(None, title="Bullion Bell - Forex Economic Calendar")
         main_window.Show()
 
+        if profiler:
+            profiler.mark("Main window created")
+            # Runs on the first idle pass, after the initial paint has been processed
+            wx.CallAfter(report_startup, profiler, main_window, logger)
+
         # Start the wxPython event loop
         app.MainLoop()
 
@@ -26,5 +47,24 @@ def main():
         raise e
 
 
+def report_startup(profiler, main_window, logger):
+    """Record the first frame, wait for the background warm-up, then report."""
+    import wx
+    profiler.mark("First frame")
+
+    def finish():
+        if main_window.services.warmup_thread is None or main_window.services.warmup_thread.is_alive():
+            wx.CallLater(50, finish)
+            return
+        profiler.mark("Background warm-up done")
+        profiler.uninstall()
+        report = profiler.report()
+        logger.info(report)
+        print(report)
+
+    finish()
+
+
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Lets frozen builds start the ingest worker processes
     main()
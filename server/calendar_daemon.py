@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from db.refresh_service import RefreshService, SystemClock
+from utils.async_core import AsyncCore
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+
+class CalendarDaemon:
+    """Headless ingestion: scheduled fetches merged into the cache, with no wx involved.
+
+    The refresh service and its fetch jobs run as tasks on the daemon's asyncio
+    loop through an AsyncCore, with blocking requests on the core's executor;
+    the loop owns all cache writes, like the UI thread does in the desktop app. Every merge bumps version, which invalidates cached API
+    responses, and newly published actuals are pushed to stream subscribers.
+    """
+    def __init__(self, cache_handler, coordinator=None, clock=None, fetch=True, queue_size=256):
+        self.cache_handler = cache_handler
+        self.coordinator = coordinator
+        self.clock = clock or SystemClock()
+        self.fetch = fetch  # False serves the existing cache without fetching
+        self.queue_size = queue_size
+        self.loop = None
+        self.core = None
+        self.refresh_service = None
+        self.subscribers = set()  # One asyncio.Queue of new actuals per stream client
+        self.version = 0
+        self.stats = {'merges': 0, 'records_merged': 0, 'actuals_published': 0, 'streams_dropped': 0}
+
+    def start(self, loop):
+        """Start the scheduled fetches; merges will run on loop."""
+        self.loop = loop
+        if not self.fetch:
+            return
+        self.core = AsyncCore(loop=loop)
+        coordinator = self.coordinator
+        if coordinator is None:
+            from db.fetch_coordinator import get_fetch_coordinator, set_fetch_core
+            set_fetch_core(self.core)
+            coordinator = get_fetch_coordinator()
+        self.refresh_service = RefreshService(self.cache_handler, coordinator, on_update=self.on_update,
+                                              clock=self.clock)
+        self.refresh_service.start(self.core)
+
+    async def shutdown(self):
+        """Stop fetching and wait for the background tasks, then end streams and flush the cache."""
+        if self.refresh_service is not None:
+            self.refresh_service.stop()
+        if self.core is not None:
+            await self.core.aclose()
+        self.stop()
+
+    def stop(self):
+        """Stop fetching, end every stream and flush the cache."""
+        if self.refresh_service is not None:
+            self.refresh_service.stop()
+        for queue in list(self.subscribers):
+            self.close_stream(queue)
+        self.cache_handler.close()
+
+    def on_update(self, records):
+        # Chunks may arrive from other threads (a thread-mode coordinator); the merge itself runs on the loop
+        self.loop.call_soon_threadsafe(self.merge, records)
+
+    def merge(self, records):
+        """Merge fetched records into the cache and publish actuals that just came out."""
+        new_actuals = []
+        for record in records:
+            existing = self.cache_handler.records_by_id.get(record['id'])
+            # Only events already known without this actual count, so a first fetch does not flood streams
+            if existing is not None and record.get('actual') and existing.get('actual') != record['actual']:
+                new_actuals.append(dict(record))
+        self.cache_handler.add_to_cache(records)
+        self.version += 1
+        self.stats['merges'] += 1
+        self.stats['records_merged'] += len(records)
+        for record in new_actuals:
+            self.publish(record)
+        if new_actuals:
+            logger.info("Published %d new actuals to %d streams", len(new_actuals), len(self.subscribers))
+
+    def subscribe(self):
+        """Return a queue that receives every newly published actual."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def close_stream(self, queue):
+        """Detach a stream and wake its writer with the end-of-stream marker."""
+        self.subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def publish(self, record):
+        self.stats['actuals_published'] += 1
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(record)
+            except asyncio.QueueFull:
+                # A client that stopped reading is disconnected rather than buffered without bound
+                self.stats['streams_dropped'] += 1
+                self.close_stream(queue)
+
+    def status(self):
+        return dict(self.stats, version=self.version, streams=len(self.subscribers),
+                    fetching=self.refresh_service is not None, cache=self.cache_handler.cache_stats())
@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlsplit
+
+from utils.countdown import time_seconds
+from utils.event_search import EventIndex
+from utils.event_table import IMPORTANCE_CODES, EventTable
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+MAX_RANGE_DAYS = 366
+MAX_CACHED_RESPONSES = 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def query_list(query, key):
+    """Return a comma-separated query parameter as a set, or None when absent."""
+    values = [value for item in query.get(key, []) for value in item.split(',') if value]
+    return set(values) if values else None
+
+
+def query_day(query, key, default):
+    value = query.get(key, [None])[0]
+    if value is None:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPError(400, f"{key} must be YYYY-MM-DD")
+
+
+def matches(record, currencies=None, zones=None, min_importance=None):
+    """Return True if a record passes the currency, zone and minimum importance filters."""
+    if currencies is not None and record.get('currency') not in currencies:
+        return False
+    if zones is not None and record.get('zone') not in zones:
+        return False
+    return IMPORTANCE_CODES.get(record.get('importance'), 0) >= IMPORTANCE_CODES[min_importance]
+
+
+def query_importance(query):
+    importance = query.get('importance', [None])[0]
+    if importance is not None and importance not in IMPORTANCE_CODES:
+        raise HTTPError(400, "importance must be low, medium or high")
+    return importance
+
+
+class CalendarAPI:
+    """Local HTTP/JSON API over the daemon's cache, served with asyncio streams.
+
+    GET /events         events by range (from, to), currency, zone, importance and text (q)
+    GET /events/next    the next n releases after now
+    GET /stream         server-sent events for every newly published actual
+    GET /health         daemon, cache and API counters
+
+    Responses are cached per path and query until the cache changes (and for
+    at most a second for /events/next, which depends on the time); ETags let
+    clients revalidate without a body.
+    """
+    def __init__(self, daemon, host='127.0.0.1', port=8765, keepalive=15.0):
+        self.daemon = daemon
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive  # Seconds between comment lines on idle streams
+        self.server = None
+        # Path -> (handler, seconds a cached response stays valid; None until the cache changes, 0 never cached)
+        self.routes = {
+            '/events': (self.events, None),
+            '/events/next': (self.next_events, 1.0),
+            '/health': (self.health, 0),
+        }
+        self.response_cache = {}  # (path, query) -> (version, created, etag, body)
+        self.stats = {'requests': 0, 'cache_hits': 0, 'not_modified': 0, 'streams': 0}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # Resolves port 0 to the one picked
+        logger.info("Calendar API listening on http://%s:%d", self.host, self.port)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def read_request(self, reader):
+        """Read one request head; return (method, target, headers) or None at end of connection."""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('content-length'):
+            try:
+                length = int(headers['content-length'])
+            except ValueError:
+                length = -1
+            if length < 0:
+                raise HTTPError(400, "malformed Content-Length header")
+            await reader.readexactly(length)  # Bodies are not used
+        return method, target, headers
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on a keep-alive connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HTTPError as e:
+                    await self.write_response(writer, e.status, {}, self.error_body(e), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                if method == 'GET' and urlsplit(target).path == '/stream':
+                    await self.stream(writer)
+                    break
+                status, extra_headers, body = self.respond(method, target, headers)
+                await self.write_response(writer, status, extra_headers, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def write_response(self, writer, status, headers, body, keep_alive=True):
+        head = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}", f"Content-Length: {len(body)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    @staticmethod
+    def error_body(error):
+        return json.dumps({'error': str(error)}).encode()
+
+    def respond(self, method, target, headers):
+        """Return (status, headers, body) for a plain JSON request, using the response cache."""
+        self.stats['requests'] += 1
+        if method != 'GET':
+            return 405, {'Allow': 'GET'}, self.error_body('only GET is supported')
+        url = urlsplit(target)
+        route = self.routes.get(url.path)
+        if route is None:
+            return 404, {}, self.error_body(f"no such endpoint: {url.path}")
+        handler, ttl = route
+
+        key = (url.path, '&'.join(sorted(url.query.split('&'))))
+        cached = self.response_cache.get(key)
+        version = self.daemon.version
+        if (cached is not None and cached[0] == version
+                and (ttl is None or time.monotonic() - cached[1] < ttl)):
+            self.stats['cache_hits'] += 1
+            _, _, etag, body = cached
+        else:
+            try:
+                payload = handler(parse_qs(url.query))
+            except HTTPError as e:
+                return e.status, {}, self.error_body(e)
+            body = json.dumps(payload).encode()
+            etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+            if ttl != 0:
+                if len(self.response_cache) >= MAX_CACHED_RESPONSES:
+                    self.response_cache.clear()
+                self.response_cache[key] = (version, time.monotonic(), etag, body)
+
+        if headers.get('if-none-match') == etag:
+            self.stats['not_modified'] += 1
+            return 304, {'ETag': etag}, b''
+        return 200, {'Content-Type': 'application/json', 'ETag': etag}, body
+
+    def events(self, query):
+        today = datetime.combine(self.daemon.clock.now().date(), datetime.min.time())
+        start = query_day(query, 'from', today - timedelta(days=1))
+        end = query_day(query, 'to', today + timedelta(days=7))
+        if end < start or (end - start).days > MAX_RANGE_DAYS:
+            raise HTTPError(400, f"to must be after from and at most {MAX_RANGE_DAYS} days later")
+        records = self.daemon.cache_handler.get_cached_data(start, end)
+        conditions = dict(currencies=query_list(query, 'currency'), zones=query_list(query, 'zone'),
+                          min_importance=query_importance(query))
+        text = query.get('q', [''])[0]
+        if text:
+            # Table rows line up with records, so the matching rows index straight into them
+            rows = EventIndex(EventTable.from_records(records)).search(text=text, **conditions)
+            records = [records[row] for row in rows]
+        else:
+            records = [record for record in records if matches(record, **conditions)]
+        # The cache returns whole days in date order; order each day by release time
+        records.sort(key=lambda record: (record['date'][6:], record['date'][3:5], record['date'][:2],
+                                         record.get('time') or ''))
+        return {'from': start.strftime('%Y-%m-%d'), 'to': end.strftime('%Y-%m-%d'), 'events': records}
+
+    def next_events(self, query):
+        try:
+            count = min(int(query.get('n', ['10'])[0]), 500)
+        except ValueError:
+            raise HTTPError(400, "n must be a number")
+        conditions = dict(currencies=query_list(query, 'currency'), min_importance=query_importance(query))
+        now = self.daemon.clock.now()
+        days = {}  # Each date string is parsed once
+        upcoming = []
+        for record in self.daemon.cache_handler.get_cached_data(
+                datetime.combine(now.date(), datetime.min.time()), now + timedelta(days=14)):
+            if not matches(record, **conditions):
+                continue
+            seconds = time_seconds(record.get('time'))
+            if math.isnan(seconds):
+                continue  # All-day events have no release time
+            day = days.get(record['date'])
+            if day is None:
+                day = days[record['date']] = datetime.strptime(record['date'], '%d/%m/%Y')
+            released_at = day + timedelta(seconds=seconds)
+            if released_at > now:
+                upcoming.append((released_at, record))
+        upcoming.sort(key=lambda item: item[0])
+        return {'now': now.isoformat(timespec='seconds'),
+                'events': [dict(record, seconds_until=(released_at - now).total_seconds())
+                           for released_at, record in upcoming[:count]]}
+
+    def health(self, query):
+        return {'daemon': self.daemon.status(), 'api': dict(self.stats, cached_responses=len(self.response_cache))}
+
+    async def stream(self, writer):
+        """Send new actuals as server-sent events until the client goes away or the daemon stops."""
+        self.stats['requests'] += 1
+        self.stats['streams'] += 1
+        queue = self.daemon.subscribe()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+        try:
+            await writer.drain()
+            while True:
+                try:
+                    record = await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")  # Also detects clients that went away
+                else:
+                    if record is None:
+                        break
+                    writer.write(f"event: actual\nid: {record['id']}\ndata: {json.dumps(record)}\n\n".encode())
+                await writer.drain()
+        finally:
+            self.daemon.unsubscribe(queue)
@@ -0,0 +1,202 @@
+"""Load test for the calendar API.
+
+    python -m server.load_test --spawn                 # in-process server over synthetic data
+    python -m server.load_test --port 8765             # a running daemon.py
+
+Runs --concurrency keep-alive clients issuing --requests GETs over a mix of
+endpoints while --streams clients listen on /stream, then reports throughput,
+latency percentiles and the API's response-cache hit rate. With --spawn,
+actuals are published during the run to measure stream fan-out latency.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def synthetic_window(days_back=30, days_ahead=30, per_day=80):
+    """Return calendar records around today with a spread of currencies and importances."""
+    currencies = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'CHF', 'NZD']
+    importances = ['low', 'medium', 'high']
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    records = []
+    for offset in range(-days_back, days_ahead + 1):
+        day = today + timedelta(days=offset)
+        for i in range(per_day):
+            records.append({
+                'id': f"{offset}-{i}", 'date': day.strftime('%d/%m/%Y'), 'time': f"{i % 24:02d}:{(i * 7) % 60:02d}",
+                'zone': 'synthetic', 'currency': currencies[i % len(currencies)],
+                'importance': importances[i % len(importances)], 'event': f"Indicator {i} (MoM)",
+                'actual': '0.3%' if offset < 0 else None, 'forecast': '0.2%', 'previous': '0.1%',
+            })
+    return records
+
+
+def spawn_server():
+    """Start a daemon without fetching, over synthetic data, on its own loop thread."""
+    import os
+    import tempfile
+    from server.calendar_daemon import CalendarDaemon
+    from server.http_api import CalendarAPI
+    from utils.cache_handler import CacheHandler
+    from utils.cache_journal import atomic_write_json
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'cache.json')
+    records = synthetic_window()
+    atomic_write_json(path, {"data": records})
+    daemon = CalendarDaemon(CacheHandler(path, journaled=True), fetch=False)
+    loop = asyncio.new_event_loop()
+    api = CalendarAPI(daemon, '127.0.0.1', 0)
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        daemon.start(loop)
+        loop.run_until_complete(api.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return daemon, api, loop, {record['id']: record for record in records}
+
+
+async def request(reader, writer, path):
+    """Send one keep-alive GET and return (status, body)."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(host, port, paths, count, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            path = random.choice(paths)
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, path)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append((path, status))
+    finally:
+        writer.close()
+
+
+async def listener(host, port, received, connected):
+    """Read /stream and record when each actual arrives."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET /stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    while (await reader.readline()) not in (b'\r\n', b''):
+        pass
+    connected.release()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b'data: '):
+                record = json.loads(line[6:])
+                received.append((record['id'], time.perf_counter()))
+    except asyncio.CancelledError:
+        pass
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, concurrency, total, streams, publish=None):
+    today = datetime.now().date()
+    paths = ['/events', '/events?currency=USD', '/events?currency=EUR,GBP&importance=high',
+             '/events?importance=medium&q=indicator%201',
+             f"/events?from={today - timedelta(days=20)}&to={today}", '/events/next?n=10',
+             '/events/next?n=5&currency=USD&importance=high']
+    received = []
+    connected = asyncio.Semaphore(0)
+    listeners = [asyncio.ensure_future(listener(host, port, received, connected)) for _ in range(streams)]
+    for _ in range(streams):
+        await connected.acquire()
+
+    latencies, errors = [], []
+    published = {}
+    started = time.perf_counter()
+    clients = [client(host, port, paths, total // concurrency, latencies, errors) for _ in range(concurrency)]
+    if publish is not None:
+        async def publisher():
+            for n in range(20):
+                await asyncio.sleep(0.05)
+                published.update(publish(n))
+        clients.append(publisher())
+    await asyncio.gather(*clients)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.2)  # Let the last stream events arrive
+    for task in listeners:
+        task.cancel()
+    await asyncio.gather(*listeners, return_exceptions=True)
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, body = await request(reader, writer, '/health')
+    writer.close()
+    health = json.loads(body)
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    api = health['api']
+    print(f"{len(latencies)} requests from {concurrency} clients in {elapsed:.2f}s: "
+          f"{len(latencies) / elapsed:.0f} req/s, {len(errors)} errors")
+    print(f"Latency p50 {percentile(0.5):.2f} ms, p95 {percentile(0.95):.2f} ms, p99 {percentile(0.99):.2f} ms")
+    print(f"Response cache: {api['cache_hits']} hits of {api['requests']} requests, "
+          f"{api['cached_responses']} cached responses, version {health['daemon']['version']}")
+    if published:
+        delays = sorted(arrived - published[record_id] for record_id, arrived in received if record_id in published)
+        expected = len(published) * streams
+        print(f"Streams: {len(delays)} of {expected} actuals delivered to {streams} listeners, "
+              f"median {delays[len(delays) // 2] * 1000:.2f} ms after publishing" if delays else "Streams: none delivered")
+
+
+def publisher(daemon, loop, records):
+    """Return publish(n), which releases the actual for today's nth event on a spawned server."""
+    def publish(n):
+        # An actual comes out for an event released today, as a fetch would deliver it
+        record = dict(records[f"0-{n}"], actual=f"{n}.0%")
+        stamp = time.perf_counter()
+        loop.call_soon_threadsafe(daemon.merge, [record])
+        return {record['id']: stamp}
+    return publish
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--spawn', action='store_true', help="start an in-process server over synthetic data")
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--streams', type=int, default=20)
+    args = parser.parse_args()
+
+    publish = None
+    if args.spawn:
+        daemon, api, loop, records = spawn_server()
+        args.port = api.port
+        publish = publisher(daemon, loop, records)
+    asyncio.run(run_load(args.host, args.port, args.concurrency, args.requests, args.streams, publish))
+
+
+if __name__ == "__main__":
+    main()
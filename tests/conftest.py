@@ -0,0 +1,34 @@
+import time
+
+import pytest
+
+from utils.audio_dispatcher import AudioDispatcher, NullSink
+
+
+@pytest.fixture
+def dispatcher():
+    """An AudioDispatcher that records playbacks instead of playing them."""
+    dispatcher = AudioDispatcher(NullSink())
+    yield dispatcher
+    dispatcher.stop()
+
+
+@pytest.fixture
+def memory_cache():
+    """A CacheHandler that keeps its records in memory only."""
+    from utils.cache_handler import CacheHandler
+    return CacheHandler(cache_file=None)
+
+
+@pytest.fixture
+def local_zone(monkeypatch):
+    """Set the process's local timezone: local_zone('Europe/London')."""
+    if not hasattr(time, 'tzset'):
+        pytest.skip("Changing the local timezone needs time.tzset")
+
+    def set_zone(name):
+        monkeypatch.setenv('TZ', name)
+        time.tzset()
+    yield set_zone
+    monkeypatch.undo()
+    time.tzset()
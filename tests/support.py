@@ -0,0 +1,66 @@
+"""Helpers shared by the tests."""
+import asyncio
+import selectors
+import time
+from datetime import timedelta
+
+
+def wait_until(predicate, timeout=5.0, interval=0.01):
+    """Poll predicate until it returns true; return its last result."""
+    deadline = time.monotonic() + timeout
+    result = predicate()
+    while not result and time.monotonic() < deadline:
+        time.sleep(interval)
+        result = predicate()
+    return result
+
+
+class EmptyEngine:
+    """Fetch engine stand-in that returns no records immediately."""
+    def fetch(self, segments, on_chunk=None, cancel_event=None):
+        return [], []
+
+    async def fetch_async(self, segments, on_chunk=None, cancel_event=None):
+        return [], []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop whose sleeps advance simulated time instantly.
+
+    Whenever the loop would sleep until its next timer, loop.time() jumps
+    ahead instead, along with the given ManualClock (epoch seconds) and
+    SimulatedClock (datetime). wakeups counts those sleeps, i.e. how often an
+    idle process would have been woken.
+    """
+    def __init__(self, manual_clock=None, simulated_clock=None):
+        self.virtual = 0.0
+        self.manual_clock = manual_clock
+        self.simulated_clock = simulated_clock
+        self.wakeups = 0
+        super().__init__(VirtualSelector(self))
+
+    def time(self):
+        return self.virtual
+
+    def advance(self, seconds):
+        self.virtual += seconds
+        if self.manual_clock is not None:
+            self.manual_clock.current += seconds
+        if self.simulated_clock is not None:
+            self.simulated_clock.current += timedelta(seconds=seconds)
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        self.loop.wakeups += 1
+        if timeout is None:
+            return super().select(0.01)  # Nothing scheduled; only another thread can wake the loop
+        self.loop.advance(timeout)
+        return []
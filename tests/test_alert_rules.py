@@ -0,0 +1,167 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.alert_rules import AlertRules, compile_rule, load_rules
+from utils.alert_system import AlertSystem
+from utils.cache_handler import CacheHandler
+from utils.cache_retention import RetentionPolicy
+from utils.value_parser import parse_values, synthetic_calendar
+
+NOW = datetime(2024, 10, 4, 12, 0)
+CURRENCIES = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'CHF', 'NZD']
+ZONES = ['united states', 'euro zone', 'united kingdom', 'japan', 'australia', 'canada', 'switzerland']
+
+
+def event(record_id, released_at, currency='USD', name='Nonfarm Payrolls', actual=None, forecast='150K'):
+    return {'id': record_id, 'date': released_at.strftime('%d/%m/%Y'), 'time': released_at.strftime('%H:%M'),
+            'zone': 'united states', 'currency': currency, 'importance': 'high', 'event': name,
+            'actual': actual, 'forecast': forecast, 'previous': '140K'}
+
+
+@pytest.fixture
+def alert_system(dispatcher):
+    return AlertSystem(dispatcher)  # Never started: alerts are only scheduled
+
+
+def random_rules(count, words):
+    rules = []
+    for i in range(count):
+        options = {'importance': random.choice(['', 'low', 'medium', 'high'])}
+        if random.random() < 0.8:
+            options['currency'] = ', '.join(random.sample(CURRENCIES, random.randint(1, 2)))
+        if random.random() < 0.2:
+            options['zone'] = random.choice(ZONES)
+        if random.random() < 0.7:
+            options['event'] = ' '.join(random.sample(words, random.randint(1, 2)))[:random.randint(3, 12)]
+        if random.random() < 0.5:
+            options['minutes_before'] = str(random.choice([1, 5, 15, 60]))
+        else:
+            options['deviation'] = random.choice(['0', '0.5', '1.5%', '2'])
+        options['sound'] = random.choice(['a.wav', 'b.wav'])
+        rules.append(compile_rule(f"r{i}", options))
+    return rules
+
+
+@pytest.fixture
+def calendar():
+    random.seed(7)
+    records = synthetic_calendar(days=40)
+    for i, record in enumerate(records):
+        record['id'] = str(i)
+        record['time'] = f"{i % 24:02d}:{(i * 7) % 60:02d}"
+        record['currency'] = random.choice(CURRENCIES)
+        record['zone'] = random.choice(ZONES)
+        record['importance'] = random.choice(['low', 'medium', 'high'])
+    return records
+
+
+@pytest.mark.parametrize('options, message', [
+    ({'minutes_before': '5', 'deviation': '1'}, 'exactly one'),
+    ({}, 'exactly one'),
+    ({'minutes_before': 'soon'}, 'minutes_before'),
+    ({'deviation': 'large'}, 'not a number'),
+    ({'minutes_before': '5', 'importance': 'urgent'}, 'importance'),
+])
+def test_invalid_rules_are_rejected(options, message):
+    with pytest.raises(ValueError, match=message):
+        compile_rule('bad', options)
+
+
+def test_invalid_sections_are_skipped_when_loading(tmp_path):
+    path = tmp_path / 'rules.ini'
+    path.write_text("[rule:nfp]\ncurrency = usd\nevent = payrolls\nminutes_before = 5\n"
+                    "[rule:broken]\nminutes_before = 5\ndeviation = 1\n"
+                    "[alerts]\nrules_file =\n")
+    rules = load_rules(str(path))
+    assert [rule.name for rule in rules] == ['nfp']
+    assert rules[0].currencies == {'USD'}
+
+
+def test_the_index_agrees_with_every_rules_own_check(calendar, alert_system):
+    words = sorted({word for record in calendar[:2000] for word in record['event'].lower().split()})
+    rules = random_rules(3000, words)
+    engine = AlertRules(alert_system, rules, clock=lambda: NOW)
+    for record in random.sample(calendar, 300):
+        assert engine.index.match(record) == [i for i, rule in enumerate(rules) if rule.matches(record)]
+
+
+def test_release_alerts_follow_the_release(alert_system):
+    rules = [compile_rule('nfp', {'event': 'payrolls', 'minutes_before': '5', 'sound': 'a.wav'}),
+             compile_rule('usd', {'currency': 'USD', 'minutes_before': '5', 'sound': 'a.wav'}),
+             compile_rule('eur', {'currency': 'EUR', 'minutes_before': '15'})]
+    engine = AlertRules(alert_system, rules, clock=lambda: NOW)
+    release = NOW + timedelta(hours=2)
+    engine.ingest([event('nfp', release), event('past', NOW - timedelta(hours=1))], initial=True)
+
+    # Two rules asking for the same lead time and sound share one alert; past releases get none
+    assert [alert['event_time'] for alert in alert_system.pending_alerts()] == [release - timedelta(minutes=5)]
+
+    engine.ingest([event('nfp', release + timedelta(hours=1))])
+    assert [alert['event_time'] for alert in alert_system.pending_alerts()] == [release + timedelta(minutes=55)]
+
+    engine.ingest([event('nfp', NOW - timedelta(minutes=1))])  # Released early
+    assert alert_system.pending_alerts() == []
+
+
+def test_records_evicted_from_the_cache_are_forgotten(alert_system):
+    cache = CacheHandler(cache_file=None, retention=RetentionPolicy(max_records=2, archive=False))
+    engine = AlertRules(alert_system, [compile_rule('usd', {'currency': 'USD', 'minutes_before': '5'})],
+                        clock=lambda: NOW)
+    tomorrow = NOW + timedelta(days=1)
+    cache.add_to_cache([event('soon', NOW + timedelta(hours=1)), event('tomorrow', tomorrow)])
+    engine.ingest(cache.sorted_records, initial=True)
+    cache.add_listener(engine.ingest)
+    cache.add_eviction_listener(engine.forget)
+
+    # The oldest day leaves the cache to make room for the new record
+    cache.add_to_cache([event('later', tomorrow + timedelta(hours=1))])
+    assert "soon" not in cache.records_by_id
+    assert set(engine.seen) == set(engine.scheduled) == {"tomorrow", "later"}
+    assert {key[0] for key in engine.release_times} == {tomorrow.strftime('%d/%m/%Y')}
+
+def test_deviation_alerts_fire_only_for_new_actuals_far_enough_from_forecast(alert_system):
+    rules = [compile_rule('big', {'currency': 'USD', 'deviation': '50K', 'sound': 'big.wav'}),
+             compile_rule('any', {'currency': 'USD', 'deviation': '0', 'sound': 'any.wav'})]
+    engine = AlertRules(alert_system, rules, clock=lambda: NOW)
+    released = NOW - timedelta(minutes=1)
+    engine.ingest([event('nfp', released, actual='120K'), event('old', NOW - timedelta(days=3), actual='1K')],
+                  initial=True)
+    assert engine.stats['fired'] == 0  # Actuals already in the cache at startup are history
+
+    engine.ingest([event('nfp', released, actual='260K')])
+    assert sorted(alert['sound_file'] for alert in alert_system.pending_alerts()) == ['any.wav', 'big.wav']
+    engine.ingest([event('nfp', released, actual='170K')])
+    assert engine.stats['fired'] == 3  # Within 50K of the forecast: only the catch-all rule
+
+
+def test_refreshes_with_thousands_of_rules_evaluate_only_what_changed(calendar, alert_system):
+    words = sorted({word for record in calendar[:2000] for word in record['event'].lower().split()})
+    rules = random_rules(3000, words)
+    engine = AlertRules(alert_system, rules, clock=lambda: NOW)
+    engine.ingest(calendar, initial=True)
+
+    window = [dict(record) for record in calendar[-1000:]]
+    changed = random.sample(range(len(window)), 100)
+    released = NOW - timedelta(minutes=1)
+    for position in changed:
+        window[position].update(actual=f"{random.uniform(-3, 3):.2f}",
+                                date=released.strftime('%d/%m/%Y'), time=released.strftime('%H:%M'))
+    fired = engine.stats['fired']
+    assert engine.ingest(window) == len(changed)
+    assert engine.ingest(window) == 0
+
+    # One alert per matching deviation rule and sound, as a direct check of every rule gives
+    expected = 0
+    for position in changed:
+        record = window[position]
+        actual, forecast = parse_values([record['actual'], record['forecast']])
+        sounds = set()
+        for rule in rules:
+            if rule.deviation is None or not rule.matches(record) or rule.sound in sounds:
+                continue
+            if rule.deviation == 0 or abs(actual - forecast) >= rule.deviation:
+                sounds.add(rule.sound)
+                expected += 1
+    assert engine.stats['fired'] - fired == expected > 0
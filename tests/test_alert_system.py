@@ -0,0 +1,90 @@
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.support import wait_until
+from utils.alert_system import AlertSystem
+from utils.async_core import AsyncCore
+
+
+@pytest.fixture
+def alert_system(dispatcher):
+    alert_system = AlertSystem(dispatcher)
+    yield alert_system
+    alert_system.stop()
+
+
+def test_alerts_fire_within_a_fraction_of_a_second(alert_system):
+    alert_system.start()
+    base = datetime.now() + timedelta(seconds=0.3)
+    alerts = [alert_system.add_alert(base + timedelta(milliseconds=i * 7), None) for i in range(100)]
+
+    assert wait_until(lambda: all(alert['triggered'] for alert in alerts))
+    lateness = [(alert['triggered_at'] - alert['event_time']).total_seconds() for alert in alerts]
+    assert min(lateness) >= 0
+    assert max(lateness) < 0.25
+
+
+def test_alerts_fire_in_time_order(alert_system):
+    base = datetime.now() + timedelta(seconds=0.2)
+    # Added out of order, and one ahead of an earlier pending alert so the scheduler must wake early
+    late = alert_system.add_alert(base + timedelta(seconds=0.3), None)
+    alert_system.start()
+    early = alert_system.add_alert(base, None)
+    middle = alert_system.add_alert(base + timedelta(seconds=0.15), None)
+
+    assert wait_until(lambda: late['triggered'])
+    assert early['triggered_at'] < middle['triggered_at'] < late['triggered_at']
+
+
+def test_cancelled_alerts_never_fire(alert_system):
+    alert_system.start()
+    base = datetime.now() + timedelta(seconds=0.2)
+    alerts = [alert_system.add_alert(base + timedelta(milliseconds=i), None) for i in range(50)]
+    for alert in alerts[::2]:
+        alert_system.cancel_alert(alert)
+
+    assert wait_until(lambda: all(alert['triggered'] for alert in alerts[1::2]))
+    assert not any(alert['triggered'] for alert in alerts[::2])
+    assert alert_system.pending_alerts() == []
+
+
+def test_pending_alerts_are_ordered_and_cleared(alert_system):
+    base = datetime.now() + timedelta(hours=1)
+    second = alert_system.add_alert(base + timedelta(minutes=1), None)
+    first = alert_system.add_alert(base, None)
+    cancelled = alert_system.add_alert(base, None)
+    alert_system.cancel_alert(cancelled)
+
+    assert alert_system.pending_alerts() == [first, second]
+    alert_system.clear_alerts()
+    assert alert_system.pending_alerts() == []
+
+
+def test_runs_as_a_task_on_the_async_core(alert_system):
+    core = AsyncCore().start()
+    try:
+        alert_system.start(core)
+        alert = alert_system.add_alert(datetime.now() + timedelta(seconds=0.2), None)
+        assert wait_until(lambda: alert['triggered'])
+        assert (alert['triggered_at'] - alert['event_time']).total_seconds() < 0.25
+    finally:
+        alert_system.stop()
+        core.stop()
+
+
+def test_fired_alerts_are_logged_with_their_message(alert_system, caplog):
+    with caplog.at_level(logging.INFO, logger='BullionBell'):
+        alert_system.start()
+        alert = alert_system.add_alert(datetime.now(), None, message="USD Nonfarm Payrolls at 13:30 (nfp)")
+        assert wait_until(lambda: alert['triggered'] and caplog.records)
+    assert "USD Nonfarm Payrolls at 13:30 (nfp)" in caplog.records[0].getMessage()
+
+
+def test_sounds_are_played_on_the_dispatcher(alert_system, dispatcher):
+    alert_system.start()
+    alert_system.add_alert(datetime.now(), 'missing.wav')
+
+    assert wait_until(lambda: dispatcher.sink.played)
+    assert dispatcher.sink.played == ['missing.wav']
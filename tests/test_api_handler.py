@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import api.api_handler
+from api.api_handler import APIHandler
+
+PAGE = json.dumps({"data": (
+    '<table><tr><td id="theDay1727395200">Friday</td></tr>'
+    '<tr id="eventRowId_1"><td class="first left time">14:30</td>'
+    '<td class="left flagCur noWrap"><span title="United States"></span> USD</td>'
+    '<td class="left textNum sentiment noWrap" data-img_key="bull3"></td>'
+    '<td class="left event">Nonfarm Payrolls  (Sep)</td>'
+    '<td id="eventActual_1">254K</td><td id="eventForecast_1">147K</td><td id="eventPrevious_1">159K</td></tr>'
+    '</table>'
+)}).encode('utf-8')
+
+
+@pytest.fixture
+def stub_server():
+    """Local stand-in for the calendar service: every page is the same, with ETag "v1"."""
+    requests_seen = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def handle_request(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            requests_seen.append(dict(self.headers))
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        do_GET = do_POST = handle_request
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/"
+    server.requests_seen = requests_seen
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def handler(tmp_path):
+    handler = APIHandler(cache_dir=str(tmp_path / 'responses'))
+    yield handler
+    handler.close()
+
+
+def test_unchanged_responses_are_served_from_the_cache(handler, stub_server):
+    first = handler.get(stub_server.url, cache_key=['page', 0])
+    second = handler.get(stub_server.url, cache_key=['page', 0])
+
+    assert first == second == PAGE.decode('utf-8')
+    assert stub_server.requests_seen[1]['If-None-Match'] == '"v1"'
+    assert handler.stats['requests'] == 2
+    assert handler.stats['not_modified'] == 1
+
+
+def test_wrapper_fetches_and_parses_pages_offline(handler, stub_server):
+    pytest.importorskip('investpy')
+    from api.investpy_wrapper import InvestpyWrapper
+
+    wrapper = InvestpyWrapper(handler, url=stub_server.url, time_zone="GMT")
+    frame = wrapper.economic_calendar("27/09/2024", "28/09/2024")
+    # The service repeats its last page once there is nothing more, which ends pagination
+    assert frame.to_dict(orient='records') == [{
+        'id': '1', 'date': '27/09/2024', 'time': '14:30', 'zone': 'united states', 'currency': 'USD',
+        'importance': 'high', 'event': 'Nonfarm Payrolls  (Sep)', 'actual': '254K', 'forecast': '147K',
+        'previous': '159K',
+    }]
+    assert handler.stats['not_modified'] == 0
+
+    wrapper.economic_calendar("27/09/2024", "28/09/2024")
+    assert handler.stats['not_modified'] == 2  # Both pages revalidated without a body
+
+
+@pytest.mark.parametrize("seconds, name", [
+    (0, "GMT"), (3600, "GMT +1:00"), (-18000, "GMT -5:00"),
+    (19800, "GMT +5:30"), (34200, "GMT +9:30"), (-12600, "GMT -3:30"),
+])
+def test_gmt_offsets_are_named_like_investpy_including_half_hours(seconds, name):
+    investpy = pytest.importorskip('investpy')
+    from api.investpy_wrapper import gmt_offset_name
+
+    assert gmt_offset_name(seconds) == name
+    assert name in investpy.utils.constant.TIMEZONES
+
+
+def test_each_thread_has_its_own_session(handler):
+    sessions = []
+
+    def collect():
+        sessions.append(handler.session)
+        sessions.append(handler.session)
+
+    threads = [threading.Thread(target=collect) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(session) for session in sessions}) == 3
+    assert all(sessions[i] is sessions[i + 1] for i in range(0, len(sessions), 2))
+    assert len(handler.sessions) == 3
+    handler.close()
+    assert handler.sessions == []
+
+
+def write_entry(directory, name, size, mtime):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write('x' * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prune_drops_expired_then_least_recently_used(tmp_path):
+    handler = APIHandler(cache_dir=str(tmp_path), max_age_days=30, max_bytes=250)
+    now = 1_000_000_000
+    day = 86400
+    expired = write_entry(tmp_path, 'expired.json', 10, now - 31 * day)
+    oldest = write_entry(tmp_path, 'oldest.json', 100, now - 3 * day)
+    older = write_entry(tmp_path, 'older.json', 100, now - 2 * day)
+    newest = write_entry(tmp_path, 'newest.json', 100, now - day)
+
+    assert handler.prune(now) == 2
+    assert not os.path.exists(expired) and not os.path.exists(oldest)
+    assert os.path.exists(older) and os.path.exists(newest)
+    assert handler.stats['pruned'] == 2
+
+
+def test_revalidated_responses_count_as_recently_used(handler, stub_server):
+    handler.get(stub_server.url, cache_key=['page', 0])
+    path = handler.cache_path(['page', 0])
+    os.utime(path, (0, 0))
+
+    handler.get(stub_server.url, cache_key=['page', 0])  # 304
+    assert os.path.getmtime(path) > 0
+    assert handler.prune() == 0
+
+
+def test_the_cache_is_pruned_while_storing(tmp_path, stub_server, monkeypatch):
+    monkeypatch.setattr(api.api_handler, 'PRUNE_EVERY', 3)
+    handler = APIHandler(cache_dir=str(tmp_path), max_age_days=None, max_bytes=len(PAGE) * 2 + 500)
+    for page in range(3):
+        handler.get(stub_server.url, cache_key=['page', page])
+
+    assert handler.stats['pruned'] == 1
+    assert len(os.listdir(tmp_path)) == 2
+    assert not os.path.exists(handler.cache_path(['page', 0]))
+    handler.close()
@@ -0,0 +1,102 @@
+import queue
+import threading
+
+from tests.support import EmptyEngine, wait_until
+import utils.alert_rules
+from ui.app_services import AppServices
+from utils.cache_handler import CacheHandler
+
+
+class UIThread:
+    """Stand-in for the wx main loop: dispatched callbacks run when the test drains them."""
+    def __init__(self):
+        self.calls = queue.Queue()
+
+    def dispatch(self, callback, *args):
+        self.calls.put((callback, args))
+
+    def run_pending(self):
+        while True:
+            try:
+                callback, args = self.calls.get_nowait()
+            except queue.Empty:
+                return
+            callback(*args)
+
+
+def test_start_and_stop_leave_no_background_threads(dispatcher):
+    baseline = threading.active_count()
+    ui = UIThread()
+    refreshed = []
+    services = AppServices(dispatch=ui.dispatch, on_refresh=refreshed.append,
+                           cache_factory=lambda: CacheHandler(cache_file=None),
+                           fetch_engine=EmptyEngine(), dispatcher=dispatcher)
+    services.start()
+    assert wait_until(lambda: ui.run_pending() or services.refresh_service is not None)
+    assert services.alert_rules is not None
+    assert threading.active_count() > baseline
+
+    services.stop()
+    assert threading.active_count() == baseline
+
+
+def test_stopping_during_warm_up_never_starts_the_refresh_service(dispatcher):
+    ui = UIThread()
+    loaded = threading.Event()
+
+    def slow_cache():
+        loaded.wait(5)
+        return CacheHandler(cache_file=None)
+
+    services = AppServices(dispatch=ui.dispatch, cache_factory=slow_cache,
+                           fetch_engine=EmptyEngine(), dispatcher=dispatcher)
+    services.start()
+    loaded.set()
+    services.stop()
+    ui.run_pending()
+
+    assert services.refresh_service is None
+
+
+def test_refreshed_records_are_merged_on_the_ui_thread(dispatcher):
+    ui = UIThread()
+    refreshed = []
+    services = AppServices(dispatch=ui.dispatch, on_refresh=refreshed.append,
+                           cache_factory=lambda: CacheHandler(cache_file=None),
+                           fetch_engine=EmptyEngine(), dispatcher=dispatcher).start()
+    record = {'id': '1', 'date': '04/10/2024', 'time': '14:30', 'importance': 'high', 'actual': '0.3%'}
+    # As the refresh service hands over a fetched chunk from the core
+    services.core.call_soon(services.core.to_ui, services.merge_refresh, [record])
+    assert wait_until(lambda: ui.run_pending() or refreshed)
+    assert services.get_cache_handler().records_by_id['1'] == record
+    services.stop()
+
+
+def test_the_initial_rule_ingest_holds_the_cache_lock(dispatcher, monkeypatch):
+    cache = CacheHandler(cache_file=None)
+    locked = []
+    ingest = utils.alert_rules.AlertRules.ingest
+
+    def probe():
+        # Another thread, like the UI merging a refresh, must not get in
+        if cache.lock.acquire(blocking=False):
+            cache.lock.release()
+            locked.append(False)
+        else:
+            locked.append(True)
+
+    def checked_ingest(rules, records, initial=False):
+        if initial:
+            other = threading.Thread(target=probe)
+            other.start()
+            other.join()
+        return ingest(rules, records, initial)
+
+    monkeypatch.setattr(utils.alert_rules.AlertRules, 'ingest', checked_ingest)
+    services = AppServices(dispatch=UIThread().dispatch, cache_factory=lambda: cache,
+                           fetch_engine=EmptyEngine(), dispatcher=dispatcher).start()
+    services.warmup_thread.join()
+    services.stop()
+
+    assert locked == [True]
+    assert cache.listeners and cache.eviction_listeners  # Listening from the same locked section
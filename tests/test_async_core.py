@@ -0,0 +1,52 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from db.fetch_coordinator import FetchCoordinator
+from db.refresh_service import RefreshService, SimulatedClock
+from tests.support import EmptyEngine, VirtualTimeLoop
+from utils.alert_system import AlertSystem
+from utils.async_core import AsyncCore
+from utils.cache_handler import CacheHandler
+from utils.internal_timer import InternalTimer, ManualClock
+
+START = 1727740800.4  # 0.4 s past a minute boundary
+MINUTES = 10
+
+
+def test_idle_services_wake_only_for_clock_ticks(dispatcher):
+    clock = ManualClock(START)
+    refresh_clock = SimulatedClock(datetime.fromtimestamp(START), datetime.max)
+    loop = VirtualTimeLoop(clock, refresh_clock)
+    ticks = []
+
+    async def idle():
+        # As the desktop app between releases: a seconds clock, an alert an hour away, hourly refreshes
+        core = AsyncCore(loop=loop)
+        timer = InternalTimer(clock)
+        timer.subscribe(ticks.append, resolution=1)
+        timer.subscribe(lambda tick: None, resolution=15)
+        alerts = AlertSystem(dispatcher)
+        alerts.add_alert(datetime.now() + timedelta(hours=1), None)
+        service = RefreshService(CacheHandler(cache_file=None), FetchCoordinator(EmptyEngine(), core=core),
+                                 on_update=lambda records: None, clock=refresh_clock)
+        for component in (timer, alerts, service):
+            component.start(core)
+        await asyncio.sleep(0.5)  # Let the first refresh complete
+        assert service.fetch_count == 1
+
+        ticks.clear()
+        wakeups = loop.wakeups
+        await asyncio.sleep(MINUTES * 60)
+        wakeups = loop.wakeups - wakeups
+        for component in (service, alerts, timer):
+            component.stop()
+        await core.aclose()
+        return wakeups
+
+    try:
+        wakeups = loop.run_until_complete(idle())
+    finally:
+        loop.close()
+    assert len(ticks) == MINUTES * 60
+    # One wakeup per second boundary, shared by both subscribers; nothing else polls
+    assert wakeups / MINUTES <= 61
@@ -0,0 +1,129 @@
+import logging
+import sys
+import threading
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.support import wait_until
+from utils.alert_system import AlertSystem
+from utils.audio_dispatcher import AudioDispatcher, NullSink, WinsoundSink
+
+
+def test_samples_are_read_once(dispatcher, tmp_path):
+    sound = tmp_path / 'bell.wav'
+    sound.write_bytes(b'RIFF first')
+    sample = dispatcher.preload(str(sound))
+    sound.write_bytes(b'RIFF second')
+
+    assert dispatcher.preload(str(sound)) is sample
+    assert sample['data'] == b'RIFF first'
+
+
+def test_missing_sound_is_logged_and_still_dispatched(dispatcher, caplog):
+    with caplog.at_level(logging.ERROR, logger='BullionBell'):
+        sample = dispatcher.preload('missing.wav')
+    assert sample['data'] is None
+    assert "missing.wav" in caplog.text
+
+    dispatcher.dispatch('missing.wav')
+    assert wait_until(lambda: dispatcher.sink.played)
+    assert dispatcher.sink.played == ['missing.wav']
+
+
+def test_adding_an_alert_reads_its_sound_on_the_worker(dispatcher, tmp_path, monkeypatch):
+    sound = tmp_path / 'bell.wav'
+    sound.write_bytes(b'RIFF bell')
+    readers = []
+    preload = dispatcher.preload
+    monkeypatch.setattr(dispatcher, 'preload', lambda path: readers.append(threading.current_thread()) or preload(path))
+    AlertSystem(dispatcher).add_alert(datetime.now() + timedelta(hours=1), str(sound))
+    dispatcher.stop()
+
+    assert readers == [dispatcher.thread]
+    assert dispatcher.samples[str(sound)]['data'] == b'RIFF bell'
+    assert dispatcher.sink.played == []
+
+def test_repeats_in_one_dispatch_play_once(dispatcher):
+    dispatcher.dispatch('a.wav', 'b.wav', 'a.wav')
+    dispatcher.stop()
+
+    assert dispatcher.sink.played == ['a.wav', 'b.wav']
+    assert len(dispatcher.latencies) == 2
+
+
+def test_alerts_due_together_play_their_sound_once(dispatcher):
+    alert_system = AlertSystem(dispatcher)
+    now = datetime.now()
+    # All due before the scheduler starts, so they fire as one batch
+    for _ in range(5):
+        alert_system.add_alert(now, 'bell.wav')
+    alert_system.add_alert(now, 'chime.wav')
+    alert_system.start()
+
+    assert wait_until(lambda: len(dispatcher.sink.played) == 2)
+    alert_system.stop()
+    dispatcher.stop()
+    assert dispatcher.sink.played == ['bell.wav', 'chime.wav']
+
+
+def test_alerts_due_apart_play_again(dispatcher):
+    alert_system = AlertSystem(dispatcher)
+    alert_system.start()
+    base = datetime.now() + timedelta(seconds=0.1)
+    alert_system.add_alert(base, 'bell.wav')
+    alert_system.add_alert(base + timedelta(seconds=0.3), 'bell.wav')
+
+    assert wait_until(lambda: len(dispatcher.sink.played) == 2)
+    alert_system.stop()
+
+
+def test_a_failing_sink_does_not_stop_the_worker(caplog):
+    class FlakySink(NullSink):
+        def play(self, sample):
+            if sample['path'] == 'broken.wav':
+                raise RuntimeError("no audio device")
+            super().play(sample)
+
+    dispatcher = AudioDispatcher(FlakySink())
+    with caplog.at_level(logging.ERROR, logger='BullionBell'):
+        dispatcher.dispatch('broken.wav')
+        dispatcher.dispatch('bell.wav')
+        dispatcher.stop()
+
+    assert dispatcher.sink.played == ['bell.wav']
+    assert "no audio device" in caplog.text
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    """Stand-ins for the winsound and playsound modules that record what they were asked to play."""
+    played = []
+    winsound = types.SimpleNamespace(SND_MEMORY=4, PlaySound=lambda data, flags: played.append(('winsound', data)))
+    playsound = types.SimpleNamespace(playsound=lambda path: played.append(('playsound', path)))
+    monkeypatch.setitem(sys.modules, 'winsound', winsound)
+    monkeypatch.setitem(sys.modules, 'playsound', playsound)
+    return played
+
+
+def test_wav_samples_play_from_memory_and_others_through_playsound(backends, tmp_path):
+    wav = tmp_path / 'bell.wav'
+    wav.write_bytes(b'RIFF\x24\x00\x00\x00WAVEfmt ')
+    mp3 = tmp_path / 'bell.mp3'
+    mp3.write_bytes(b'ID3\x04\x00')
+    dispatcher = AudioDispatcher(WinsoundSink())
+    dispatcher.dispatch(str(wav), str(mp3), 'missing.mp3')
+    dispatcher.stop()
+
+    # A sample that failed to load is not read again
+    assert backends == [('winsound', wav.read_bytes()), ('playsound', str(mp3))]
+
+
+def test_latencies_keep_only_recent_playbacks(dispatcher):
+    for i in range(dispatcher.latencies.maxlen + 10):
+        dispatcher.dispatch(f'{i}.wav')
+    dispatcher.stop()
+
+    assert len(dispatcher.sink.played) == dispatcher.latencies.maxlen + 10
+    assert len(dispatcher.latencies) == dispatcher.latencies.maxlen
@@ -0,0 +1,65 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+BASE = datetime(2024, 1, 1)
+
+
+def event(i, day):
+    return {"id": str(i), "date": (BASE + timedelta(days=day)).strftime('%d/%m/%Y'), "time": "14:30",
+            "event": f"Event {i}"}
+
+
+def linear_scan(records, start_date, end_date):
+    """The lookup CacheHandler.get_cached_data did before the date index."""
+    return [r for r in records if start_date <= datetime.strptime(r['date'], '%d/%m/%Y') <= end_date]
+
+
+def ids(records):
+    return sorted(record['id'] for record in records)
+
+
+@pytest.fixture
+def records():
+    rng = random.Random(2)
+    return [event(i, rng.randrange(60)) for i in range(500)]
+
+
+@pytest.mark.parametrize("start, end", [
+    (BASE, BASE + timedelta(days=8)),
+    (BASE + timedelta(days=10, hours=12), BASE + timedelta(days=18)),  # Time of day on the start
+    (BASE + timedelta(days=20, minutes=1), BASE + timedelta(days=21, hours=23)),
+    (BASE + timedelta(days=30), BASE + timedelta(days=30)),  # Same day
+    (BASE + timedelta(days=30), BASE + timedelta(days=30, hours=18)),
+    (BASE + timedelta(days=30, hours=6), BASE + timedelta(days=30, hours=18)),  # Same day, after midnight
+    (BASE - timedelta(days=5), BASE - timedelta(days=1)),  # Before every record
+    (BASE + timedelta(days=59), BASE + timedelta(days=90)),
+])
+def test_the_index_returns_the_rows_of_a_linear_scan(memory_cache, records, start, end):
+    memory_cache.add_to_cache(records)
+    assert ids(memory_cache.get_cached_data(start, end)) == ids(linear_scan(records, start, end))
+
+
+def test_records_added_later_are_found_like_a_linear_scan(memory_cache, records):
+    memory_cache.add_to_cache(records)
+    # Small batches are inserted into the index in place, large ones rebuild it
+    later = [event(1000 + i, 25 + i % 10) for i in range(20)]
+    memory_cache.add_to_cache(later[:3])
+    memory_cache.add_to_cache(later[3:])
+    moved = dict(records[0], date=(BASE + timedelta(days=26)).strftime('%d/%m/%Y'))
+    memory_cache.add_to_cache([moved])
+
+    everything = [moved] + records[1:] + later
+    for start, end in [(BASE + timedelta(days=25), BASE + timedelta(days=34)),
+                       (BASE + timedelta(days=26, hours=9), BASE + timedelta(days=26, hours=9)),
+                       (BASE + timedelta(days=26), BASE + timedelta(days=26)),
+                       (BASE, BASE + timedelta(days=60))]:
+        assert ids(memory_cache.get_cached_data(start, end)) == ids(linear_scan(everything, start, end))
+
+
+def test_lookups_are_in_date_order(memory_cache, records):
+    memory_cache.add_to_cache(records)
+    found = memory_cache.get_cached_data(BASE, BASE + timedelta(days=60))
+    days = [datetime.strptime(r['date'], '%d/%m/%Y') for r in found]
+    assert days == sorted(days)
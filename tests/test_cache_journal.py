@@ -0,0 +1,116 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import utils.cache_journal
+from utils.cache_handler import CacheHandler
+from utils.cache_journal import CacheJournal, atomic_write_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def event(i, actual=None):
+    return {"id": str(i), "date": "04/10/2024", "time": "14:30", "zone": "united states", "currency": "USD",
+            "importance": "high", "event": f"Event {i}", "actual": actual, "forecast": "0.2%", "previous": "0.1%"}
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    path = str(tmp_path / "cache.json")
+    atomic_write_json(path, {"data": [event(i) for i in range(10)]})
+    return path
+
+
+def test_reopening_sees_every_journaled_change(cache_path):
+    handler = CacheHandler(cache_path, journaled=True)
+    handler.add_to_cache([event(0, "1.0%"), event(20, "2.0%")])
+    handler.close()
+
+    reopened = CacheHandler(cache_path, journaled=True)
+    assert reopened.records_by_id["0"]["actual"] == "1.0%"
+    assert reopened.records_by_id["20"]["actual"] == "2.0%"
+    reopened.close()
+
+
+def test_a_torn_line_and_a_leftover_rotated_journal_are_recovered(cache_path):
+    handler = CacheHandler(cache_path, journaled=True)
+    handler.add_to_cache([event(0, "1.0%")])
+    handler.close()
+    # Crash mid-append
+    with open(f"{cache_path}.journal", 'a') as f:
+        f.write('{"op": "upsert", "record": {"id": "0", "act')
+    # Crash mid-compaction: a rotated journal that never made it into the snapshot
+    with open(f"{cache_path}.journal.old", 'w') as f:
+        f.write(json.dumps({'op': 'upsert', 'record': event(1, "2.0%")}) + "\n")
+
+    recovered = CacheHandler(cache_path, journaled=True)
+    assert recovered.records_by_id["0"]["actual"] == "1.0%"
+    assert recovered.records_by_id["1"]["actual"] == "2.0%"
+    recovered.add_to_cache([event(2, "3.0%")])
+    recovered.close()
+    assert not os.path.exists(f"{cache_path}.journal.old")
+
+    reopened = CacheHandler(cache_path, journaled=True)
+    assert [reopened.records_by_id[str(i)]["actual"] for i in range(3)] == ["1.0%", "2.0%", "3.0%"]
+    reopened.close()
+
+
+def test_entries_after_a_torn_rotated_journal_survive(cache_path):
+    # A crash left a torn rotated journal, and the journal after it holds newer entries
+    with open(f"{cache_path}.journal.old", 'w') as f:
+        f.write(json.dumps({'op': 'upsert', 'record': event(1, "1.0%")}) + "\n")
+        f.write('{"op": "upsert", "rec')
+    with open(f"{cache_path}.journal", 'w') as f:
+        f.write(json.dumps({'op': 'upsert', 'record': event(2, "2.0%")}) + "\n")
+    journal = CacheJournal(cache_path)
+    journal.rotate(list)  # Merges the journal into the rotated one, as a compaction does
+
+    records = journal.replay([event(i) for i in range(10)])
+    assert [record["actual"] for record in records[1:3]] == ["1.0%", "2.0%"]
+
+
+def test_startup_compacts_in_the_background(cache_path, monkeypatch):
+    handler = CacheHandler(cache_path, journaled=True)
+    handler.add_to_cache([event(0, "1.0%")])
+    handler.close()
+    writers = []
+    write_snapshot = CacheJournal.write_snapshot
+    monkeypatch.setattr(CacheJournal, 'write_snapshot',
+                        lambda journal, records: writers.append(threading.current_thread())
+                        or write_snapshot(journal, records))
+
+    reopened = CacheHandler(cache_path, journaled=True)
+    reopened.close()
+    assert writers and threading.main_thread() not in writers
+    assert reopened.records_by_id["0"]["actual"] == "1.0%"
+    assert not os.path.exists(f"{cache_path}.journal.old")
+
+
+def test_renames_are_made_durable(cache_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(utils.cache_journal, 'fsync_directory', synced.append)
+    handler = CacheHandler(cache_path, journaled=True)
+    handler.add_to_cache([event(0, "1.0%")])
+    handler.journal.compact(handler.snapshot_records)
+    handler.close()
+
+    assert cache_path in synced  # The snapshot rename
+    assert f"{cache_path}.journal" in synced  # Rotating the journal aside
+    assert f"{cache_path}.journal.old" in synced  # Removing it once folded in
+
+
+def test_an_open_journal_is_closed_at_exit(cache_path):
+    script = (
+        "import atexit\n"
+        "from utils.cache_handler import CacheHandler\n"
+        f"handler = CacheHandler({cache_path!r}, journaled=True)\n"
+        # Registered before the journal opens, so it runs after the journal's own exit hook
+        "atexit.register(lambda: print('closed' if handler.journal.handle is None else 'open'))\n"
+        "handler.add_to_cache([{'id': '0', 'date': '04/10/2024', 'actual': '1.0%'}])\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == "closed", result.stderr
@@ -0,0 +1,75 @@
+import json
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+import utils.cache_handler
+from utils.cache_handler import CacheHandler
+from utils.cache_journal import atomic_write_json
+from utils.cache_retention import RetentionPolicy
+
+TODAY = datetime(2024, 10, 4)
+
+
+def event(i, day, actual="0.3%"):
+    return {"id": str(i), "date": day.strftime('%d/%m/%Y'), "time": "14:30", "zone": "united states",
+            "currency": "USD", "importance": "high", "event": f"Event {i}", "actual": actual,
+            "forecast": "0.2%", "previous": "0.1%"}
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    # Ten events a day for the last 30 days
+    records = [event(i, TODAY - timedelta(days=i // 10)) for i in range(300)]
+    path = str(tmp_path / "cache.json")
+    atomic_write_json(path, {"data": records})
+    return path
+
+
+def test_old_days_move_to_the_archive_and_stay_readable(cache_path):
+    handler = CacheHandler(cache_path, retention=RetentionPolicy(max_records=100))
+    assert len(handler.sorted_records) == 100
+    assert handler.stats['evictions'] == handler.stats['archived'] == 200
+
+    week = handler.get_cached_data(TODAY - timedelta(days=20), TODAY - timedelta(days=14))
+    assert len(week) == 70
+    assert handler.stats['archive_lookups'] == 1
+    handler.get_cached_data(TODAY - timedelta(days=2), TODAY)
+    assert handler.stats['hot_lookups'] == 1
+
+
+def test_pending_records_are_dropped_rather_than_archived(tmp_path):
+    path = str(tmp_path / "cache.json")
+    atomic_write_json(path, {"data": [event(0, TODAY - timedelta(days=200), actual=None),
+                                      event(1, TODAY - timedelta(days=200)), event(2, TODAY)]})
+    handler = CacheHandler(path, retention=RetentionPolicy(max_age_days=90))
+    handler.enforce_retention(today=TODAY)
+
+    old = handler.get_cached_data(TODAY - timedelta(days=201), TODAY - timedelta(days=199))
+    assert [record['id'] for record in old] == ["1"]
+
+
+def test_listeners_never_see_records_evicted_by_the_same_merge(cache_path):
+    handler = CacheHandler(cache_path, retention=RetentionPolicy(max_records=100))
+    merged = []
+    handler.add_listener(merged.extend)
+    handler.add_to_cache([event(1000, TODAY - timedelta(days=25)), event(1001, TODAY)])
+
+    assert [record['id'] for record in merged] == ["1001"]
+    assert "1000" not in handler.records_by_id
+
+
+def test_record_size_is_sampled_once_per_index_build(monkeypatch):
+    dumps = []
+    monkeypatch.setattr(utils.cache_handler, 'json',
+                        types.SimpleNamespace(dumps=lambda record: dumps.append(record) or json.dumps(record)))
+    handler = CacheHandler(cache_file=None, retention=RetentionPolicy(max_bytes=10 ** 9))
+    handler.add_to_cache([event(i, TODAY) for i in range(100)])
+    sampled = len(dumps)
+    for i in range(100, 120):
+        handler.add_to_cache([event(i, TODAY)])
+    handler.cache_stats()
+
+    assert sampled
+    assert len(dumps) == sampled  # Later merges reuse the sampled size
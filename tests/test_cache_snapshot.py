@@ -0,0 +1,195 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import utils.cache_handler
+from utils.cache_handler import HOT_DAYS, CacheHandler
+from utils.cache_journal import atomic_write_json
+from utils.cache_retention import RetentionPolicy
+from utils.cache_snapshot import SnapshotReader, convert, export, read_snapshot, write_snapshot
+from utils.value_parser import synthetic_calendar
+
+CACHE_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'utils', 'cache.json')
+
+
+def day_of(record):
+    return date(*map(int, reversed(record['date'].split('/')))).toordinal()
+
+
+def calendar():
+    records = synthetic_calendar(days=30, events_per_day=40)
+    for i, record in enumerate(records):
+        record['id'] = str(400000 + i)
+    return records
+
+
+def shipped_cache():
+    with open(CACHE_JSON, 'r') as f:
+        return json.load(f)['data']
+
+
+@pytest.mark.parametrize('load', [calendar, shipped_cache])
+def test_records_round_trip_through_a_snapshot(tmp_path, load):
+    records = load()
+    path = str(tmp_path / 'cache.snap')
+    write_snapshot(path, records)
+    expected = sorted(records, key=day_of)
+    assert read_snapshot(path) == expected
+
+    # A range query reads only the rows dated in it
+    first = day_of(expected[len(expected) // 2])
+    reader = SnapshotReader(path)
+    try:
+        assert reader.records(first, first + 6) == [record for record in expected
+                                                   if first <= day_of(record) <= first + 6]
+    finally:
+        reader.close()
+
+    # And a JSON export converts back to the same snapshot
+    json_path = str(tmp_path / 'exported.json')
+    export(path, json_path)
+    convert(json_path, path)
+    assert read_snapshot(path) == expected
+
+
+def test_ids_that_are_not_strings_are_rejected(tmp_path):
+    records = calendar()[:3]
+    records[1]['id'] = 12345
+    with pytest.raises(TypeError):
+        write_snapshot(str(tmp_path / 'cache.snap'), records)
+
+
+@pytest.mark.parametrize('journaled', [False, True])
+def test_converting_folds_in_and_removes_the_json_journal(tmp_path, journaled):
+    records = calendar()[:50]
+    json_path = str(tmp_path / 'cache.json')
+    atomic_write_json(json_path, {"data": records})
+    with open(f"{json_path}.journal", 'w') as f:
+        f.write(json.dumps({'op': 'upsert', 'record': dict(records[0], actual='1.0%')}) + "\n")
+
+    converted = CacheHandler(json_path, journaled=journaled, snapshot=True)
+    assert converted.records_by_id[records[0]['id']]['actual'] == '1.0%'
+    assert not os.path.exists(f"{json_path}.journal")
+    assert os.path.exists(str(tmp_path / 'cache.snap'))
+    converted.add_to_cache([dict(records[0], actual='2.0%')])
+    converted.close()
+
+    # The old journal is not replayed over newer changes on the next start
+    reopened = CacheHandler(json_path, journaled=journaled, snapshot=True)
+    assert not reopened.converted
+    # Past days are read from the mapped snapshot rather than loaded
+    by_id = {record['id']: record for record in reopened.snapshot_records()}
+    assert by_id[records[0]['id']]['actual'] == '2.0%'
+    reopened.close()
+
+
+@pytest.fixture
+def history(tmp_path):
+    """A snapshot of 20 events a day from 60 days ago to 10 days ahead; returns (cache.json path, records)."""
+    today = datetime.combine(date.today(), datetime.min.time())
+    records = [{"id": str(i), "date": (today + timedelta(days=i // 20 - 60)).strftime('%d/%m/%Y'), "time": "14:30",
+                "zone": "united states", "currency": "USD", "importance": "high", "event": f"Event {i}", "actual": "0.1%", "forecast": "0.2%",
+                "previous": "0.1%"} for i in range(71 * 20)]
+    write_snapshot(str(tmp_path / 'cache.snap'), records)
+    return str(tmp_path / 'cache.json'), records
+
+
+def in_range(records, start, end):
+    return [record for record in records if start.toordinal() <= day_of(record) <= end.toordinal()]
+
+
+def by_day(records):
+    """Records in date order; the order within a day is not kept across merges."""
+    return sorted(records, key=lambda record: (day_of(record), record['id']))
+
+
+def test_opening_a_snapshot_decodes_only_the_recent_days(history, monkeypatch):
+    path, records = history
+    decoded = []
+    table = SnapshotReader.table
+    monkeypatch.setattr(SnapshotReader, 'table', lambda reader, *days: decoded.append(table(reader, *days)) or decoded[-1])
+
+    handler = CacheHandler(path, journaled=True, snapshot=True)
+    today = datetime.combine(date.today(), datetime.min.time())
+    assert len(handler.sorted_records) == (HOT_DAYS + 11) * 20
+    assert sum(len(rows) for rows in decoded) == len(handler.sorted_records) < len(records)
+
+    # A past week is read from the file; the days around today are not
+    week = (today - timedelta(days=40), today - timedelta(days=34))
+    assert handler.get_cached_data(*week) == in_range(records, *week)
+    assert [len(rows) for rows in decoded[1:]] == [7 * 20]
+    assert len(handler.get_cached_data(today - timedelta(days=1), today + timedelta(days=7))) == 9 * 20
+    assert len(decoded) == 2
+    assert handler.stats['unloaded_lookups'] == 1
+    # A range across both reads each day once
+    assert handler.get_cached_data(today - timedelta(days=60), today + timedelta(days=10)) == records
+    handler.close()
+
+
+def test_merged_records_take_the_place_of_the_mapped_ones(history):
+    path, records = history
+    today = datetime.combine(date.today(), datetime.min.time())
+    month = (today - timedelta(days=60), today - timedelta(days=30))
+    handler = CacheHandler(path, journaled=True, snapshot=True)
+    handler.add_to_cache([dict(records[0], actual="0.3%"), dict(records[1], actual="0.4%"),
+                          dict(records[2], id="new")])
+    expected = by_day([dict(records[0], actual="0.3%"), dict(records[1], actual="0.4%"), dict(records[2], id="new")]
+                      + in_range(records, *month)[2:])
+    assert by_day(handler.get_cached_data(*month)) == expected
+    handler.close()
+
+    # The journal replays over the mapped days, and a compaction writes each record once
+    reopened = CacheHandler(path, journaled=True, snapshot=True)
+    assert by_day(reopened.get_cached_data(*month)) == expected
+    reopened.journal.compact(reopened.snapshot_records)
+    assert by_day(in_range(read_snapshot(f"{os.path.splitext(path)[0]}.snap"), *month)) == expected
+    assert by_day(reopened.get_cached_data(*month)) == expected
+    reopened.close()
+
+
+def test_a_compaction_writes_the_snapshot_without_holding_the_cache_lock(history, monkeypatch):
+    path, records = history
+    today = datetime.combine(date.today(), datetime.min.time())
+    month = (today - timedelta(days=60), today - timedelta(days=30))
+    handler = CacheHandler(path, journaled=True, snapshot=True)
+    handler.add_to_cache([dict(records[0], actual="0.3%")])
+    expected = by_day([dict(records[0], actual="0.3%")] + in_range(records, *month)[1:])
+
+    reads = []
+    stage = utils.cache_handler.stage_snapshot
+
+    def staging(*args):
+        # Another thread reads the cache while the file is written
+        pool = ThreadPoolExecutor(1)
+        try:
+            reads.append(pool.submit(handler.get_cached_data, *month).result(timeout=5))
+        finally:
+            pool.shutdown(wait=False)
+        return stage(*args)
+
+    monkeypatch.setattr(utils.cache_handler, 'stage_snapshot', staging)
+    handler.journal.compact(handler.snapshot_records)
+    assert [by_day(read) for read in reads] == [expected]
+    assert by_day(handler.get_cached_data(*month)) == expected
+    assert not os.path.exists(f"{os.path.splitext(path)[0]}.snap.tmp")
+    handler.close()
+
+def test_days_past_max_age_leave_a_mapped_snapshot(history):
+    path, records = history
+    today = datetime.combine(date.today(), datetime.min.time())
+    handler = CacheHandler(path, journaled=True, snapshot=True, retention=RetentionPolicy(max_age_days=30))
+    assert handler.stats['archived'] == 30 * 20
+    assert len(handler.sorted_records) == (HOT_DAYS + 11) * 20
+    everything = handler.get_cached_data(today - timedelta(days=60), today + timedelta(days=10))
+    assert sorted(everything, key=lambda record: int(record['id'])) == records
+    handler.close()
+
+    reopened = CacheHandler(path, journaled=True, snapshot=True, retention=RetentionPolicy(max_age_days=30))
+    assert reopened.stats['evictions'] == 0
+    reopened.clear_cache()
+    assert reopened.get_cached_data(today - timedelta(days=29), today + timedelta(days=10)) == []
+    reopened.close()
+    assert CacheHandler(path, journaled=True, snapshot=True).snapshot_records() == []
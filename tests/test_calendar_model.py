@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+
+from ui.calendar_model import COLUMNS, DATA_KEYS, CalendarTableModel
+from utils.countdown import CountdownEngine
+from utils.event_search import EventIndex
+from utils.event_table import EventTable
+from utils.record_diff import diff_records
+from utils.value_parser import ValueAnalyzer
+
+KEYS = [key for _, key in COLUMNS]
+
+
+def event(i, date="04/10/2024", time="14:30", currency="USD", importance="high", name="CPI m/m", actual=None):
+    return {"id": str(i), "date": date, "time": time, "zone": "united states", "currency": currency,
+            "importance": importance, "event": name, "actual": actual, "forecast": "0.2%", "previous": "0.1%"}
+
+
+def column(model, key):
+    col = KEYS.index(key)
+    return [model.value(row, col) for row in range(model.number_rows())]
+
+
+def test_cells_show_the_record_values_and_na_for_blanks():
+    model = CalendarTableModel([event(1, actual="0.3%"), event(2, actual=""), {"no": "id"}, "junk"])
+    assert model.number_rows() == 2
+    assert model.number_cols() == len(COLUMNS)
+    assert [model.col_label(col) for col in range(model.number_cols())][-1] == "Countdown"
+    assert [model.value(0, col) for col in range(len(DATA_KEYS))] == [
+        "04/10/2024", "14:30", "united states", "USD", "high", "CPI m/m", "0.3%", "0.2%", "0.1%"]
+    assert column(model, 'actual') == ["0.3%", "N/A"]
+    assert model.raw_value(1, KEYS.index('actual')) == ""
+
+
+def test_a_table_shows_the_same_cells_as_its_records():
+    records = [event(1, actual="0.3%"), event(2, currency="EUR", importance=None)]
+    from_records = CalendarTableModel(records)
+    from_table = CalendarTableModel()
+    from_table.set_table(EventTable.from_records(records))
+    for key in KEYS:
+        assert column(from_table, key) == column(from_records, key)
+    assert from_table.records() == from_records.records()
+
+
+def test_rows_keep_the_order_of_a_sorted_table():
+    records = [event(1, "05/10/2024", "08:00"), event(2, "04/10/2024", "16:00"), event(3, "04/10/2024", "09:15")]
+    model = CalendarTableModel()
+    model.set_table(EventTable.from_records(records).sort())
+    assert model.ids == ["3", "2", "1"]
+    assert column(model, 'time') == ["09:15", "16:00", "08:00"]
+
+
+def test_a_release_merged_late_is_shown_in_time_order(memory_cache):
+    memory_cache.add_to_cache([event(1, time="09:00"), event(2, time="14:00"), event(3, "05/10/2024", "07:00")])
+    memory_cache.add_to_cache([event(4, time="08:30")])
+    window = memory_cache.get_cached_table(datetime(2024, 10, 4), datetime(2024, 10, 5))
+    assert list(window.ids) == ["1", "2", "4", "3"]  # The cache keeps days, not times, in order
+
+    model = CalendarTableModel()
+    model.set_table(window.sort())
+    assert model.ids == ["4", "1", "2", "3"]
+
+def test_a_diff_against_the_sorted_window_inserts_an_earlier_release_above(memory_cache):
+    memory_cache.add_to_cache([event(1, time="09:00"), event(2, time="14:00"), event(3, "05/10/2024", "07:00")])
+    start, end = datetime(2024, 10, 4), datetime(2024, 10, 5)
+    model = CalendarTableModel()
+    model.set_table(memory_cache.get_cached_table(start, end).sort())
+
+    memory_cache.add_to_cache([event(4, time="08:30"), event(2, time="14:00", actual="0.3%")])
+    new = memory_cache.get_cached_table(start, end).sort()
+    diff = diff_records(model.records(), new.to_records())
+    model.apply_diff(diff)
+    assert diff['inserts'] == [(0, new.to_records()[0])] and not diff['deletes']
+    assert model.ids == ["4", "1", "2", "3"]
+    assert column(model, 'time') == ["08:30", "09:00", "14:00", "07:00"]
+    assert model.highlighted == {("2", 'actual')}
+
+def test_a_filtered_table_replaces_the_rows():
+    table = EventTable.from_records([event(1), event(2, currency="EUR", name="German ZEW"),
+                                     event(3, importance="low", name="CPI y/y")])
+    model = CalendarTableModel()
+    model.set_table(EventIndex(table).filter_table(text="cpi", min_importance="medium"))
+    assert model.ids == ["1"]
+    model.set_table(EventIndex(table).filter_table(currencies={"EUR"}))
+    assert column(model, 'event') == ["German ZEW"]
+
+
+def test_row_edits_keep_the_columns_aligned():
+    model = CalendarTableModel([event(1), event(2), event(3)])
+    model.delete_row(1)
+    model.insert_record(0, event(4, currency="JPY"))
+    model.update_record(2, event(3, actual="1.0%"))
+    assert model.ids == ["4", "1", "3"]
+    assert column(model, 'currency') == ["JPY", "USD", "USD"]
+    assert column(model, 'actual') == ["N/A", "N/A", "1.0%"]
+
+    model.highlighted = {("3", 'actual')}
+    assert model.is_highlighted(2, KEYS.index('actual'))
+    assert not model.is_highlighted(2, KEYS.index('forecast'))
+
+
+def test_widest_sample_measures_every_row_of_a_small_table():
+    model = CalendarTableModel([event(i, name="x" * (i % 7)) for i in range(50)])
+    assert model.widest_sample(KEYS.index('event')) == "x" * 6
+    assert CalendarTableModel().widest_sample(0) == ''
+
+
+def test_widest_sample_of_a_large_table_looks_at_a_bounded_sample():
+    model = CalendarTableModel([event(i, name="Event") for i in range(5000)])
+    model.columns['event'][10] = "A much longer event name"  # Among the first rows, always sampled
+    calls = []
+    value = model.value
+    model.value = lambda row, col: calls.append(row) or value(row, col)
+    assert model.widest_sample(KEYS.index('event'), sample_size=100) == "A much longer event name"
+    assert len(calls) == 100
+
+
+def test_the_countdown_column_comes_from_the_countdown_engine():
+    records = [event(1, time="14:30"), event(2, time="All Day"), event(3, date="01/10/2024")]
+    model = CalendarTableModel(records)
+    assert column(model, 'countdown') == ["", "", ""]
+    assert model.raw_value(0, KEYS.index('countdown')) is None
+
+    engine = CountdownEngine(zone="UTC")
+    engine.ingest_table(EventTable.from_records(records))
+    model.countdown_engine = engine
+    model.now = datetime(2024, 10, 4, 12, 15, tzinfo=timezone.utc).timestamp()
+    assert column(model, 'countdown') == ["2h 15m", "", "Released"]
+
+
+def test_the_surprise_column_comes_from_the_value_analyzer():
+    records = [event(1, actual="0.3%"), event(2, actual=None), event(3, name="Payrolls", actual="250K")]
+    records[2]['forecast'] = "200K"
+    model = CalendarTableModel(records)
+    assert column(model, 'surprise') == ["", "", ""]
+
+    model.surprises = ValueAnalyzer().surprises(EventTable.from_records(records))
+    assert column(model, 'surprise') == ["+0.1", "", "+50K"]
+    assert model.raw_value(0, KEYS.index('surprise')) is None
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+import utils.countdown
+from utils.countdown import CountdownEngine, fetch_utc_offset, release_time
+from utils.event_table import EventTable
+
+
+@pytest.mark.parametrize("zone, moment, offset", [
+    ('Europe/London', datetime(2024, 1, 15, 12), 0),
+    ('Europe/London', datetime(2024, 7, 15, 12), 3600),
+    ('Asia/Kolkata', datetime(2024, 7, 15, 12), 19800),
+    ('Asia/Kathmandu', datetime(2024, 7, 15, 12), 19800),  # +5:45, truncated like investpy's offsets
+    ('America/St_Johns', datetime(2024, 1, 15, 12), -12600),
+])
+def test_the_fetch_offset_is_the_local_offset_to_the_half_hour(local_zone, zone, moment, offset):
+    local_zone(zone)
+    assert fetch_utc_offset(moment) == offset
+
+
+def test_release_times_across_a_dst_change_use_the_fetch_offset(local_zone):
+    local_zone('Europe/London')
+    # Fetched in winter as GMT: 12:30 GMT on a summer day is 13:30 on the local clock
+    assert release_time({'date': '15/07/2024', 'time': '12:30'}, offset=0) == datetime(2024, 7, 15, 13, 30)
+    assert release_time({'date': '15/01/2024', 'time': '12:30'}, offset=0) == datetime(2024, 1, 15, 12, 30)
+    assert release_time({'date': '15/07/2024', 'time': 'All Day'}, offset=0) is None
+
+
+def test_countdowns_convert_every_day_with_the_fetch_offset(monkeypatch):
+    monkeypatch.setattr(utils.countdown, 'fetch_utc_offset', lambda moment=None: 3600)
+    engine = CountdownEngine()
+    engine.ingest_table(EventTable.from_records([
+        {'id': 'winter', 'date': '15/01/2024', 'time': '12:30'},
+        {'id': 'summer', 'date': '15/07/2024', 'time': '12:30'},
+    ]))
+    assert engine.epoch_by_id['winter'] == datetime.fromisoformat('2024-01-15T11:30:00+00:00').timestamp()
+    assert engine.epoch_by_id['summer'] == datetime.fromisoformat('2024-07-15T11:30:00+00:00').timestamp()
+
+
+def test_a_named_zone_converts_each_day_with_its_own_offset():
+    engine = CountdownEngine(zone='Europe/London')
+    engine.ingest_table(EventTable.from_records([
+        {'id': 'winter', 'date': '15/01/2024', 'time': '12:30'},
+        {'id': 'summer', 'date': '15/07/2024', 'time': '12:30'},
+    ]))
+    assert engine.epoch_by_id['winter'] == datetime.fromisoformat('2024-01-15T12:30:00+00:00').timestamp()
+    assert engine.epoch_by_id['summer'] == datetime.fromisoformat('2024-07-15T11:30:00+00:00').timestamp()
+
+
+def test_ingesting_a_window_replaces_the_previous_one():
+    engine = CountdownEngine(zone="UTC")
+    engine.ingest_table(EventTable.from_records([
+        {"id": "1", "date": "03/10/2024", "time": "08:30"}, {"id": "2", "date": "04/10/2024", "time": "14:30"}]))
+    engine.ingest_table(EventTable.from_records([
+        {"id": "2", "date": "04/10/2024", "time": "14:30"}, {"id": "3", "date": "05/10/2024", "time": "10:00"}]))
+    assert set(engine.epoch_by_id) == {"2", "3"}
+    assert list(engine.sorted_ids) == ["2", "3"]
+    assert engine.seconds_until("1", 0) is None
+
+    engine.ingest_table(EventTable.empty())
+    assert engine.epoch_by_id == {} and len(engine.sorted_ids) == 0
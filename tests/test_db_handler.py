@@ -0,0 +1,118 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from db.db_handler import DBHandler, database_enabled, open_store
+from utils.cache_handler import CacheHandler
+from utils.cache_journal import atomic_write_json
+from utils.cache_retention import RetentionPolicy
+
+
+def event(i, date="04/10/2024", actual=None):
+    return {"id": str(i), "date": date, "time": "14:30", "zone": "united states", "currency": "USD",
+            "importance": "high", "event": f"Event {i}", "actual": actual, "forecast": "0.2%", "previous": "0.1%"}
+
+
+@pytest.fixture
+def store():
+    store = DBHandler(':memory:')
+    yield store
+    store.close()
+
+
+def test_upsert_writes_only_new_and_changed_rows(store):
+    assert store.add_to_cache([event(i) for i in range(5)]) == 5
+    assert store.add_to_cache([event(i) for i in range(5)]) == 0
+    assert store.add_to_cache([event(0, actual="0.3%"), event(1), event(5)]) == 2
+    assert store.count() == 6
+    assert store.get_cached_data(datetime(2024, 10, 4), datetime(2024, 10, 4))[0]["actual"] == "0.3%"
+
+
+def test_range_queries_match_the_cache_bounds(store):
+    store.add_to_cache([event(1, "03/10/2024"), event(2, "04/10/2024"), event(3, "06/10/2024")])
+    assert [r["id"] for r in store.get_cached_data(datetime(2024, 10, 3), datetime(2024, 10, 5))] == ["1", "2"]
+    # A start with a time of day excludes its own date, as in CacheHandler
+    assert [r["id"] for r in store.get_cached_data(datetime(2024, 10, 3, 12), datetime(2024, 10, 6))] == ["2", "3"]
+
+
+def test_non_string_ids_are_rejected(store):
+    with pytest.raises(TypeError):
+        store.add_to_cache([dict(event(1), id=1)])
+
+
+def test_a_new_database_migrates_the_json_cache_and_its_journal_once(tmp_path):
+    json_path = str(tmp_path / "cache.json")
+    atomic_write_json(json_path, {"data": [event(i) for i in range(3)]})
+    with open(f"{json_path}.journal", 'w') as f:
+        f.write(json.dumps({"op": "upsert", "record": event(0, actual="1.0%")}) + "\n")
+    db_path = str(tmp_path / "events.db")
+
+    store = DBHandler(db_path, json_cache=json_path)
+    assert store.count() == 3
+    assert store.all_records()[0]["actual"] == "1.0%"
+    store.clear_cache()
+    store.close()
+
+    reopened = DBHandler(db_path, json_cache=json_path)
+    assert reopened.count() == 0
+    reopened.close()
+
+
+def test_cache_handler_writes_only_changed_rows_to_its_store(tmp_path):
+    today = date.today().strftime('%d/%m/%Y')
+    store = DBHandler(str(tmp_path / "events.db"))
+    store.add_to_cache([event(i, today) for i in range(4)])
+    handler = CacheHandler(cache_file=None, store=store)
+    assert len(handler.records_by_id) == 4
+
+    written = []
+    add_to_cache = store.add_to_cache
+    store.add_to_cache = lambda records: written.append(sorted(r["id"] for r in records)) or add_to_cache(records)
+    handler.add_to_cache([event(i, today) for i in range(4)] + [event(1, today, actual="0.5%"), event(9, today)])
+    assert written == [["1", "9"]]
+    handler.close()
+
+    reopened = CacheHandler(cache_file=None, store=DBHandler(str(tmp_path / "events.db")))
+    assert reopened.records_by_id["1"]["actual"] == "0.5%"
+    assert len(reopened.records_by_id) == 5
+    reopened.close()
+
+
+def test_retention_deletes_evicted_rows_from_the_store(store):
+    store.add_to_cache([event(1, "01/01/2024"), event(2, "04/10/2024")])
+    handler = CacheHandler(cache_file=None, store=store, retention=RetentionPolicy(max_records=1, archive=False),
+                           hot_days=None)
+    assert list(handler.records_by_id) == ["2"]
+    assert [r["id"] for r in store.all_records()] == ["2"]
+
+
+def test_the_store_is_selected_by_the_cache_format(tmp_path):
+    config = tmp_path / "config.ini"
+    config.write_text("[cache]\nformat = snapshot\n")
+    assert not database_enabled(str(config))
+    assert open_store(str(config)) is None
+    config.write_text("[cache]\nformat = sqlite\n")
+    assert database_enabled(str(config))
+
+
+def test_a_store_backed_cache_loads_only_the_recent_days(store):
+    today = datetime.combine(date.today(), datetime.min.time())
+    # Ten events a day from 60 days ago to 10 days ahead
+    store.add_to_cache([event(i, (today + timedelta(days=i // 10 - 60)).strftime('%d/%m/%Y')) for i in range(710)])
+    reads = []
+    records = store.records
+    store.records = lambda *days: reads.append(days) or records(*days)
+
+    handler = CacheHandler(cache_file=None, store=store)
+    assert len(handler.sorted_records) == 18 * 10  # A week back to ten days ahead
+    assert reads == [(today.toordinal() - 7,)]
+
+    # Older days come from the database's day index, merged with what was changed since
+    handler.add_to_cache([event(5, (today - timedelta(days=60)).strftime('%d/%m/%Y'), actual="0.5%")])
+    week = handler.get_cached_data(today - timedelta(days=60), today - timedelta(days=54))
+    assert reads[1:] == [(today.toordinal() - 60, today.toordinal() - 54)]
+    assert sorted(int(record["id"]) for record in week) == list(range(70))
+    assert [record["actual"] for record in week if record["id"] == "5"] == ["0.5%"]
+    assert handler.stats['unloaded_lookups'] == 1
+    assert len(handler.get_cached_data(today - timedelta(days=60), today + timedelta(days=10))) == 710
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from utils.event_search import EventIndex, tokenize
+from utils.event_table import EventTable
+from utils.value_parser import synthetic_calendar
+
+EVENTS = [
+    ("Nonfarm Payrolls", "USD", "united states", "high"),
+    ("Nonfarm Productivity (QoQ)", "USD", "united states", "medium"),
+    ("Core CPI (MoM)", "USD", "united states", "high"),
+    ("CPI (YoY)", "EUR", "euro zone", "high"),
+    ("German ZEW Economic Sentiment", "EUR", "germany", "medium"),
+    ("Retail Sales (MoM)", "GBP", "united kingdom", "low"),
+    ("CPI (MoM)", "GBP", "united kingdom", None),
+]
+
+
+@pytest.fixture
+def index():
+    return EventIndex(EventTable.from_records([
+        {"id": str(i), "date": "04/10/2024", "time": "14:30", "event": name, "currency": currency, "zone": zone,
+         "importance": importance}
+        for i, (name, currency, zone, importance) in enumerate(EVENTS)
+    ]))
+
+
+def names(index, **conditions):
+    return [EVENTS[row][0] for row in index.search(**conditions)]
+
+
+def test_words_match_as_prefixes(index):
+    assert names(index, text="nonf") == ["Nonfarm Payrolls", "Nonfarm Productivity (QoQ)"]
+    assert names(index, text="Non Pay") == ["Nonfarm Payrolls"]
+    assert names(index, text="mom cpi") == ["Core CPI (MoM)", "CPI (MoM)"]
+    assert names(index, text="sent") == ["German ZEW Economic Sentiment"]
+    assert names(index, text="farm") == []  # Not a word prefix
+
+
+def test_a_token_combines_with_currency_and_importance_filters(index):
+    assert names(index, text="cpi", currencies={"USD", "EUR"}) == ["Core CPI (MoM)", "CPI (YoY)"]
+    assert names(index, text="cpi", currencies={"GBP"}, min_importance="low") == []
+    assert names(index, text="nonfarm", min_importance="high") == ["Nonfarm Payrolls"]
+    assert names(index, currencies={"EUR"}, zones={"germany"}) == ["German ZEW Economic Sentiment"]
+    assert names(index, min_importance="medium", zones={"united kingdom"}) == []
+
+
+def test_typing_narrows_to_the_same_rows_as_a_fresh_search():
+    table = EventTable.from_records(synthetic_calendar(days=20, events_per_day=50))
+    typed = EventIndex(table)
+    for text in ["i", "in", "ind", "indi", "indicator", "indicator 1", "indicator 12", "indicator 12 m"]:
+        for conditions in ({}, {'currencies': {"USD"}, 'min_importance': "high"}):
+            narrowed = typed.search(text=text, **conditions)
+            assert np.array_equal(narrowed, EventIndex(table).search(text=text, **conditions))
+    # Deleting text starts over rather than narrowing
+    assert np.array_equal(typed.search(text="indicator 1"), EventIndex(table).search(text="indicator 1"))
+
+
+def test_unknown_values_match_nothing(index):
+    assert names(index, text="zzz") == []
+    assert names(index, text="cpi zzz") == []
+    assert names(index, currencies={"JPY"}) == []
+    assert names(index, text="cpi", currencies=set()) == []
+
+
+def test_an_empty_query_returns_every_row(index):
+    assert names(index) == [name for name, *_ in EVENTS]
+    assert names(index, text="   ") == [name for name, *_ in EVENTS]
+    assert len(index.filter_table(text="")) == len(EVENTS)
+
+
+def test_an_empty_table():
+    empty = EventIndex(EventTable.empty())
+    assert len(empty.search(text="cpi")) == 0
+    assert len(empty.search()) == 0
+
+
+def test_tokenize():
+    assert tokenize("Core CPI (MoM)  (Sep)") == ["core", "cpi", "mom", "sep"]
@@ -0,0 +1,154 @@
+import threading
+import time
+
+import pytest
+
+import db.fetch_coordinator
+from db.fetch_coordinator import FetchCoordinator, get_fetch_coordinator, set_fetch_core
+from db.fetch_engine import FakeBackend, FetchEngine
+from tests.support import wait_until
+from utils.async_core import AsyncCore
+
+WINDOW = [('01/10/2024', '09/10/2024')]
+WINDOW_DAYS = {f"{day:02d}/10/2024" for day in range(1, 10)}
+
+
+class Collector:
+    """Records a subscription's chunks and completion."""
+    def __init__(self):
+        self.records = []
+        self.failed = None
+        self.done = threading.Event()
+
+    def on_chunk(self, records):
+        self.records.extend(records)
+
+    def on_complete(self, failed):
+        self.failed = failed
+        self.done.set()
+
+    @property
+    def days(self):
+        return {record['date'] for record in self.records}
+
+
+@pytest.fixture(params=['threads', 'core'])
+def coordinator(request):
+    core = AsyncCore().start() if request.param == 'core' else None
+    backend = FakeBackend(latency=0.05, events_per_day=3)
+    coordinator = FetchCoordinator(FetchEngine(backend, max_workers=2, chunk_days=1), cancel_grace=1.0, core=core)
+    coordinator.backend = backend
+    yield coordinator
+    assert wait_until(lambda: not coordinator.in_flight())
+    if core is not None:
+        core.stop()
+
+
+def test_overlapping_requests_share_one_download(coordinator):
+    first, second = Collector(), Collector()
+    coordinator.subscribe(WINDOW, first.on_chunk, first.on_complete)
+    coordinator.subscribe([('05/10/2024', '09/10/2024')], second.on_chunk, second.on_complete)
+
+    assert first.done.wait(5) and second.done.wait(5)
+    assert first.days == WINDOW_DAYS
+    assert coordinator.backend.calls == 9
+
+
+def test_late_joiner_gets_the_chunks_delivered_before_it_joined(coordinator):
+    abandoned = Collector()
+    subscription = coordinator.subscribe(WINDOW, abandoned.on_chunk, abandoned.on_complete)
+    subscription.cancel()
+    job = coordinator.jobs[0]
+    # Within the grace period the job keeps running and some days arrive with nobody listening
+    assert wait_until(lambda: len(job.delivered) >= 3)
+
+    late = Collector()
+    coordinator.subscribe(WINDOW, late.on_chunk, late.on_complete)
+    assert late.done.wait(5)
+    assert late.failed == []
+    assert late.days == WINDOW_DAYS
+    assert len(late.records) == 9 * 3  # Each chunk exactly once
+    assert abandoned.records == [] and not abandoned.done.is_set()
+    assert coordinator.backend.calls == 9
+
+
+class SteppedEngine:
+    """Engine whose fetch delivers one chunk each time the test calls step()."""
+    def __init__(self):
+        self.steps = threading.Semaphore(0)
+        self.chunks = [[{'id': str(i), 'date': '01/10/2024'}] for i in range(3)]
+
+    def step(self):
+        self.steps.release()
+
+    def fetch(self, segments, on_chunk=None, cancel_event=None):
+        for records in self.chunks:
+            self.steps.acquire()
+            on_chunk(records)
+        return [], []
+
+
+def test_a_chunk_arriving_during_the_replay_is_delivered_after_it_in_order():
+    engine = SteppedEngine()
+    coordinator = FetchCoordinator(engine)
+    first = Collector()
+    coordinator.subscribe(WINDOW, first.on_chunk, first.on_complete)
+    job = coordinator.jobs[0]
+    engine.step()
+    assert wait_until(lambda: len(job.delivered) == 1)
+
+    seen = []
+    calls = {'active': 0, 'overlapped': False}
+    subscriber_thread = threading.current_thread()
+
+    def on_chunk(records):
+        calls['overlapped'] |= calls['active'] > 0
+        calls['active'] += 1
+        seen.append((records[0]['id'], threading.current_thread() is subscriber_thread))
+        if len(seen) == 1:
+            # The next chunk arrives while the first one is still being replayed
+            engine.step()
+            wait_until(lambda: len(job.delivered) == 2, timeout=1.0)
+        calls['active'] -= 1
+
+    late = Collector()
+    coordinator.subscribe(WINDOW, on_chunk, late.on_complete)
+    # The chunk queued during the replay was passed on by the replaying thread, after the replay
+    assert seen == [('0', True), ('1', True)]
+    engine.step()
+    assert late.done.wait(5)
+    assert [chunk_id for chunk_id, _ in seen] == ['0', '1', '2']
+    assert not calls['overlapped']
+    assert [record['id'] for record in first.records] == ['0', '1', '2']
+
+
+def test_abandoned_jobs_are_cancelled_after_the_grace_period(coordinator):
+    coordinator.backend.latency = 0.2
+    coordinator.cancel_grace = 0.05
+    subscription = coordinator.subscribe(WINDOW)
+    subscription.cancel()
+
+    assert wait_until(lambda: not coordinator.in_flight())
+    time.sleep(0.5)
+    assert coordinator.backend.calls < 9
+
+
+def test_the_shared_coordinator_uses_the_core_set_at_startup(monkeypatch):
+    monkeypatch.setattr(db.fetch_coordinator, '_shared_coordinator', None)
+    monkeypatch.setattr(db.fetch_coordinator, '_shared_core', None)
+    core = object()
+    set_fetch_core(core)
+    coordinator = get_fetch_coordinator()
+
+    assert coordinator.core is core
+    assert get_fetch_coordinator() is coordinator
+    set_fetch_core(core)  # Same core again is fine
+
+
+def test_a_core_arriving_after_the_coordinator_is_rejected(monkeypatch):
+    monkeypatch.setattr(db.fetch_coordinator, '_shared_coordinator', None)
+    monkeypatch.setattr(db.fetch_coordinator, '_shared_core', None)
+    get_fetch_coordinator()  # e.g. a screen fetching before startup finished
+
+    with pytest.raises(RuntimeError):
+        set_fetch_core(object())
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+import db.fetch_engine
+from db.fetch_engine import FakeBackend, FakeFrame, FetchEngine, fetch_chunk
+
+
+class FlakyBackend:
+    """investpy stand-in whose first failures[from_date] calls for a chunk raise; two events a day."""
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.attempts = Counter()
+
+    def economic_calendar(self, from_date, to_date):
+        self.attempts[from_date] += 1
+        if self.attempts[from_date] <= self.failures.get(from_date, 0):
+            raise ConnectionError(f"injected failure {self.attempts[from_date]}")
+        start = datetime.strptime(from_date, '%d/%m/%Y')
+        days = (datetime.strptime(to_date, '%d/%m/%Y') - start).days + 1
+        dates = [(start + timedelta(days=day)).strftime('%d/%m/%Y') for day in range(days)]
+        return FakeFrame([{'id': f"{date}-{i}", 'date': date} for date in dates for i in range(2)])
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """The backoff delays fetch_chunk waited, without waiting for them."""
+    delays = []
+    monkeypatch.setattr(db.fetch_engine.time, 'sleep', delays.append)
+    return delays
+
+
+def test_a_chunk_that_fails_then_succeeds_is_retried_with_exponential_backoff(sleeps):
+    backend = FlakyBackend({"01/10/2024": 3})
+    records = fetch_chunk(backend, "01/10/2024", "02/10/2024", retries=3, backoff=0.5)
+    assert len(records) == 4
+    assert backend.attempts["01/10/2024"] == 4
+    assert sleeps == [0.5, 1.0, 2.0]
+
+
+def test_a_chunk_that_keeps_failing_raises_after_the_last_retry(sleeps):
+    backend = FlakyBackend({"01/10/2024": 100})
+    with pytest.raises(ConnectionError):
+        fetch_chunk(backend, "01/10/2024", "02/10/2024", retries=2, backoff=0.5)
+    assert backend.attempts["01/10/2024"] == 3
+    assert sleeps == [0.5, 1.0]
+
+
+def test_failed_chunks_are_reported_without_dropping_the_rest(sleeps):
+    backend = FlakyBackend({"01/10/2024": 1, "08/10/2024": 100})
+    engine = FetchEngine(backend, max_workers=2, chunk_days=7, retries=2, backoff=0.01)
+    streamed = []
+    records, failed = engine.fetch([("01/10/2024", "21/10/2024")], on_chunk=streamed.append)
+    assert failed == [("08/10/2024", "14/10/2024")]
+    assert len(records) == 14 * 2
+    assert sorted(len(chunk) for chunk in streamed) == [14, 14]
+    assert backend.attempts == {"01/10/2024": 2, "08/10/2024": 3, "15/10/2024": 1}
+
+
+def test_the_async_fetch_reports_failed_chunks_too(sleeps):
+    backend = FlakyBackend({"08/10/2024": 100})
+    engine = FetchEngine(backend, max_workers=2, chunk_days=7, retries=1, backoff=0.01)
+    records, failed = asyncio.run(engine.fetch_async([("01/10/2024", "21/10/2024")]))
+    assert failed == [("08/10/2024", "14/10/2024")]
+    assert len(records) == 14 * 2
+    assert backend.attempts["08/10/2024"] == 2
+    assert sleeps == []  # Backed off on the loop, not in a worker thread
+
+
+def test_async_backoff_leaves_the_shared_executor_free():
+    backend = FlakyBackend({"01/10/2024": 1})
+    engine = FetchEngine(backend, max_workers=1, chunk_days=7, retries=1, backoff=0.5)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+        fetch = asyncio.ensure_future(engine.fetch_async([("01/10/2024", "07/10/2024")]))
+        await asyncio.sleep(0.05)  # The first attempt has failed and the chunk is backing off
+        started = time.monotonic()
+        await loop.run_in_executor(None, lambda: None)  # Unrelated work on the only worker
+        waited = time.monotonic() - started
+        return waited, await fetch
+
+    waited, (records, failed) = asyncio.run(main())
+    assert waited < 0.25
+    assert (len(records), failed) == (14, [])
+
+
+def test_cancelling_mid_fetch_skips_the_chunks_not_yet_started():
+    backend = FakeBackend(latency=0.02, events_per_day=2)
+    engine = FetchEngine(backend, max_workers=1, chunk_days=1)
+    cancel = threading.Event()
+    streamed = []
+
+    def on_chunk(records):
+        streamed.append(records)
+        cancel.set()
+
+    records, failed = engine.fetch([("01/10/2024", "10/10/2024")], on_chunk=on_chunk, cancel_event=cancel)
+    assert len(streamed) == 1
+    assert records == streamed[0]
+    assert failed == []
+    # The chunk already running when the first one arrived may finish; the rest never start
+    assert backend.calls <= 3
+
+
+def test_cancelling_the_async_fetch_skips_the_chunks_not_yet_started():
+    backend = FakeBackend(latency=0.02, events_per_day=2)
+    engine = FetchEngine(backend, max_workers=1, chunk_days=1)
+    cancel = threading.Event()
+
+    def on_chunk(records):
+        cancel.set()
+
+    records, failed = asyncio.run(engine.fetch_async([("01/10/2024", "10/10/2024")], on_chunk=on_chunk,
+                                                     cancel_event=cancel))
+    assert len(records) == 2
+    assert backend.calls <= 3
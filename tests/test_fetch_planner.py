@@ -0,0 +1,82 @@
+from datetime import date, datetime
+
+from db.fetch_engine import FakeBackend
+from db.fetch_planner import fetch_range, plan_fetch, stale_days
+
+TODAY = datetime(2024, 10, 10, 9, 30)
+
+
+def event(i, day, actual="1.0%", previous="0.9%"):
+    return {"id": str(i), "date": day, "time": "14:30", "actual": actual, "previous": previous}
+
+
+class RecordingBackend(FakeBackend):
+    """FakeBackend without latency that remembers the ranges it was asked for."""
+    def __init__(self, **kwargs):
+        super().__init__(latency=0, events_per_day=3, **kwargs)
+        self.queries = []
+
+    def economic_calendar(self, from_date, to_date):
+        self.queries.append((from_date, to_date))
+        return super().economic_calendar(from_date, to_date)
+
+
+def test_finalized_past_days_are_skipped(memory_cache):
+    memory_cache.add_to_cache([event(1, "08/10/2024"), event(2, "09/10/2024")])
+    assert stale_days(memory_cache, datetime(2024, 10, 8), datetime(2024, 10, 9), today=TODAY) == []
+    assert plan_fetch(memory_cache, datetime(2024, 10, 8), datetime(2024, 10, 9), today=TODAY) == []
+
+
+def test_today_and_future_days_are_refetched_even_when_cached(memory_cache):
+    memory_cache.add_to_cache([event(1, "10/10/2024"), event(2, "11/10/2024")])
+    assert stale_days(memory_cache, datetime(2024, 10, 9), datetime(2024, 10, 11), today=TODAY) == [
+        date(2024, 10, 9), date(2024, 10, 10), date(2024, 10, 11)]
+
+
+def test_days_with_missing_actuals_are_refetched(memory_cache):
+    memory_cache.add_to_cache([
+        event(1, "07/10/2024"), event(2, "07/10/2024", actual=None),
+        event(3, "08/10/2024"),
+        # Speeches have no previous value and never get an actual
+        event(4, "09/10/2024", actual=None, previous=None),
+    ])
+    assert stale_days(memory_cache, datetime(2024, 10, 7), datetime(2024, 10, 9), today=TODAY) == [date(2024, 10, 7)]
+
+
+def test_adjacent_stale_days_are_merged_into_segments(memory_cache):
+    memory_cache.add_to_cache([event(1, "04/10/2024"), event(2, "07/10/2024"), event(3, "08/10/2024")])
+    # 3rd missing, 5th and 6th missing, 9th missing, then today onwards
+    assert plan_fetch(memory_cache, datetime(2024, 10, 3), datetime(2024, 10, 12), today=TODAY) == [
+        ("03/10/2024", "03/10/2024"),
+        ("05/10/2024", "06/10/2024"),
+        ("09/10/2024", "12/10/2024"),
+    ]
+
+
+def test_an_empty_cache_fetches_the_whole_window_in_one_segment(memory_cache):
+    assert plan_fetch(memory_cache, datetime(2024, 10, 9, 15), datetime(2024, 10, 17), today=TODAY) == [
+        ("09/10/2024", "17/10/2024")]
+
+
+def test_a_same_day_range_is_queried_with_the_next_day_and_filtered_back():
+    backend = RecordingBackend()
+    records = fetch_range(backend, "09/10/2024", "09/10/2024")
+    assert backend.queries == [("09/10/2024", "10/10/2024")]
+    assert len(records) == 3
+    assert {record['date'] for record in records} == {"09/10/2024"}
+
+
+def test_a_multi_day_range_is_queried_as_is():
+    backend = RecordingBackend()
+    records = fetch_range(backend, "09/10/2024", "11/10/2024")
+    assert backend.queries == [("09/10/2024", "11/10/2024")]
+    assert len(records) == 9
+
+
+def test_fetching_the_planned_segments_fills_the_stale_days(memory_cache):
+    memory_cache.add_to_cache([event(1, "07/10/2024"), event(2, "08/10/2024")])
+    backend = RecordingBackend()
+    for from_date, to_date in plan_fetch(memory_cache, datetime(2024, 10, 6), datetime(2024, 10, 9), today=TODAY):
+        memory_cache.add_to_cache(fetch_range(backend, from_date, to_date))
+    assert backend.queries == [("06/10/2024", "07/10/2024"), ("09/10/2024", "10/10/2024")]
+    assert len(memory_cache.get_cached_data(datetime(2024, 10, 6), datetime(2024, 10, 9))) == 8
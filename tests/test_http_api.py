@@ -0,0 +1,148 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from db.refresh_service import SimulatedClock
+from server.calendar_daemon import CalendarDaemon
+from server.http_api import CalendarAPI
+
+NOW = datetime(2024, 10, 4, 12, 0)
+
+
+def event(i, date="04/10/2024", time="14:30", currency="USD", importance="high", actual=None):
+    return {"id": str(i), "date": date, "time": time, "zone": "united states", "currency": currency,
+            "importance": importance, "event": f"Indicator {i}", "actual": actual, "forecast": "0.2%"}
+
+
+RECORDS = [
+    event(1, "03/10/2024", "08:30", actual="0.1%"),
+    event(2, "04/10/2024", "16:00", currency="EUR", importance="medium"),
+    event(3, "04/10/2024", "09:00", importance="low", actual="1.0%"),
+    event(4, "04/10/2024", "13:15"),
+    event(5, "05/10/2024", "10:00", currency="GBP"),
+    event(6, "07/10/2024", "All Day", importance="medium"),
+    event(7, "20/10/2024", "08:00"),
+]
+
+
+@pytest.fixture
+def daemon(memory_cache):
+    memory_cache.add_to_cache([dict(record) for record in RECORDS])
+    return CalendarDaemon(memory_cache, clock=SimulatedClock(NOW, NOW), fetch=False)
+
+
+def serve(daemon, scenario):
+    """Run scenario(api) against the daemon's API on a free port, then shut both down."""
+    async def main():
+        daemon.start(asyncio.get_running_loop())
+        api = CalendarAPI(daemon, port=0, keepalive=0.05)
+        await api.start()
+        try:
+            return await scenario(api)
+        finally:
+            await daemon.shutdown()
+            await api.close()
+    return asyncio.run(main())
+
+
+async def get(api, path, **headers):
+    """Send one GET and return (status, headers, parsed body)."""
+    reader, writer = await asyncio.open_connection(api.host, api.port)
+    lines = [f"GET {path} HTTP/1.1", "Host: localhost", "Connection: close"]
+    lines.extend(f"{name.replace('_', '-')}: {value}" for name, value in headers.items())
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode().partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(response_headers['content-length']))
+    writer.close()
+    return status, response_headers, json.loads(body) if body else None
+
+
+def ids(body):
+    return [record['id'] for record in body['events']]
+
+
+def test_events_filter_by_range_currency_and_importance(daemon):
+    async def scenario(api):
+        _, _, default = await get(api, "/events")
+        _, _, one_day = await get(api, "/events?from=2024-10-04&to=2024-10-04")
+        _, _, usd = await get(api, "/events?from=2024-10-01&to=2024-10-31&currency=USD")
+        _, _, several = await get(api, "/events?from=2024-10-01&to=2024-10-31&currency=EUR,GBP")
+        _, _, medium = await get(api, "/events?from=2024-10-04&to=2024-10-07&importance=medium")
+        bad = await get(api, "/events?importance=urgent")
+        reversed_range = await get(api, "/events?from=2024-10-05&to=2024-10-01")
+        return default, one_day, usd, several, medium, bad[0], reversed_range[0]
+
+    default, one_day, usd, several, medium, bad, reversed_range = serve(daemon, scenario)
+    # The default range runs from yesterday to a week ahead, each day in release order
+    assert (default['from'], default['to']) == ("2024-10-03", "2024-10-11")
+    assert ids(default) == ["1", "3", "4", "2", "5", "6"]
+    assert ids(one_day) == ["3", "4", "2"]
+    assert ids(usd) == ["1", "3", "4", "6", "7"]
+    assert ids(several) == ["2", "5"]
+    assert ids(medium) == ["4", "2", "5", "6"]
+    assert (bad, reversed_range) == (400, 400)
+
+
+def test_a_malformed_content_length_is_a_bad_request(daemon):
+    async def scenario(api):
+        return [await get(api, "/events", content_length=length) for length in ("abc", "-1")]
+
+    for status, _, body in serve(daemon, scenario):
+        assert (status, body) == (400, {'error': "malformed Content-Length header"})
+
+def test_next_events_are_the_upcoming_releases_in_time_order(daemon):
+    async def scenario(api):
+        _, _, upcoming = await get(api, "/events/next?n=3")
+        _, _, high = await get(api, "/events/next?importance=high")
+        return upcoming, high
+
+    upcoming, high = serve(daemon, scenario)
+    # Releases before noon and the all-day event are left out
+    assert ids(upcoming) == ["4", "2", "5"]
+    assert [record['seconds_until'] for record in upcoming['events']] == [4500.0, 14400.0, 79200.0]
+    assert ids(high) == ["4", "5"]  # Event 7 is past the two-week horizon
+
+
+def test_an_unchanged_response_revalidates_until_the_cache_changes(daemon):
+    async def scenario(api):
+        path = "/events?from=2024-10-04&to=2024-10-04"
+        status, headers, _ = await get(api, path)
+        results = [status, (await get(api, path, if_none_match=headers['etag']))[0]]
+        daemon.merge([event(8, "04/10/2024", "17:00")])
+        status, new_headers, body = await get(api, path, if_none_match=headers['etag'])
+        results.append(status)
+        return results, headers['etag'], new_headers['etag'], body, dict(api.stats)
+
+    statuses, etag, new_etag, body, stats = serve(daemon, scenario)
+    assert statuses == [200, 304, 200]
+    assert new_etag != etag
+    assert ids(body) == ["3", "4", "2", "8"]
+    assert (stats['cache_hits'], stats['not_modified']) == (1, 1)
+
+
+def test_the_stream_receives_actuals_published_by_a_merge(daemon):
+    async def scenario(api):
+        reader, writer = await asyncio.open_connection(api.host, api.port)
+        writer.write(b"GET /stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await writer.drain()
+        assert (await reader.readline()).startswith(b"HTTP/1.1 200")
+        while (await reader.readline()) != b'\r\n':
+            pass
+        # A new event and an unchanged actual are merged too, but only event 4 just came out
+        daemon.merge([event(4, actual="0.4%"), event(9), event(3, "04/10/2024", "09:00", importance="low",
+                                                            actual="1.0%")])
+        while not (line := await asyncio.wait_for(reader.readline(), 5)).startswith(b'data: '):
+            pass  # Keepalive comments and the event and id lines
+        writer.close()
+        return json.loads(line[6:]), daemon.stats['actuals_published']
+
+    record, published = serve(daemon, scenario)
+    assert (record['id'], record['actual']) == ("4", "0.4%")
+    assert published == 1
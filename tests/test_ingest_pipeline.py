@@ -0,0 +1,66 @@
+import threading
+
+import db.ingest_pipeline
+from db.ingest_pipeline import IngestPipeline, clean_records
+from tests.support import wait_until
+from utils.async_core import AsyncCore
+from utils.value_parser import synthetic_calendar
+
+
+def test_rows_are_cleaned_and_deduplicated():
+    rows = [
+        {'id': '1', 'date': '04/10/2024', 'event': '  NFP ', 'importance': 'HIGH', 'forecast': '  '},
+        {'id': '2', 'date': '2024-10-04', 'event': 'CPI'},  # Not DD/MM/YYYY
+        {'id': None, 'date': '04/10/2024', 'event': 'No id'},
+        {'id': '1', 'date': '04/10/2024', 'event': 'NFP', 'actual': float('nan')},
+    ]
+    cleaned = clean_records(rows)
+    assert len(cleaned) == 1
+    assert cleaned[0]['event'] == 'NFP' and cleaned[0]['actual'] is None
+
+
+def test_small_chunks_are_normalized_off_the_async_core_loop(monkeypatch):
+    threads = []
+    normalize = db.ingest_pipeline.normalize_records
+    monkeypatch.setattr(db.ingest_pipeline, 'normalize_records',
+                        lambda records: threads.append(threading.current_thread()) or normalize(records))
+    pipeline = IngestPipeline(threshold=2000)
+    core = AsyncCore().start()
+    futures = []
+    try:
+        records = synthetic_calendar(days=3)
+        # As DataWorker.on_chunk does when fetch_async delivers a chunk on the loop
+        core.call_soon(lambda: futures.append(pipeline.submit(records)))
+        assert wait_until(lambda: futures)
+        table = futures[0].result(timeout=5)
+        assert len(table) == len(clean_records(records))
+        assert threads and core.thread not in threads
+    finally:
+        core.stop()
+        pipeline.shutdown()
+
+
+def test_large_chunks_normalized_in_a_worker_match_inline_ones():
+    records = synthetic_calendar(days=5)
+    inline = IngestPipeline(threshold=None)
+    offloaded = IngestPipeline(threshold=10, max_workers=1)
+    try:
+        expected = inline.normalize(records)
+        assert offloaded.normalize(records).to_records() == expected.to_records()
+        assert offloaded.executor is not None
+    finally:
+        inline.shutdown()
+        offloaded.shutdown()
+
+
+def test_shutdown_settles_chunks_that_were_still_queued():
+    pipeline = IngestPipeline(threshold=None)
+    release = threading.Event()
+    pipeline.get_thread().submit(release.wait, 5)  # Keep the pipeline thread busy
+    future = pipeline.submit(synthetic_calendar(days=1))
+    shutdown = threading.Thread(target=pipeline.shutdown)
+    shutdown.start()
+    release.set()
+    shutdown.join()
+
+    assert future.done()
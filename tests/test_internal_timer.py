@@ -0,0 +1,122 @@
+import threading
+from datetime import datetime, timedelta
+
+from tests.support import wait_until
+from utils.async_core import AsyncCore
+from utils.internal_timer import InternalTimer, ManualClock, Tick
+
+START = 1727740800.4  # 0.4 s past a minute boundary
+
+
+def run_ticks(timer, count):
+    """Drive a timer on a ManualClock for count ticks, returning (tick, subscriptions) pairs."""
+    timer.is_running = True
+    fired = []
+    for _ in range(count):
+        tick, subscriptions = timer.next_due()
+        timer.fire(tick, subscriptions)
+        fired.append((tick, subscriptions))
+    return fired
+
+
+def test_ticks_land_on_wall_clock_boundaries():
+    timer = InternalTimer(ManualClock(START))
+    seconds = []
+    quarters = []
+    timer.subscribe(lambda tick: seconds.append(tick.epoch), resolution=1)
+    timer.subscribe(lambda tick: quarters.append(tick.epoch), resolution=15)
+
+    run_ticks(timer, 30)
+    assert seconds == [START - 0.4 + i for i in range(1, 31)]
+    assert [epoch % 15 for epoch in quarters] == [0, 0]
+
+
+def test_subscribers_due_together_share_one_tick():
+    timer = InternalTimer(ManualClock(START))
+    ticks = []
+    timer.subscribe(ticks.append, resolution=1)
+    timer.subscribe(ticks.append, resolution=1)
+
+    tick, subscriptions = run_ticks(timer, 1)[0]
+    assert len(subscriptions) == 2
+    assert ticks[0] is ticks[1] is tick
+
+
+def test_a_suspend_fires_one_tick_instead_of_every_missed_boundary():
+    clock = ManualClock(START)
+    timer = InternalTimer(clock)
+    seconds = []
+    minutes = []
+    timer.subscribe(lambda tick: seconds.append(tick.epoch), resolution=1)
+    timer.subscribe(lambda tick: minutes.append(tick.epoch), resolution=60)
+    run_ticks(timer, 2)
+
+    clock.current += 3600.5  # Suspended for an hour
+    resumed = clock.current
+    tick, subscriptions = run_ticks(timer, 1)[0]
+    assert len(subscriptions) == 2  # Each late subscriber fires once
+    assert tick.epoch == int(resumed)  # The latest boundary, not the first missed one
+
+    run_ticks(timer, 3)
+    assert seconds[2:] == [int(resumed) + i for i in range(4)]
+    assert len(minutes) == 1
+
+
+def test_unsubscribed_callbacks_stop_firing():
+    timer = InternalTimer(ManualClock(START))
+    kept = []
+    dropped = []
+    timer.subscribe(kept.append)
+    subscription = timer.subscribe(dropped.append)
+    run_ticks(timer, 1)
+    timer.unsubscribe(subscription)
+    run_ticks(timer, 3)
+
+    assert len(kept) == 4
+    assert len(dropped) == 1
+
+
+def test_a_failing_subscriber_does_not_stop_the_others():
+    timer = InternalTimer(ManualClock(START))
+    ticks = []
+    timer.subscribe(lambda tick: 1 / 0)
+    timer.subscribe(ticks.append)
+    run_ticks(timer, 2)
+
+    assert len(ticks) == 2
+
+
+def test_each_format_is_computed_once_per_tick():
+    tick = Tick(START, None)
+    assert tick.format('%H:%M:%S') is tick.format('%H:%M:%S')
+    assert tick.datetime.timestamp() == START
+
+
+def test_runs_on_a_thread_and_on_the_async_core():
+    for core in (None, AsyncCore().start()):
+        timer = InternalTimer()
+        ticks = []
+        timer.subscribe(ticks.append, resolution=0.05)
+        timer.start(core)
+        assert wait_until(lambda: len(ticks) >= 3)
+        timer.stop()
+        if core is not None:
+            core.stop()
+        count = len(ticks)
+        threading.Event().wait(0.15)
+        assert len(ticks) == count  # Nothing fires after stop
+        assert all(abs(tick.epoch / 0.05 - round(tick.epoch / 0.05)) < 1e-6 for tick in ticks)
+
+
+def test_times_follow_the_local_offset_across_a_dst_change(local_zone):
+    local_zone('Europe/London')
+    winter = datetime(2024, 3, 31, 0, 30).timestamp()  # 00:30 GMT, half an hour before clocks go forward
+    clock = ManualClock(winter)
+    timer = InternalTimer(clock)
+    assert timer.get_current_time().utcoffset() == timedelta(0)
+
+    clock.current += 3600
+    assert timer.get_current_time().utcoffset() == timedelta(hours=1)
+    assert timer.get_current_time().strftime('%H:%M') == '02:30'
+    tick = Tick(clock.current, timer.timezone)
+    assert tick.format('%H:%M %Z') == '02:30 BST'
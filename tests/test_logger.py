@@ -0,0 +1,44 @@
+import logging
+import threading
+
+from utils.logger import SampleFilter
+
+
+def debug_record(line, msg="Chunk received"):
+    return logging.LogRecord('BullionBell.test', logging.DEBUG, 'module.py', line, msg, None, None)
+
+
+def test_every_nth_debug_record_per_call_site_is_kept():
+    sample = SampleFilter(every=10)
+    kept = [record.msg for record in (debug_record(1) for _ in range(25)) if sample.filter(record)]
+    assert kept == ["Chunk received", "Chunk received [9 similar suppressed]",
+                    "Chunk received [9 similar suppressed]"]
+    info = logging.LogRecord('BullionBell.test', logging.INFO, 'module.py', 1, "Done", None, None)
+    assert sample.filter(info)
+
+
+def test_counts_are_exact_across_threads():
+    sample = SampleFilter(every=10)
+    kept = []
+
+    def log():
+        kept.append(sum(sample.filter(debug_record(1)) for _ in range(5000)))
+
+    threads = [threading.Thread(target=log) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(kept) == 8 * 5000 // 10
+    assert sample.counts[('module.py', 1)] == 8 * 5000
+
+
+def test_only_recent_call_sites_are_tracked():
+    sample = SampleFilter(every=10, max_sites=100)
+    for line in range(1000):
+        sample.filter(debug_record(line))
+    sample.filter(debug_record(950))
+
+    assert len(sample.counts) == 100
+    assert list(sample.counts)[-1] == ('module.py', 950)  # Most recently seen last
+    assert ('module.py', 0) not in sample.counts
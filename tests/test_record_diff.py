@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from utils.record_diff import apply_diff, diff_records, longest_increasing_run
+
+
+def rows(*ids, actual=None):
+    return [{'id': row_id, 'event': f"Event {row_id}", 'actual': actual} for row_id in ids]
+
+
+def round_trip(old, new):
+    diff = diff_records(old, new)
+    assert apply_diff([dict(record) for record in old], diff) == new
+    return diff
+
+
+@pytest.mark.parametrize("positions, length", [
+    ([], 0),
+    ([5], 1),
+    ([0, 1, 2, 3], 4),
+    ([3, 2, 1, 0], 1),
+    ([2, 0, 3, 1, 4], 3),
+    ([1, 1, 1], 1),  # Strictly increasing
+])
+def test_longest_increasing_run(positions, length):
+    keep = longest_increasing_run(positions)
+    assert len(keep) == length
+    kept = [positions[i] for i in sorted(keep)]
+    assert all(a < b for a, b in zip(kept, kept[1:]))
+
+
+def test_unchanged_rows_produce_no_operations():
+    assert round_trip(rows('a', 'b', 'c'), rows('a', 'b', 'c')) == {'deletes': [], 'inserts': [], 'updates': []}
+
+
+def test_inserted_and_deleted_rows():
+    diff = round_trip(rows('a', 'b', 'c', 'd'), rows('a', 'x', 'c', 'd', 'y'))
+    assert diff['deletes'] == [1]
+    assert [(j, record['id']) for j, record in diff['inserts']] == [(1, 'x'), (4, 'y')]
+    assert diff['updates'] == []
+
+
+def test_a_moved_row_is_a_delete_and_an_insert():
+    diff = round_trip(rows('a', 'b', 'c', 'd'), rows('b', 'c', 'd', 'a'))
+    assert diff['deletes'] == [0]
+    assert [(j, record['id']) for j, record in diff['inserts']] == [(3, 'a')]
+
+
+def test_a_changed_field_is_an_update_of_that_field_only():
+    new = rows('a', 'b', 'c')
+    new[1] = dict(new[1], actual='0.3%')
+    diff = round_trip(rows('a', 'b', 'c'), new)
+    assert diff['deletes'] == [] and diff['inserts'] == []
+    assert diff['updates'] == [(1, new[1], ['actual'])]
+
+
+def test_duplicate_keys_still_round_trip():
+    round_trip(rows('a', 'b', 'a', 'c'), rows('a', 'c', 'b'))
+    round_trip(rows('a', 'b', 'c'), rows('b', 'a', 'b', 'c'))
+    round_trip(rows('a', 'a'), rows('a', 'a', 'a'))
+
+
+@pytest.mark.parametrize("old, new", [
+    ([], rows('a', 'b')),
+    (rows('a', 'b'), []),
+    ([], []),
+])
+def test_empty_old_or_new_lists(old, new):
+    diff = round_trip(old, new)
+    assert len(diff['inserts']) == len(new)
+    assert len(diff['deletes']) == len(old)
+
+
+def test_random_edits_round_trip():
+    rng = random.Random(8)
+    for _ in range(200):
+        old = rows(*(str(i) for i in rng.sample(range(30), rng.randrange(20))))
+        new = [dict(record) for record in old if rng.random() > 0.2]
+        if rng.random() < 0.3:
+            rng.shuffle(new)
+        for record in new:
+            if rng.random() < 0.2:
+                record['actual'] = f"{rng.random():.1f}%"
+        for _ in range(rng.randrange(4)):
+            new.insert(rng.randrange(len(new) + 1), rows(str(rng.randrange(30, 60)))[0])
+        round_trip(old, new)
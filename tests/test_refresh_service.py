@@ -0,0 +1,139 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.refresh_service import RefreshService, SimulatedClock
+from tests.support import wait_until
+
+START = datetime(2024, 10, 4, 0, 0)
+# Release time and how many seconds after it the actual is published
+RELEASES = {
+    'nfp': (START + timedelta(hours=14, minutes=30), 35),
+    'cpi': (START + timedelta(hours=9), 120),
+    'ism': (START + timedelta(hours=16), 10),
+}
+
+
+def release_record(name, released_at, actual=None, importance='high'):
+    return {
+        'id': name, 'date': released_at.strftime('%d/%m/%Y'), 'time': released_at.strftime('%H:%M'),
+        'zone': 'united states', 'currency': 'USD', 'importance': importance, 'event': name.upper(),
+        'actual': actual, 'forecast': '0.9', 'previous': '0.8',
+    }
+
+
+class Subscription:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class SimulatedSource:
+    """Coordinator stand-in that answers synchronously from the simulated clock."""
+    def __init__(self, clock):
+        self.clock = clock
+        self.calls = 0
+        self.seen = {}  # Release name -> simulated time its actual was first fetched
+
+    def subscribe(self, segments, on_chunk=None, on_complete=None):
+        self.calls += 1
+        now = self.clock.now()
+        records = []
+        for name, (released_at, delay) in RELEASES.items():
+            published = now >= released_at + timedelta(seconds=delay)
+            if published and name not in self.seen:
+                self.seen[name] = now
+            records.append(release_record(name, released_at, '1.0' if published else None))
+        if on_chunk is not None:
+            on_chunk(records)
+        if on_complete is not None:
+            on_complete([])
+        return Subscription()
+
+
+@pytest.fixture
+def simulated_day(memory_cache):
+    clock = SimulatedClock(START, START + timedelta(hours=24))
+    source = SimulatedSource(clock)
+    service = RefreshService(memory_cache, source, clock=clock)
+    service.run()
+    return service, source
+
+
+def test_actuals_are_picked_up_within_one_tight_interval(simulated_day):
+    service, source = simulated_day
+    for name, (released_at, delay) in RELEASES.items():
+        latency = (source.seen[name] - released_at).total_seconds() - delay
+        assert 0 <= latency <= service.tight_interval, name
+
+
+def test_polls_only_around_releases(simulated_day):
+    service, source = simulated_day
+    fixed_polling = 24 * 3600 // service.tight_interval
+    assert source.calls < fixed_polling // 50
+
+
+def test_fetched_actuals_reach_the_cache(simulated_day, memory_cache):
+    assert all(record['actual'] == '1.0' for record in memory_cache.sorted_records)
+
+
+def test_sleeps_until_just_before_the_next_release(memory_cache):
+    service = RefreshService(memory_cache, None, lead=30)
+    released_at = START + timedelta(minutes=30)
+    memory_cache.add_to_cache([release_record('nfp', released_at)])
+
+    releases = service.upcoming_releases(START)
+    assert [record['id'] for _, record in releases] == ['nfp']
+    assert service.next_delay(START, releases) == 30 * 60 - 30
+    assert service.next_delay(START - timedelta(hours=5), releases) == service.idle_interval
+    # Inside the lead window it polls tightly, and only the release's day
+    now = released_at - timedelta(seconds=10)
+    assert service.next_delay(now, releases) == service.tight_interval
+    assert service.segments_to_refresh(now, releases) == [('04/10/2024', '04/10/2024')]
+
+
+def test_ignores_released_and_unwatched_events(memory_cache):
+    service = RefreshService(memory_cache, None)
+    memory_cache.add_to_cache([
+        release_record('done', START + timedelta(hours=1), actual='1.0'),
+        release_record('minor', START + timedelta(hours=1), importance='low'),
+        release_record('stale', START - timedelta(hours=2)),  # Past the watch window without an actual
+    ])
+
+    assert service.upcoming_releases(START) == []
+    assert service.next_delay(START, []) == service.idle_interval
+
+
+def test_planning_waits_for_merges_on_other_threads(memory_cache):
+    service = RefreshService(memory_cache, None)
+    memory_cache.add_to_cache([release_record('nfp', START + timedelta(hours=1))])
+    result = []
+
+    with memory_cache.lock:  # A merge in progress on the UI thread
+        planner = threading.Thread(target=lambda: result.append(service.upcoming_releases(START)))
+        planner.start()
+        planner.join(0.2)
+        assert planner.is_alive() and not result
+    planner.join()
+    assert len(result[0]) == 1
+
+
+def test_stopping_during_a_fetch_cancels_the_subscription(memory_cache):
+    class HangingSource:
+        def __init__(self):
+            self.subscription = Subscription()
+
+        def subscribe(self, segments, on_chunk=None, on_complete=None):
+            return self.subscription  # Never completes
+
+    source = HangingSource()
+    service = RefreshService(memory_cache, source)
+    service.start()
+    assert wait_until(lambda: service.fetch_count == 1)
+    service.stop()
+
+    assert source.subscription.cancelled
+    assert not service.thread.is_alive()
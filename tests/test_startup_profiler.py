@@ -0,0 +1,30 @@
+import importlib
+import sys
+
+from utils.startup_profiler import StartupProfiler
+
+
+def test_first_imports_are_timed_once(tmp_path, monkeypatch):
+    (tmp_path / 'slow_module.py').write_text("import time\ntime.sleep(0.05)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    profiler = StartupProfiler()
+    profiler.install()
+    try:
+        importlib.invalidate_caches()
+        __import__('slow_module')
+        __import__('slow_module')  # Already loaded, not timed again
+    finally:
+        profiler.uninstall()
+        sys.modules.pop('slow_module', None)
+
+    assert 0.05 <= profiler.imports['slow_module'] < 0.5
+
+
+def test_report_lists_marks_and_slowest_imports():
+    profiler = StartupProfiler()
+    profiler.imports = {'wx': 0.3, 'numpy': 0.1}
+    profiler.mark("First frame")
+
+    report = profiler.report().splitlines()
+    assert report[1].split()[:2] == ["First", "frame"]
+    assert [line.split()[0] for line in report[3:]] == ['wx', 'numpy']
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+import utils.value_parser
+from utils.event_table import EventTable
+from utils.value_parser import ValueAnalyzer, format_surprise, parse_values
+
+
+@pytest.mark.parametrize("text, value", [
+    ("1.2%", 1.2),
+    ("250K", 250e3),
+    ("1.5M", 1.5e6),
+    ("-0.3B", -0.3e9),
+    ("3.142T", 3.142e12),
+    ("7,080B", 7080e9),
+    ("+0.4%", 0.4),
+    ("-12", -12.0),
+    (".5", 0.5),
+    ("0.2k", 200.0),
+    (" 1.0% ", 1.0),
+])
+def test_units_and_signs(text, value):
+    assert parse_values([text])[0] == pytest.approx(value)
+
+
+@pytest.mark.parametrize("text", [None, "", "   ", "N/A", "Tentative", "1.2%%", "1.2X", "--1"])
+def test_blanks_and_non_numbers_are_nan(text):
+    assert np.isnan(parse_values([text])[0])
+
+
+def test_a_column_keeps_its_order_and_repeats():
+    parsed = parse_values(["1%", None, "2K", "1%", ""])
+    assert parsed[[0, 2, 3]].tolist() == [1.0, 2000.0, 1.0]
+    assert np.isnan(parsed[[1, 4]]).all()
+
+
+def test_format_surprise():
+    assert format_surprise(0.1) == "+0.1"
+    assert format_surprise(-50e3, 1.26) == "-50K (+1.3σ)"
+    assert format_surprise(2.5e9) == "+2.5B"
+    assert format_surprise(np.nan) == ""
+
+
+def calendar(actual_1="0.3%", forecast_1="0.2%"):
+    return EventTable.from_records([
+        {"id": "1", "date": "04/10/2024", "event": "CPI (MoM)  (Sep)", "actual": actual_1, "forecast": forecast_1},
+        {"id": "2", "date": "04/09/2024", "event": "CPI (MoM)  (Aug)", "actual": "0.1%", "forecast": "0.2%"},
+        {"id": "3", "date": "04/08/2024", "event": "CPI (MoM)  (Jul)", "actual": "0.4%", "forecast": "0.2%"},
+        {"id": "4", "date": "04/10/2024", "event": "Payrolls", "actual": None, "forecast": "200K"},
+    ])
+
+
+def test_surprises_are_standardized_per_event_name():
+    surprises = ValueAnalyzer().surprises(calendar())
+    assert set(surprises) == {"1", "2", "3"}
+    assert surprises["1"][0] == pytest.approx(0.1)
+    # Sep, Aug and Jul share the CPI (MoM) history; Jul is scaled by the other two surprises, 0.1 and -0.1
+    assert surprises["3"][1] == pytest.approx(0.2 / np.std([0.1, -0.1], ddof=1))
+    assert surprises["1"][1] == pytest.approx(0.1 / np.std([-0.1, 0.2], ddof=1))
+
+
+def test_a_single_release_in_the_window_is_scaled_by_its_history():
+    table = calendar()
+    window, history = table.take(np.array([0, 3])), table.take(np.array([1, 2]))
+    assert np.isnan(ValueAnalyzer().surprises(window)["1"][1])
+
+    surprises = ValueAnalyzer().surprises(window, history)
+    assert set(surprises) == {"1"}
+    assert surprises["1"][1] == pytest.approx(0.1 / np.std([-0.1, 0.2], ddof=1))
+
+
+def test_equal_past_surprises_give_no_score():
+    table = calendar(actual_1="0.5%", forecast_1="0.2%")
+    history = EventTable.from_records([
+        {"id": str(i), "date": f"04/0{i}/2024", "event": "CPI (MoM)  (Jan)", "actual": "0.3%", "forecast": "0.2%"}
+        for i in range(5, 9)])
+    surprises = ValueAnalyzer().surprises(table.take(np.array([0])), history)
+    assert np.isnan(surprises["1"][1])
+
+
+def test_only_new_or_changed_values_are_parsed_again(monkeypatch):
+    analyzer = ValueAnalyzer()
+    analyzer.surprises(calendar())
+    parsed = []
+    parse = utils.value_parser.parse_values
+    monkeypatch.setattr(utils.value_parser, 'parse_values', lambda values: parsed.append(list(values)) or parse(values))
+
+    analyzer.surprises(calendar())
+    assert parsed == []
+    surprises = analyzer.surprises(calendar(actual_1="0.5%"))
+    assert parsed == [["0.5%", "0.2%"]]
+    assert surprises["1"][0] == pytest.approx(0.3)
+
+
+def test_the_memo_follows_the_analyzed_window():
+    analyzer = ValueAnalyzer()
+    table = calendar()
+    analyzer.surprises(table)
+    analyzer.surprises(table.take(np.array([0, 1])))
+    assert set(analyzer.memo) == {"1", "2"}
@@ -0,0 +1,136 @@
+import logging
+import threading
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+
+class AppServices:
+    """The desktop app's background services, with no wx involved.
+
+    One AsyncCore runs the tick service, the alert scheduler, the refresh
+    service and the fetch jobs; results reach the UI thread through dispatch
+    (wx.CallAfter in the app). The cache is loaded on a warm-up thread so the
+    first frame never waits for it. stop() shuts all of it down and flushes
+    the cache journal, leaving no background threads behind.
+
+    cache_factory, fetch_engine and dispatcher replace the journaled cache,
+    the shared investpy coordinator and the audio dispatcher, e.g. in tests.
+    """
+    def __init__(self, dispatch=None, on_refresh=None, cache_factory=None, fetch_engine=None, dispatcher=None):
+        self.dispatch = dispatch
+        self.on_refresh = on_refresh  # Called on the UI thread after refreshed records are merged
+        self.cache_factory = cache_factory or default_cache
+        self.fetch_engine = fetch_engine
+        self.dispatcher = dispatcher
+        self.cache_handler = None  # Shared CacheHandler, loaded in the background after first paint
+        self.cache_lock = threading.Lock()
+        self.warmup_thread = None
+        self.core = None  # AsyncCore running the timer, refreshes and fetch jobs
+        self.timer = None  # Shared tick service for clocks and countdowns
+        self.alert_system = None  # Plays the alerts scheduled by the alert rules
+        self.alert_rules = None  # Rules from config.ini, evaluated as records reach the cache
+        self.coordinator = None
+        self.refresh_service = None  # Background refresh around high-importance releases
+        self.stopped = False
+
+    def start(self):
+        """Start the core, the timer and the alert scheduler, then load the cache in the background."""
+        from utils.alert_system import AlertSystem
+        from utils.async_core import AsyncCore
+        from utils.internal_timer import InternalTimer
+        self.core = AsyncCore(dispatch=self.dispatch).start()
+        if self.fetch_engine is not None:
+            from db.fetch_coordinator import FetchCoordinator
+            self.coordinator = FetchCoordinator(self.fetch_engine, core=self.core)
+        else:
+            # Before any screen can fetch, so the shared coordinator is always created on the core
+            from db.fetch_coordinator import get_fetch_coordinator, set_fetch_core
+            set_fetch_core(self.core)
+            self.coordinator = get_fetch_coordinator()
+        self.timer = InternalTimer()
+        self.timer.start(self.core)
+        self.alert_system = AlertSystem(self.dispatcher)
+        self.alert_system.start(self.core)
+
+        self.warmup_thread = threading.Thread(target=self.warm_up, daemon=True)
+        self.warmup_thread.start()
+        return self
+
+    def warm_up(self):
+        """Load the cache and the alert rules, then start refreshing from the UI thread."""
+        try:
+            self.get_cache_handler()
+            self.start_alert_rules()
+            logger.info('Background warm-up complete')
+        except Exception:
+            logger.exception('Background warm-up failed')
+            return
+        self.core.to_ui(self.start_refresh_service)
+
+    def start_alert_rules(self):
+        """Schedule alerts for the cached events, then evaluate every record merged into the cache."""
+        from utils.alert_rules import AlertRules
+        cache_handler = self.get_cache_handler()
+        self.alert_rules = AlertRules.from_config(self.alert_system)
+        # Runs on the warm-up thread while the UI thread may merge refreshes: under the cache
+        # lock, no merge can change the records mid-ingest or land between ingest and listening
+        with cache_handler.lock:
+            self.alert_rules.ingest(cache_handler.sorted_records, initial=True)
+            cache_handler.add_listener(self.alert_rules.ingest)
+            cache_handler.add_eviction_listener(self.alert_rules.forget)
+
+    def start_refresh_service(self):
+        """Start polling for new data in the background."""
+        from db.refresh_service import RefreshService
+        if self.stopped:
+            return
+        self.refresh_service = RefreshService(
+            self.get_cache_handler(), self.coordinator,
+            # Merge on the UI thread, where the calendar screen reads the cache
+            on_update=lambda records: self.core.to_ui(self.merge_refresh, records)
+        )
+        self.refresh_service.start(self.core)
+
+    def merge_refresh(self, records):
+        """Merge background-refreshed records into the cache; runs on the UI thread."""
+        if self.stopped:
+            return
+        self.get_cache_handler().add_to_cache(records)
+        if self.on_refresh is not None:
+            self.on_refresh(records)
+
+    def get_cache_handler(self):
+        """Return the shared CacheHandler, loading it on first use."""
+        with self.cache_lock:
+            if self.cache_handler is None:
+                self.cache_handler = self.cache_factory()
+            return self.cache_handler
+
+    def stop(self):
+        """Stop every service, wait for their threads and flush the cache journal."""
+        self.stopped = True
+        if self.warmup_thread is not None:
+            self.warmup_thread.join()
+        if self.refresh_service is not None:
+            self.refresh_service.stop()
+        if self.timer is not None:
+            self.timer.stop()
+        if self.alert_system is not None:
+            self.alert_system.stop()
+            self.alert_system.dispatcher.stop()
+        if self.core is not None:
+            self.core.stop()  # Cancels and waits for every background task
+        from db.ingest_pipeline import shutdown_ingest_pipeline
+        shutdown_ingest_pipeline()
+        if self.cache_handler is not None:
+            self.cache_handler.close()  # Sync the cache journal before exiting
+
+
+def default_cache():
+    """Return the app's journaled cache with the retention policy and storage format from config.ini."""
+    from db.db_handler import open_store
+    from utils.cache_handler import CacheHandler
+    from utils.cache_retention import RetentionPolicy
+    from utils.cache_snapshot import snapshot_enabled
+    return CacheHandler(journaled=True, retention=RetentionPolicy.from_config(), snapshot=snapshot_enabled(),
+                        store=open_store())
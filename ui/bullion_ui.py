@@ -2,37 +2,8 @@ import sys
 import os
 import logging
 import wx
-from pynput import keyboard
-from wx.adv import TaskBarIcon
+from ui.app_services import AppServices
 from ui.main_screen import MainScreen
-from ui.economic_calendar_screen import EconomicCalendarScreen
-from db.DataWorker import DataWorker, EVT_DATA_FETCHED_BINDER
-
-
-class CustomTaskBarIcon(TaskBarIcon):
-    def __init__(self, frame, icon_path):
-        super(CustomTaskBarIcon, self).__init__()
-        self.frame = frame
-        self.set_icon(icon_path)
-        self.Bind(wx.adv.EVT_TASKBAR_LEFT_DOWN, self.on_left_click)
-
-    def CreatePopupMenu(self):
-        menu = wx.Menu()
-        exit_menu_item = wx.MenuItem(menu, wx.ID_EXIT, 'Exit')
-        menu.Append(exit_menu_item)
-        self.Bind(wx.EVT_MENU, self.on_exit, exit_menu_item)
-        return menu
-
-    def set_icon(self, path):
-        icon = wx.Icon(wx.Bitmap(path))
-        self.SetIcon(icon, 'Bullion Bell Running')
-
-    def on_left_click(self, event):
-        if self.frame.IsShown():
-            self.frame.Hide()
-        else:
-            self.frame.Show()
-
 
 
 class MainApp(wx.Frame):
@@ -42,13 +13,26 @@ class MainApp(wx.Frame):
         self.logger.info('Initializing MainApp UI')
         self.overlay_active = False
         self.current_screen = None
+        self.taskbar_icon = None
+        # Core, timer, alerts, cache and refreshes; started once the event loop is up
+        self.services = AppServices(dispatch=wx.CallAfter, on_refresh=self.on_refresh_data)
         self.initUI()
-        self.init_keyboard_listener()
+        self.Bind(wx.EVT_CLOSE, self.on_exit)
+        # Everything not needed for the first frame runs once the event loop is up
+        wx.CallAfter(self.finish_startup)
+
+    @property
+    def timer(self):
+        """The shared tick service for clocks and countdowns."""
+        return self.services.timer
 
     def on_exit(self, event):
-        self.frame.Close()  # Close the frame
-        wx.CallAfter(self.frame.Destroy)  # Ensure frame is destroyed
-        wx.Exit()  # Terminate the application
+        """Stop the background services and tear down the window and tray icon."""
+        self.services.stop()
+        if self.taskbar_icon is not None:
+            self.taskbar_icon.RemoveIcon()
+            self.taskbar_icon.Destroy()  # Otherwise the tray icon keeps the main loop alive
+        self.Destroy()
 
     def initUI(self):
         panel = wx.Panel(self)
@@ -72,15 +56,32 @@ class MainApp(wx.Frame):
         self.Show()
 
         # Set the icon for the application window
-        icon_path = os.path.join('resources', 'icons', 'App', 'icon.png')
-        if os.path.exists(icon_path):
-            icon = wx.Icon(wx.Bitmap(icon_path))
+        self.icon_path = os.path.join('resources', 'icons', 'App', 'icon.png')
+        if os.path.exists(self.icon_path):
+            icon = wx.Icon(wx.Bitmap(self.icon_path))
             self.SetIcon(icon)
         else:
-            self.logger.error(f"Icon file not found at path: {icon_path}")
+            self.logger.error("Icon file not found at path: %s", self.icon_path)
 
+    def finish_startup(self):
+        """Deferred initialization that runs after the main screen is shown."""
         # Setup TaskBar Icon
-        self.taskbar_icon = CustomTaskBarIcon(self, icon_path)
+        from ui.system_tray import TaskBarIcon
+        self.taskbar_icon = TaskBarIcon(self, self.icon_path)
+
+        self.init_keyboard_listener()
+
+        # Loads the cache off the UI thread, then starts the refresh service
+        self.services.start()
+
+    def on_refresh_data(self, records):
+        """Update the calendar with background-refreshed records if it is showing."""
+        if hasattr(self.current_screen, 'refresh_from_cache'):
+            self.current_screen.refresh_from_cache()
+
+    def get_cache_handler(self):
+        """Return the shared CacheHandler, loading it on first use."""
+        return self.services.get_cache_handler()
 
     def switch_screen(self, screen_class):
         """Switches the current screen to the given screen class."""
@@ -94,11 +95,13 @@ class MainApp(wx.Frame):
 
     def switch_to_calendar_screen(self):
         """Switch to Economic Calendar screen and trigger data retrieval."""
+        from ui.economic_calendar_screen import EconomicCalendarScreen
         self.switch_screen(EconomicCalendarScreen)
         # Trigger data retrieval for the economic calendar screen
         self.current_screen.start_data_fetch()
 
     def init_keyboard_listener(self):
+        from pynput import keyboard
         listener = keyboard.GlobalHotKeys({
             '<alt>+<shift>+a': lambda: self.toggle_overlay()
         })
@@ -0,0 +1,117 @@
+import random
+from utils.value_parser import format_surprise
+
+# Grid columns as (label, record key) pairs, in display order
+COLUMNS = [
+    ("Date", 'date'), ("Time", 'time'), ("Zone", 'zone'), ("Currency", 'currency'),
+    ("Importance", 'importance'), ("Event", 'event'), ("Actual", 'actual'),
+    ("Forecast", 'forecast'), ("Previous", 'previous'), ("Surprise", 'surprise'), ("Countdown", 'countdown')
+]
+
+# Columns computed at draw time rather than stored per row
+DERIVED_KEYS = {'surprise', 'countdown'}
+DATA_KEYS = [key for _, key in COLUMNS if key not in DERIVED_KEYS]
+
+
+class CalendarTableModel:
+    """Column-oriented store behind the calendar grid.
+
+    Values are formatted only when the grid asks for a visible cell, so the cost
+    of loading data is independent of how many rows end up on screen.
+    """
+    def __init__(self, records=None):
+        self.ids = []
+        self.columns = {key: [] for key in DATA_KEYS}
+        self.highlighted = set()  # (id, column key) pairs whose value just changed
+        self.countdown_engine = None  # CountdownEngine providing the countdown column
+        self.now = 0.0  # Epoch the countdown column is drawn for
+        self.surprises = {}  # id -> (surprise, standardized surprise), see ValueAnalyzer.surprises
+        if records:
+            self.set_records(records)
+
+    def set_records(self, records):
+        """Replace the stored rows with the given list of record dicts."""
+        records = [record for record in records if isinstance(record, dict) and 'id' in record]
+        self.ids = [record['id'] for record in records]
+        self.columns = {key: [record.get(key) for record in records] for key in DATA_KEYS}
+
+    def set_table(self, table):
+        """Replace the stored rows with the rows of an EventTable."""
+        self.ids = list(table.ids)
+        self.columns = {key: list(table.column(key)) for key in DATA_KEYS}
+
+    def records(self):
+        """Return the stored rows as record dicts (id plus the displayed fields)."""
+        return [dict({'id': row_id}, **{key: self.columns[key][row] for key in DATA_KEYS})
+                for row, row_id in enumerate(self.ids)]
+
+    def delete_row(self, row):
+        del self.ids[row]
+        for values in self.columns.values():
+            del values[row]
+
+    def insert_record(self, row, record):
+        self.ids.insert(row, record['id'])
+        for key, values in self.columns.items():
+            values.insert(row, record.get(key))
+
+    def update_record(self, row, record):
+        for key, values in self.columns.items():
+            values[row] = record.get(key)
+
+    def apply_diff(self, diff):
+        """Apply a diff_records() result to the stored rows, highlighting the actuals it changed."""
+        self.highlighted = set()
+        for row in diff['deletes']:
+            self.delete_row(row)
+        for row, record in diff['inserts']:
+            self.insert_record(row, record)
+        for row, record, changed in diff['updates']:
+            self.update_record(row, record)
+            if 'actual' in changed:
+                self.highlighted.add((record['id'], 'actual'))
+
+    def is_highlighted(self, row, col):
+        return (self.ids[row], COLUMNS[col][1]) in self.highlighted
+
+    def number_rows(self):
+        return len(self.ids)
+
+    def number_cols(self):
+        return len(COLUMNS)
+
+    def col_label(self, col):
+        return COLUMNS[col][0]
+
+    def raw_value(self, row, col):
+        key = COLUMNS[col][1]
+        if key in DERIVED_KEYS:
+            return None
+        return self.columns[key][row]
+
+    def value(self, row, col):
+        """Return the display string for a cell."""
+        if COLUMNS[col][1] == 'countdown':
+            if self.countdown_engine is None:
+                return ''
+            return self.countdown_engine.countdown_text(self.ids[row], self.now)
+        if COLUMNS[col][1] == 'surprise':
+            surprise = self.surprises.get(self.ids[row])
+            return format_surprise(*surprise) if surprise is not None else ''
+        value = self.raw_value(row, col)
+        if value is None or value == '':
+            return 'N/A'
+        return str(value)
+
+    def widest_sample(self, col, sample_size=200):
+        """Return the longest display string among a sample of rows for a column.
+
+        The first rows plus a random sample stand in for the full dataset, so
+        sizing columns stays cheap however many events are loaded.
+        """
+        rows = self.number_rows()
+        if rows <= sample_size:
+            sample = range(rows)
+        else:
+            sample = list(range(sample_size // 2)) + random.sample(range(sample_size // 2, rows), sample_size // 2)
+        return max((self.value(row, col) for row in sample), key=len, default='')
@@ -2,12 +2,76 @@ import os
 import json
 import wx
 import wx.grid
-import requests
 from io import BytesIO
 from db.DataWorker import DataWorker, EVT_DATA_FETCHED_BINDER
+from db.fetch_planner import plan_fetch
 from datetime import datetime, timedelta
 from ui.main_screen import MainScreen
-from utils.cache_handler import CacheHandler
+from ui.calendar_model import CalendarTableModel, COLUMNS
+from utils.record_diff import diff_records
+from utils.countdown import CountdownEngine
+from utils.event_search import EventIndex
+from utils.event_table import EventTable
+from utils.logger import summarize
+from utils.value_parser import ValueAnalyzer
+
+SURPRISE_HISTORY_DAYS = 365  # Releases before the window that set each event's surprise scale
+
+
+class CalendarGridTable(wx.grid.GridTableBase):
+    """Virtual grid table that reads cells from a CalendarTableModel on demand."""
+    def __init__(self, model):
+        super(CalendarGridTable, self).__init__()
+        self.model = model
+
+    def GetNumberRows(self):
+        return self.model.number_rows()
+
+    def GetNumberCols(self):
+        return self.model.number_cols()
+
+    def GetValue(self, row, col):
+        return self.model.value(row, col)
+
+    def SetValue(self, row, col, value):
+        pass  # The calendar is read-only
+
+    def IsEmptyCell(self, row, col):
+        return False
+
+    def GetColLabelValue(self, col):
+        return self.model.col_label(col)
+
+    def GetAttr(self, row, col, kind):
+        # Highlight cells whose value changed in the last incremental update
+        if self.model.is_highlighted(row, col):
+            attr = wx.grid.GridCellAttr()
+            attr.SetBackgroundColour(wx.Colour(255, 243, 176))
+            return attr
+        return None
+
+    def notify_rows_deleted(self, row, count=1):
+        self.GetView().ProcessTableMessage(wx.grid.GridTableMessage(
+            self, wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED, row, count))
+
+    def notify_rows_inserted(self, row, count=1):
+        self.GetView().ProcessTableMessage(wx.grid.GridTableMessage(
+            self, wx.grid.GRIDTABLE_NOTIFY_ROWS_INSERTED, row, count))
+
+    def notify_rows_changed(self, old_rows):
+        """Tell the grid how the row count changed and refresh visible values."""
+        grid = self.GetView()
+        new_rows = self.GetNumberRows()
+        grid.BeginBatch()
+        if new_rows < old_rows:
+            grid.ProcessTableMessage(wx.grid.GridTableMessage(
+                self, wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED, new_rows, old_rows - new_rows))
+        elif new_rows > old_rows:
+            grid.ProcessTableMessage(wx.grid.GridTableMessage(
+                self, wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED, new_rows - old_rows))
+        grid.ProcessTableMessage(wx.grid.GridTableMessage(self, wx.grid.GRIDTABLE_REQUEST_VIEW_GET_VALUES))
+        grid.EndBatch()
+
 
 class EconomicCalendarScreen(wx.Panel):
     def __init__(self, parent, app):
@@ -15,12 +79,25 @@ class EconomicCalendarScreen(wx.Panel):
         self.app = app  # Store the MainApp instance
         self.columns_visibility = {
             'Date': True, 'Time': True, 'Zone': True, 'Currency': True,
-            'Importance': True, 'Event': True, 'Actual': True, 'Forecast': True, 'Previous': True
+            'Importance': True, 'Event': True, 'Actual': True, 'Forecast': True, 'Previous': True,
+            'Surprise': True, 'Countdown': True
         }
-        self.cache_handler = CacheHandler()
-        self.all_data = []  # This will store all fetched data
-        self.initial_data = []  # This will store only the initial 50 records
-        self.records_displayed = 50  # Initially display only 50 records
+        self.cache_handler = app.get_cache_handler()  # Shared and usually already warmed
+        self.all_data = EventTable.empty()  # This will store all fetched data
+        self.event_index = EventIndex(self.all_data)  # Filter indexes over all_data
+        self.filters = {'text': '', 'currencies': None, 'zones': None, 'min_importance': None}
+        self.table_model = CalendarTableModel()  # Columnar store behind the virtual grid
+        self.worker = None
+        self.start_date = self.end_date = None  # Window shown, set by start_data_fetch
+        self.countdown_engine = CountdownEngine()  # Release times as UTC epochs for the countdown column
+        self.table_model.countdown_engine = self.countdown_engine
+        self.value_analyzer = ValueAnalyzer()  # Surprise column, parsed once per event id and value
+        self.history = EventTable.empty()  # Cached releases before the window, for the surprise scale
+        self.tick_subscription = None
+        if getattr(app, 'timer', None) is not None:
+            # Tick once a second from the shared timer; the repaint happens on the UI thread
+            self.tick_subscription = app.timer.subscribe(
+                lambda tick: wx.CallAfter(self.refresh_countdowns, tick.epoch), resolution=1)
 
         # Initialize the UI
         self.initUI()
@@ -65,31 +142,52 @@ class EconomicCalendarScreen(wx.Panel):
         # Add the toolbar sizer to the main vertical sizer
         vbox.Add(toolbar_sizer, 0, wx.EXPAND | wx.ALL, 5)
 
-        # Create a table (grid) view for displaying economic calendar data
+        # Filter bar: event name search plus currency, zone and importance filters
+        filter_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.search_box = wx.SearchCtrl(self, size=(220, -1))
+        self.search_box.SetDescriptiveText("Search events")
+        self.search_box.ShowCancelButton(True)
+        self.search_box.Bind(wx.EVT_TEXT, self.on_filter_changed)
+        self.search_box.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.on_search_cancel)
+        filter_sizer.Add(self.search_box, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+
+        self.currency_choice = wx.Choice(self, choices=["All currencies"])
+        self.zone_choice = wx.Choice(self, choices=["All zones"])
+        self.importance_choice = wx.Choice(self, choices=["Any importance", "Low+", "Medium+", "High"])
+        for choice in (self.currency_choice, self.zone_choice, self.importance_choice):
+            choice.SetSelection(0)
+            choice.Bind(wx.EVT_CHOICE, self.on_filter_changed)
+            filter_sizer.Add(choice, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        vbox.Add(filter_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 5)
+
+        # Create a virtual table (grid) view; cells are read from the model only when drawn
         self.tableView = wx.grid.Grid(self)
-        self.tableView.CreateGrid(0, 9)  # Adjust the number of columns to exclude ID
-
-        # Set column labels
-        columns = ["Date", "Time", "Zone", "Currency", "Importance", "Event", "Actual", "Forecast", "Previous"]
-        for col_index, col_label in enumerate(columns):
-            self.tableView.SetColLabelValue(col_index, col_label)
+        self.grid_table = CalendarGridTable(self.table_model)
+        self.tableView.SetTable(self.grid_table, takeOwnership=False)
+        self.tableView.SetRowLabelSize(0)  # Hide row labels (serial numbers)
+        self.tableView.EnableEditing(False)
 
         # Adjust column sizes
-        for col in range(9):
+        for col in range(self.table_model.number_cols()):
             self.tableView.SetColSize(col, 100)
 
         # Add the grid to the layout
         vbox.Add(self.tableView, 1, wx.EXPAND | wx.ALL, 5)
 
-        # Add the "Load Rest" button at the bottom
-        self.load_rest_button = wx.Button(self, label="Load Rest")
-        self.load_rest_button.Bind(wx.EVT_BUTTON, self.on_load_rest)
-        vbox.Add(self.load_rest_button, 0, wx.ALIGN_CENTER | wx.ALL, 5)
-
         self.SetSizer(vbox)
 
         # Bind the custom data fetched event
         self.Bind(EVT_DATA_FETCHED_BINDER, self.handle_data_fetched)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+
+    def on_destroy(self, event):
+        """Stop receiving fetch results once the screen is gone."""
+        if event.GetEventObject() is self:
+            if self.worker is not None:
+                self.worker.cancel()
+            if self.tick_subscription is not None:
+                self.app.timer.unsubscribe(self.tick_subscription)
+        event.Skip()
 
     def on_back_to_home(self, event):
         """Navigate back to the main screen."""
@@ -127,10 +225,9 @@ class EconomicCalendarScreen(wx.Panel):
     def apply_column_visibility(self, event, dialog):
         """Update the grid based on the checkbox selection and close dialog."""
         for col_index, (column, visible) in enumerate(self.columns_visibility.items()):
-            if visible:
-                self.tableView.SetColSize(col_index, 100)  # Set size to default
-            else:
+            if not visible:
                 self.tableView.SetColSize(col_index, 0)  # Hide column by setting size to 0
+        self.fit_columns()  # Size the visible columns to their content
 
         self.tableView.ForceRefresh()
         self.resize_window_to_fit()  # Resize window after updating visibility
@@ -140,7 +237,7 @@ class EconomicCalendarScreen(wx.Panel):
     def resize_window_to_fit(self):
         """Resize window to fit table contents and maintain a fixed height."""
         total_width = sum([self.tableView.GetColSize(col) for col in range(self.tableView.GetNumberCols())])
-        total_height = self.tableView.GetNumberRows() * self.tableView.GetRowSize(0) + 100  # Add some padding
+        total_height = self.tableView.GetNumberRows() * self.tableView.GetDefaultRowSize() + 100  # Add some padding
 
         required_width = total_width + 50  # Add some padding for width
         max_initial_height = 450  # Set the maximum height for the initial window
@@ -160,70 +257,165 @@ class EconomicCalendarScreen(wx.Panel):
         start_date = current_date - timedelta(days=1)  # Start date is 1 day before current date
         end_date = current_date + timedelta(days=7)  # End date is 7 days after current date
 
-        # Load cached data within the desired date range
-        cached_data = self.cache_handler.get_cached_data(start_date, end_date)
-        if cached_data:
-            self.app.logger.info(f"Loaded {len(cached_data)} records from cache.")
-            self.update_table(cached_data)
+        # Load cached data within the desired date range, and the releases before it once
+        self.history = self.cache_handler.get_cached_table(
+            start_date - timedelta(days=SURPRISE_HISTORY_DAYS), start_date)
+        cached_data = self.cached_window(start_date, end_date)
+        if len(cached_data):
+            self.app.logger.info("Loaded %d records from cache.", len(cached_data))
+            self.set_all_data(cached_data)
+            self.update_table(self.filtered_data())
 
         # Format the dates as required by the investpy API (DD/MM/YYYY)
         formatted_start_date = start_date.strftime('%d/%m/%Y')
         formatted_end_date = end_date.strftime('%d/%m/%Y')
+        self.start_date, self.end_date = start_date, end_date
+
+        # Only fetch the days that are not already cached and finalized
+        segments = plan_fetch(self.cache_handler, start_date, end_date)
+        if not segments:
+            self.app.logger.info("All days in range are cached and final; skipping fetch.")
+            return
 
-        # Fetch data from the API for the desired range and merge with cache
-        self.app.logger.info(f"Fetching data from {formatted_start_date} to {formatted_end_date}")
-        self.worker = DataWorker(formatted_start_date, formatted_end_date, self)
+        self.app.logger.info("Fetching data from %s to %s in segments %s",
+                             formatted_start_date, formatted_end_date, segments)
+        self.worker = DataWorker(formatted_start_date, formatted_end_date, self, segments=segments)
         self.worker.start()
 
     def handle_data_fetched(self, event):
         data = event.data
-        if data is not None and isinstance(data, list):
-            self.app.logger.info(f"Data received: {data}")
-            self.all_data = data
-            self.initial_data = data[:self.records_displayed]  # Only the first 50 records initially
-            self.cache_handler.add_to_cache(data)  # Save fetched data to cache
-            self.update_table(self.initial_data)
+        if data is not None and isinstance(data, EventTable):
+            if event.complete:
+                self.app.logger.info("Data fetch complete.")
+                return
+            self.app.logger.debug("Data received: %s", summarize(data))
+            self.cache_handler.add_to_cache(data)  # Merge the fetched chunk into the cache
+            self.refresh_from_cache()
         else:
             self.app.logger.error("Failed to fetch data or data format is incorrect")
 
+    def refresh_from_cache(self):
+        """Show the cached window, e.g. after a fetch or a background refresh merged new data."""
+        if self.start_date is None:
+            return
+        # Fetches only cover the stale days, so show the merged window from the cache
+        self.set_all_data(self.cached_window(self.start_date, self.end_date))
+        if self.table_model.number_rows():
+            self.apply_table_diff(self.filtered_data())  # Only touch the rows that changed
+        else:
+            self.update_table(self.filtered_data())
+
+    def cached_window(self, start_date, end_date):
+        """Return the cached rows between the dates in grid order: by day, then release time."""
+        # The cache orders rows by day only, so a release merged late would land below later ones
+        return self.cache_handler.get_cached_table(start_date, end_date).sort()
+
+    def set_all_data(self, data):
+        """Store the calendar window and rebuild the filter indexes and choices over it."""
+        self.all_data = data
+        self.event_index = EventIndex(data)
+        self.countdown_engine.ingest_table(data)
+        self.table_model.surprises = self.value_analyzer.surprises(data, self.history)
+        self.update_filter_choices()
+
+    def update_filter_choices(self):
+        """Offer the currencies and zones present in the data, keeping the current selections."""
+        for choice, field in ((self.currency_choice, 'currency'), (self.zone_choice, 'zone')):
+            selected = choice.GetStringSelection()
+            labels = [choice.GetString(0)] + sorted(self.all_data.categories[field])
+            if labels == choice.GetItems():
+                continue
+            choice.SetItems(labels)
+            choice.SetSelection(labels.index(selected) if selected in labels else 0)
+
+    def filtered_data(self):
+        """Return the rows of all_data that pass the filter bar."""
+        return self.event_index.filter_table(**self.filters)
+
+    def on_search_cancel(self, event):
+        self.search_box.ChangeValue('')
+        self.on_filter_changed(event)
+
+    def on_filter_changed(self, event):
+        """Re-run the query when the search text or a filter choice changes."""
+        def selected(choice):
+            # The first entry of each choice means "no filter"
+            return {choice.GetStringSelection()} if choice.GetSelection() > 0 else None
+
+        self.filters = {
+            'text': self.search_box.GetValue(),
+            'currencies': selected(self.currency_choice),
+            'zones': selected(self.zone_choice),
+            'min_importance': [None, 'low', 'medium', 'high'][self.importance_choice.GetSelection()],
+        }
+        # Swap the filtered rows in without resizing the window on every keystroke
+        old_rows = self.table_model.number_rows()
+        self.table_model.highlighted = set()
+        self.table_model.set_table(self.filtered_data())
+        self.grid_table.notify_rows_changed(old_rows)
+        self.tableView.ForceRefresh()
+
     def update_table(self, data):
-        # Clear existing data and reset grid
-        self.tableView.ClearGrid()
-        self.tableView.SetRowLabelSize(0)  # Hide row labels (serial numbers)
-        if self.tableView.GetNumberRows() > 0:
-            self.tableView.DeleteRows(0, self.tableView.GetNumberRows(), True)
-
-        # Set number of rows based on data
-        num_rows = len(data)
-        if num_rows > 0:
-            self.tableView.AppendRows(num_rows)
-
-        # Populate grid with data
-        for row_index, row in enumerate(data):
-            if isinstance(row, dict) and all(k in row for k in
-                                             ['id', 'date', 'time', 'zone', 'currency', 'importance', 'event', 'actual',
-                                              'forecast', 'previous']):
-                # Populate the data in columns
-                self.tableView.SetCellValue(row_index, 0, row['date'])
-                self.tableView.SetCellValue(row_index, 1, row['time'] or 'N/A')
-                self.tableView.SetCellValue(row_index, 2, row['zone'] or 'N/A')
-                self.tableView.SetCellValue(row_index, 3, row['currency'] or 'N/A')
-                self.tableView.SetCellValue(row_index, 4, row['importance'] or 'N/A')
-                self.tableView.SetCellValue(row_index, 5, row['event'] or 'N/A')
-                self.tableView.SetCellValue(row_index, 6, str(row['actual']) if row['actual'] else 'N/A')
-                self.tableView.SetCellValue(row_index, 7, str(row['forecast']) if row['forecast'] else 'N/A')
-                self.tableView.SetCellValue(row_index, 8, str(row['previous']) if row['previous'] else 'N/A')
-
-        # Auto-resize columns to fit the content
-        self.tableView.AutoSizeColumns()
+        # Swap the rows in the model and let the grid pull only the visible cells
+        old_rows = self.table_model.number_rows()
+        self.table_model.set_table(data)
+        self.grid_table.notify_rows_changed(old_rows)
+
+        # Size columns from a sample of rows instead of measuring every cell
+        self.fit_columns()
 
         # Resize the window to fit the content
         self.resize_window_to_fit()
 
         self.app.logger.info("Table update complete.")
 
-    def on_load_rest(self, event):
-        """Load the rest of the data when the 'Load Rest' button is clicked."""
-        self.update_table(self.all_data)  # Load all records
-        self.load_rest_button.Hide()  # Hide the button after loading the rest
-        self.Layout()  # Re-layout the window to fit changes
+    def apply_table_diff(self, data):
+        """Update the grid in place from a keyed diff against the displayed rows."""
+        diff = diff_records(self.table_model.records(), data.to_records())
+
+        surprises_changed = False
+        self.tableView.BeginBatch()
+        self.table_model.apply_diff(diff)
+        # The grid reads cells from the model when it repaints, so it only needs the row counts in order
+        for row in diff['deletes']:
+            self.grid_table.notify_rows_deleted(row)
+        for row, _ in diff['inserts']:
+            self.grid_table.notify_rows_inserted(row)
+        for row, record, changed in diff['updates']:
+            surprises_changed = surprises_changed or 'actual' in changed or 'forecast' in changed
+            for col, (_, key) in enumerate(COLUMNS):
+                if key in changed:
+                    self.tableView.RefreshBlock(row, col, row, col)
+        if surprises_changed and self.table_model.number_rows():
+            # A new actual also rescales the standardized surprise of the event's other releases
+            col = list(self.columns_visibility).index('Surprise')
+            self.tableView.RefreshBlock(0, col, self.table_model.number_rows() - 1, col)
+        self.tableView.EndBatch()
+
+        self.app.logger.debug("Table diff applied: %d deleted, %d inserted, %d updated.",
+                              len(diff['deletes']), len(diff['inserts']), len(diff['updates']))
+
+    def refresh_countdowns(self, now):
+        """Repaint the countdown cells of the rows currently on screen."""
+        if not self or not self.columns_visibility['Countdown'] or not self.table_model.number_rows():
+            return
+        self.table_model.now = now
+        col = list(self.columns_visibility).index('Countdown')
+        # Only the rows inside the scrolled viewport are repainted
+        _, top = self.tableView.CalcUnscrolledPosition(0, 0)
+        _, height = self.tableView.GetGridWindow().GetClientSize()
+        first_row = max(self.tableView.YToRow(top), 0)
+        last_row = self.tableView.YToRow(top + height)
+        if last_row == wx.NOT_FOUND:
+            last_row = self.table_model.number_rows() - 1
+        self.tableView.RefreshBlock(first_row, col, last_row, col)
+
+    def fit_columns(self):
+        """Set visible column widths from the widest text in a sample of rows."""
+        padding = 16
+        for col, (label, visible) in enumerate(self.columns_visibility.items()):
+            if not visible:
+                continue
+            text = max(label, self.table_model.widest_sample(col), key=len)
+            width, _ = self.tableView.GetTextExtent(text)
+            self.tableView.SetColSize(col, width + padding)
@@ -1,7 +1,8 @@
+import os
 import wx
-from wx.adv import TaskBarIcon  # Import TaskBarIcon from wx.adv
+import wx.adv
 
-# TaskBar Icon Implementation
+# TaskBar Icon used by MainApp (created after the first frame is shown)
 class TaskBarIcon(wx.adv.TaskBarIcon):
     def __init__(self, frame, icon_path):
         wx.adv.TaskBarIcon.__init__(self)
@@ -28,12 +29,13 @@ class TaskBarIcon(wx.adv.TaskBarIcon):
             self.frame.Show()
 
     def on_exit(self, event):
+        # Closing the main window stops the background services and removes this icon
         wx.CallAfter(self.frame.Close)
 
 # Ensure this script runs properly if called directly
 if __name__ == '__main__':
     app = wx.App(False)
     frame = wx.Frame(None, wx.ID_ANY, "Test")
-    tbicon = TaskBarIcon(frame)
+    tbicon = TaskBarIcon(frame, os.path.join('resources', 'icons', 'App', 'icon.png'))
     frame.Show()
     app.MainLoop()
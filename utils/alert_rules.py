@@ -0,0 +1,403 @@
+import configparser
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+from utils.countdown import fetch_utc_offset, release_time
+from utils.event_search import tokenize
+from utils.event_table import IMPORTANCE_CODES
+from utils.value_parser import parse_values
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
+RULE_PREFIX = 'rule:'
+
+
+class Rule:
+    """A declarative alert rule: which events it watches and when it alerts.
+
+    Conditions left as None match every event. A rule alerts minutes_before a
+    matching release, or, with deviation set, once the actual is out and
+    differs from the forecast by at least deviation (0 alerts on any actual).
+    """
+    def __init__(self, name, currencies=None, zones=None, min_importance=None, event=None,
+                 minutes_before=None, deviation=None, sound=None):
+        self.name = name
+        self.currencies = currencies          # Set of currency codes, or None
+        self.zones = zones                    # Set of lower-case zones, or None
+        self.min_importance = min_importance  # 'low', 'medium' or 'high', or None
+        self.tokens = sorted(set(tokenize(event)))  # Words that must start words of the event name
+        self.minutes_before = minutes_before
+        self.deviation = deviation
+        self.sound = sound
+
+    def matches(self, record):
+        """Return True if the record meets every condition (the unindexed check, used to verify the index)."""
+        if self.currencies is not None and record.get('currency') not in self.currencies:
+            return False
+        if self.zones is not None and record.get('zone') not in self.zones:
+            return False
+        if (self.min_importance is not None
+                and IMPORTANCE_CODES.get(record.get('importance'), 0) < IMPORTANCE_CODES[self.min_importance]):
+            return False
+        words = tokenize(record.get('event'))
+        return all(any(word.startswith(token) for word in words) for token in self.tokens)
+
+
+def compile_rule(name, options):
+    """Build a Rule from the options of a [rule:<name>] section; raise ValueError if they are invalid."""
+    def values(key):
+        items = [item.strip() for item in options.get(key, '').split(',') if item.strip()]
+        return items or None
+
+    currencies = values('currency')
+    zones = values('zone')
+    importance = options.get('importance', '').strip().lower() or None
+    if importance is not None and importance not in IMPORTANCE_CODES:
+        raise ValueError(f"rule {name}: importance must be low, medium or high")
+    minutes_text = options.get('minutes_before', '').strip()
+    deviation_text = options.get('deviation', '').strip()
+    if bool(minutes_text) == bool(deviation_text):
+        raise ValueError(f"rule {name}: set exactly one of minutes_before and deviation")
+    minutes_before = deviation = None
+    if deviation_text:
+        # Same units as the calendar values: "50K", "0.2%", "1.5B"
+        deviation = abs(parse_values([deviation_text])[0])
+        if math.isnan(deviation):
+            raise ValueError(f"rule {name}: deviation {deviation_text!r} is not a number")
+    else:
+        try:
+            minutes_before = float(minutes_text)
+        except ValueError:
+            raise ValueError(f"rule {name}: minutes_before must be a number of minutes")
+    return Rule(
+        name,
+        currencies={currency.upper() for currency in currencies} if currencies else None,
+        zones={zone.lower() for zone in zones} if zones else None,
+        min_importance=importance,
+        event=options.get('event', '').strip() or None,
+        minutes_before=minutes_before,
+        deviation=deviation,
+        sound=options.get('sound', '').strip() or None,
+    )
+
+
+def load_rules(path):
+    """Compile every [rule:<name>] section of an INI file, skipping (and logging) invalid ones."""
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    rules = []
+    for section in parser.sections():
+        if not section.startswith(RULE_PREFIX):
+            continue
+        try:
+            rules.append(compile_rule(section[len(RULE_PREFIX):], parser[section]))
+        except ValueError as e:
+            logger.error("Ignoring alert rule in %s: %s", path, e)
+    return rules
+
+
+class RuleIndex:
+    """Matches events against many rules by intersecting rule bitmaps.
+
+    Each condition is compiled into a map from a value (a currency, a zone, an
+    importance level) to the bitmap of rules it satisfies, wildcard rules
+    included. Matching an event ANDs one bitmap per condition, so its cost
+    depends on the number of rules only through the bitmap width. For names,
+    every prefix of every word of the event name adds one to the rules that
+    contain it as a word, and a rule matches when all of its words were
+    counted; this is done once per distinct event name.
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        size = len(self.rules)
+
+        def wildcard(attribute):
+            return np.array([getattr(rule, attribute) is None for rule in self.rules], dtype=bool)
+
+        self.any_currency = wildcard('currencies')
+        self.any_zone = wildcard('zones')
+        self.by_currency = self.value_bitmaps('currencies', self.any_currency)
+        self.by_zone = self.value_bitmaps('zones', self.any_zone)
+
+        # Rules whose minimum importance is at most each level
+        levels = np.array([IMPORTANCE_CODES[rule.min_importance] for rule in self.rules], dtype=np.int8)
+        self.by_importance = [levels <= level for level in range(len(IMPORTANCE_CODES))]
+
+        # Word -> indexes of the rules whose name condition contains it
+        token_rules = {}
+        for i, rule in enumerate(self.rules):
+            for token in rule.tokens:
+                token_rules.setdefault(token, []).append(i)
+        self.token_rules = {token: np.array(indexes, dtype=np.int64) for token, indexes in token_rules.items()}
+        self.token_counts = np.array([len(rule.tokens) for rule in self.rules], dtype=np.int32)
+        self.any_name = self.token_counts == 0
+        self.max_token_length = max((len(token) for token in token_rules), default=0)
+        self.name_bitmaps = {}  # Event name -> bitmap of rules whose name condition it meets
+        self.size = size
+
+        # Records are matched against one kind of rule at a time
+        self.release_rules = np.array([rule.minutes_before is not None for rule in self.rules], dtype=bool)
+        self.deviation_rules = ~self.release_rules
+
+    def value_bitmaps(self, attribute, wildcard):
+        bitmaps = {}
+        for i, rule in enumerate(self.rules):
+            for value in getattr(rule, attribute) or ():
+                bitmaps.setdefault(value, wildcard.copy())[i] = True
+        return bitmaps
+
+    def name_bitmap(self, name):
+        bitmap = self.name_bitmaps.get(name)
+        if bitmap is not None:
+            return bitmap
+        prefixes = {word[:length] for word in tokenize(name)
+                    for length in range(1, min(len(word), self.max_token_length) + 1)}
+        counts = np.zeros(self.size, dtype=np.int32)
+        for prefix in prefixes:
+            rules = self.token_rules.get(prefix)
+            if rules is not None:
+                counts[rules] += 1  # A rule lists each word once, so indexes never repeat here
+        bitmap = self.any_name | (counts == self.token_counts)
+        self.name_bitmaps[name] = bitmap
+        return bitmap
+
+    def match(self, record, kind=None):
+        """Return the indexes of the rules the record matches, optionally only those in the kind bitmap."""
+        if not self.rules:
+            return []
+        bitmap = self.by_importance[IMPORTANCE_CODES.get(record.get('importance'), 0)]
+        if kind is not None:
+            bitmap = bitmap & kind
+        bitmap = bitmap & self.by_currency.get(record.get('currency'), self.any_currency)
+        bitmap &= self.by_zone.get(record.get('zone'), self.any_zone)
+        if bitmap.any():
+            bitmap &= self.name_bitmap(record.get('event'))
+        return np.flatnonzero(bitmap).tolist()
+
+
+class AlertRules:
+    """Evaluates alert rules incrementally as events and actuals arrive, feeding an AlertSystem.
+
+    ingest() is handed every batch of new or changed records (CacheHandler
+    listeners call it after each merge), and forget() the ids evicted by it. A record is only re-evaluated when its
+    release time or actual changed since it was last seen. Release rules
+    schedule an alert before each matching release, moved or cancelled if the
+    release moves; deviation rules alert as soon as a matching actual comes out.
+    """
+    def __init__(self, alert_system, rules, clock=None, fresh_seconds=900):
+        self.alert_system = alert_system
+        self.index = RuleIndex(rules)
+        self.clock = clock or datetime.now
+        self.fresh_seconds = fresh_seconds  # An actual first seen this long after its release still alerts
+        self.seen = {}       # Record id -> (date, time, actual) when last evaluated
+        self.release_times = {}  # (date, time, fetch offset) -> release datetime, or None for all-day events
+        self.scheduled = {}  # Record id -> alerts scheduled for its release
+        self.stats = {'evaluated': 0, 'skipped': 0, 'scheduled': 0, 'fired': 0}
+        self.lock = threading.Lock()  # Listeners may be called from the UI thread and fetch threads
+
+    @classmethod
+    def from_config(cls, alert_system, path=DEFAULT_CONFIG, **kwargs):
+        """Load the [rule:<name>] sections of config.ini and of the [alerts] rules_file, if set."""
+        rules = load_rules(path)
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        rules_file = parser.get('alerts', 'rules_file', fallback='').strip()
+        if rules_file:
+            if not os.path.isabs(rules_file):
+                rules_file = os.path.join(os.path.dirname(os.path.dirname(path)), rules_file)
+            if os.path.exists(rules_file):
+                rules.extend(load_rules(rules_file))
+            else:
+                logger.error("Alert rules file %s not found", rules_file)
+        logger.info("Loaded %d alert rules", len(rules))
+        return cls(alert_system, rules, **kwargs)
+
+    @property
+    def rules(self):
+        return self.index.rules
+
+    def ingest(self, records, initial=False):
+        """Evaluate new or changed records; with initial=True, past actuals never alert.
+
+        Returns the number of records that needed evaluating.
+        """
+        with self.lock:
+            if not self.rules:
+                return 0
+            now = self.clock()
+            offset = fetch_utc_offset()  # Release times are in the offset the calendar is fetched in
+            new_actuals = []
+            evaluated = 0
+            for record in records:
+                signature = (record.get('date'), record.get('time'), record.get('actual'))
+                previous = self.seen.get(record['id'])
+                if previous == signature:
+                    self.stats['skipped'] += 1
+                    continue
+                self.seen[record['id']] = signature
+                evaluated += 1
+                key = signature[:2] + (offset,)
+                released_at = self.release_times.get(key, False)
+                if released_at is False:
+                    released_at = self.release_times[key] = release_time(record, offset)
+                if previous is None or previous[:2] != signature[:2]:
+                    self.schedule(record, released_at, now)
+                actual = signature[2]
+                if actual and (previous is None or previous[2] != actual) and not initial:
+                    # An actual on a record first seen long after its release is history, not news
+                    if previous is not None or (released_at is not None
+                                                and (now - released_at).total_seconds() <= self.fresh_seconds):
+                        new_actuals.append(record)
+            self.stats['evaluated'] += evaluated
+            if new_actuals:
+                self.check_deviations(new_actuals, now)
+            return evaluated
+
+    def schedule(self, record, released_at, now):
+        """Replace the release alerts of a record with those of the rules it now matches."""
+        for alert in self.scheduled.pop(record['id'], ()):
+            self.alert_system.cancel_alert(alert)
+        if released_at is None or released_at <= now:
+            return
+        # Several rules asking for the same lead time and sound get one alert, named after the first
+        requests = {}
+        for i in self.index.match(record, self.index.release_rules):
+            rule = self.rules[i]
+            requests.setdefault((rule.minutes_before, rule.sound), rule)
+        alerts = {}
+        for (minutes_before, sound), rule in requests.items():
+            # A release that is already closer than the lead time alerts right away
+            alert_at = max(now, released_at - timedelta(minutes=minutes_before))
+            if (alert_at, sound) not in alerts:
+                alerts[(alert_at, sound)] = self.alert_system.add_alert(
+                    alert_at, sound,
+                    message=f"{record.get('currency')} {record.get('event')} at {record.get('time')} ({rule.name})")
+        if alerts:
+            self.scheduled[record['id']] = list(alerts.values())
+            self.stats['scheduled'] += len(alerts)
+
+    def check_deviations(self, new_actuals, now):
+        """Fire the deviation rules of records whose actual just came out."""
+        # Parse the whole batch in one vectorized call
+        actuals = parse_values([record.get('actual') for record in new_actuals])
+        forecasts = parse_values([record.get('forecast') for record in new_actuals])
+        for record, actual, forecast in zip(new_actuals, actuals, forecasts):
+            fired = set()
+            for i in self.index.match(record, self.index.deviation_rules):
+                rule = self.rules[i]
+                if rule.sound in fired:
+                    continue
+                if rule.deviation > 0 and not abs(actual - forecast) >= rule.deviation:
+                    continue  # Also skips events without a numeric forecast
+                fired.add(rule.sound)
+                self.alert_system.add_alert(
+                    now, rule.sound,
+                    message=f"{record.get('currency')} {record.get('event')}: actual {record.get('actual')}, "
+                            f"forecast {record.get('forecast')} ({rule.name})")
+                self.stats['fired'] += 1
+
+    def forget(self, record_ids):
+        """Drop the state of records that left the cache; their pending alerts stay scheduled.
+
+        CacheHandler eviction listeners call it with the ids retention removed.
+        """
+        with self.lock:
+            for record_id in record_ids:
+                self.seen.pop(record_id, None)
+                self.scheduled.pop(record_id, None)
+            # Release times are shared by every record at the same date and time
+            live = {signature[:2] for signature in self.seen.values()}
+            self.release_times = {key: value for key, value in self.release_times.items() if key[:2] in live}
+
+
+def benchmark(num_rules=5000, num_events=100000, num_actuals=200):
+    """Time indexed matching and incremental ingestion with thousands of rules."""
+    import random
+    import time
+    from utils.audio_dispatcher import AudioDispatcher, NullSink
+    from utils.alert_system import AlertSystem
+    from utils.value_parser import synthetic_calendar
+
+    random.seed(7)
+    currencies = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'CHF', 'NZD']
+    zones = ['united states', 'euro zone', 'united kingdom', 'japan', 'australia', 'canada', 'switzerland']
+    now = datetime.now().replace(second=0, microsecond=0)
+    first_day = (now - timedelta(days=num_events // 80 - 14)).date()  # Two weeks of upcoming releases, like the cache
+    records = synthetic_calendar(days=num_events // 80 + 1)[:num_events]
+    for i, record in enumerate(records):
+        record['id'] = str(i)
+        record['date'] = (first_day + timedelta(days=i // 80)).strftime('%d/%m/%Y')
+        record['time'] = f"{i % 24:02d}:{(i * 7) % 60:02d}"
+        record['currency'] = random.choice(currencies)
+        record['zone'] = random.choice(zones)
+        record['importance'] = random.choice(['low', 'medium', 'high'])
+        if datetime.strptime(record['date'], '%d/%m/%Y') >= now - timedelta(days=1):
+            record['actual'] = None  # Upcoming releases have no actual yet
+
+    words = sorted({word for record in records[:2000] for word in tokenize(record['event'])})
+    rules = []
+    for i in range(num_rules):
+        options = {'importance': random.choice(['', 'low', 'medium', 'high'])}
+        if random.random() < 0.8:
+            options['currency'] = ', '.join(random.sample(currencies, random.randint(1, 2)))
+        if random.random() < 0.2:
+            options['zone'] = random.choice(zones)
+        if random.random() < 0.7:
+            options['event'] = ' '.join(random.sample(words, random.randint(1, 2)))[:random.randint(3, 12)]
+        if random.random() < 0.5:
+            options['minutes_before'] = str(random.choice([1, 5, 15, 60]))
+        else:
+            options['deviation'] = random.choice(['0', '0.5', '1.5%', '2'])
+        rules.append(compile_rule(f"r{i}", options))
+
+    alert_system = AlertSystem(AudioDispatcher(NullSink()))
+    engine = AlertRules(alert_system, rules, clock=lambda: now)
+
+    started = time.perf_counter()
+    engine.ingest(records, initial=True)
+    initial = time.perf_counter() - started
+    print(f"{num_rules} rules, {num_events} events: initial ingest {initial:.2f}s "
+          f"({initial / num_events * 1e6:.1f} us/event), {engine.stats['scheduled']} release alerts scheduled")
+
+    sample = records[-1000:]
+    index = RuleIndex(rules)  # Fresh, so name bitmaps are built as part of the timing
+    started = time.perf_counter()
+    for record in sample:
+        index.match(record)
+    indexed = (time.perf_counter() - started) / len(sample)
+    started = time.perf_counter()
+    for record in sample:
+        [i for i, rule in enumerate(rules) if rule.matches(record)]
+    scan = (time.perf_counter() - started) / len(sample)
+    print(f"Matching per event: indexed {indexed * 1e6:.1f} us, "
+          f"checking every rule {scan * 1e6:.0f} us ({scan / indexed:.0f}x slower)")
+
+    # A refresh re-delivers the whole window; only the records that changed are evaluated
+    window = [dict(record) for record in records[-2000:]]
+    changed = random.sample(range(len(window)), num_actuals)
+    for position in changed:
+        window[position]['actual'] = f"{random.uniform(-3, 3):.2f}"  # Never equal to the old one-decimal value
+    just_released = now - timedelta(minutes=1)
+    for position in changed:
+        window[position]['date'] = just_released.strftime('%d/%m/%Y')
+        window[position]['time'] = just_released.strftime('%H:%M')
+    fired_before = engine.stats['fired']
+    started = time.perf_counter()
+    evaluated = engine.ingest(window)
+    refresh = time.perf_counter() - started
+    print(f"Refresh of {len(window)} records with {len(changed)} new actuals: {refresh * 1000:.1f} ms, "
+          f"{evaluated} evaluated, {engine.stats['fired'] - fired_before} deviation alerts fired")
+
+    started = time.perf_counter()
+    engine.ingest(window)
+    print(f"Same refresh again, nothing changed: {(time.perf_counter() - started) * 1000:.1f} ms")
+    print(f"Pending alerts: {len(alert_system.pending_alerts())}")
+
+
+if __name__ == "__main__":
+    benchmark()
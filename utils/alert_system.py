@@ -1,66 +1,199 @@
-import time
+"""Alert scheduler: a min-heap of alerts fired by one thread or AsyncCore task.
+
+    python -m utils.alert_system --benchmark    # firing lateness with thousands of alerts pending
+"""
+import heapq
+import itertools
+import logging
 import threading
 from datetime import datetime, timedelta
-from playsound import playsound  # Import playsound for sound playback
+from utils.audio_dispatcher import AudioDispatcher
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
 
 class AlertSystem:
-    def __init__(self):
-        self.alerts = []  # List to store alert conditions
+    def __init__(self, dispatcher=None):
+        self.alerts = []  # Min-heap of (event_time, sequence, alert) entries
         self.is_running = False
-        self.alert_interval = 60  # Check every 60 seconds
+        self.condition = threading.Condition()
+        self.counter = itertools.count()  # Tie-breaker so alerts with equal times never compare dicts
+        self.dispatcher = dispatcher or AudioDispatcher()  # Plays sounds off the scheduler thread
+        self.thread = None
+        self.wakeup = None  # Set when running as a task on an AsyncCore
 
-    def add_alert(self, event_time, sound_file):
-        """Add a new alert to the system."""
+    def add_alert(self, event_time, sound_file, message=None):
+        """Add a new alert to the system and return it (for cancellation)."""
         alert = {
             'event_time': event_time,  # The time when the alert should trigger
             'sound_file': sound_file,  # The sound file to play
-            'triggered': False         # Whether the alert has been triggered
+            'message': message,        # What the alert is about, e.g. the event and the rule that set it
+            'triggered': False,        # Whether the alert has been triggered
+            'cancelled': False         # Whether the alert has been cancelled
         }
-        self.alerts.append(alert)
+        if sound_file:
+            self.dispatcher.queue_preload(sound_file)  # Read the sound on the worker now rather than when the alert fires
+        with self.condition:
+            heapq.heappush(self.alerts, (event_time, next(self.counter), alert))
+            # Wake the scheduler only if this alert is now the earliest one
+            if self.alerts[0][2] is alert:
+                self.notify()
+        return alert
+
+    def cancel_alert(self, alert):
+        """Cancel a pending alert; it is dropped lazily when it reaches the top of the heap."""
+        with self.condition:
+            alert['cancelled'] = True
+            self.notify()
 
-    def start(self):
-        """Start the alert system timer."""
+    def notify(self):
+        """Wake the scheduler, whether it is a thread or a task; call with the condition held."""
+        self.condition.notify()
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def start(self, core=None):
+        """Start the alert scheduler, as a task on core or on its own thread."""
         self.is_running = True
-        self.thread = threading.Thread(target=self.run)
+        if core is not None:
+            self.wakeup = core.wakeup()
+            core.spawn(self.run_async())
+            return
+        self.thread = threading.Thread(target=self.run, daemon=True)
         self.thread.start()
 
     def stop(self):
-        """Stop the alert system timer."""
-        self.is_running = False
-        if self.thread.is_alive():
+        """Stop the alert scheduler."""
+        with self.condition:
+            self.is_running = False
+            self.notify()
+        if self.thread is not None and self.thread.is_alive():
             self.thread.join()
 
+    def collect_due(self):
+        """Return the alerts that are due, or the seconds until the next one (None = no alerts).
+
+        Call with the condition held.
+        """
+        # Discard cancelled alerts sitting at the top of the heap
+        while self.alerts and self.alerts[0][2]['cancelled']:
+            heapq.heappop(self.alerts)
+        if not self.alerts:
+            return None
+
+        delay = (self.alerts[0][0] - datetime.now()).total_seconds()
+        if delay > 0:
+            return delay
+
+        due = []
+        now = datetime.now()
+        while self.alerts and self.alerts[0][0] <= now:
+            _, _, alert = heapq.heappop(self.alerts)
+            if not alert['cancelled']:
+                due.append(alert)
+        return due
+
+    def next_due_alerts(self):
+        """Block until alerts are due and return them, or None once stopped."""
+        with self.condition:
+            while self.is_running:
+                due = self.collect_due()
+                if isinstance(due, list):
+                    return due
+                # Sleep exactly until the next alert, or until add/cancel/stop wakes us
+                self.condition.wait(due)
+            return None
+
     def run(self):
-        """Main loop for checking alerts."""
+        """Main loop that fires alerts as they become due."""
+        while True:
+            due = self.next_due_alerts()
+            if due is None:
+                break
+            self.trigger_alerts(due)
+
+    async def run_async(self):
+        """Main loop as a task on an AsyncCore."""
         while self.is_running:
-            current_time = datetime.now()
-            for alert in self.alerts:
-                # Check if the alert time is past and it hasn't been triggered yet
-                if current_time >= alert['event_time'] and not alert['triggered']:
-                    self.trigger_alert(alert)
-            time.sleep(self.alert_interval)
+            with self.condition:
+                due = self.collect_due()
+            if isinstance(due, list):
+                self.trigger_alerts(due)
+            else:
+                await self.wakeup.wait(due)
+
+    def trigger_alerts(self, due):
+        """Trigger a batch of due alerts; a sound shared by several of them plays once."""
+        for alert in due:
+            self.trigger_alert(alert)
+        sounds = [alert['sound_file'] for alert in due if alert['sound_file']]
+        if sounds:
+            self.play_sounds(sounds)
 
     def trigger_alert(self, alert):
-        """Trigger an alert."""
+        """Mark an alert as triggered and log it; its sound is played by trigger_alerts."""
         alert['triggered'] = True
-        self.play_sound(alert['sound_file'])
-        print(f"Alert triggered for event at {alert['event_time']}")
+        alert['triggered_at'] = datetime.now()
+        if alert['message']:
+            logger.info("Alert triggered for event at %s: %s", alert['event_time'], alert['message'])
+        else:
+            logger.info("Alert triggered for event at %s", alert['event_time'])
 
-    def play_sound(self, sound_file):
-        """Play the alert sound using playsound."""
-        try:
-            playsound(sound_file)
-        except Exception as e:
-            print(f"Error playing sound: {e}")
+    def play_sounds(self, sound_files):
+        """Queue alert sounds on the audio dispatcher without blocking, each distinct sound once."""
+        self.dispatcher.dispatch(*dict.fromkeys(sound_files))
+
+    def pending_alerts(self):
+        """Return the alerts that have not fired or been cancelled, earliest first."""
+        with self.condition:
+            return [alert for _, _, alert in sorted(self.alerts) if not alert['cancelled']]
 
     def clear_alerts(self):
         """Clear all alerts from the system."""
-        self.alerts = []
+        with self.condition:
+            self.alerts = []
+            self.notify()
+
+
+def benchmark(num_alerts=5000, window=3.0):
+    """Measure how late alerts fire with thousands pending, sound disabled."""
+    import random
+    import time
+
+    alert_system = AlertSystem()
+    alert_system.trigger_alert = lambda alert: alert.update(triggered=True, triggered_at=datetime.now())
+    alert_system.start()
+
+    base = datetime.now() + timedelta(seconds=0.5)
+    alerts = [alert_system.add_alert(base + timedelta(seconds=random.uniform(0, window)), None)
+              for _ in range(num_alerts)]
+    # Cancel a slice of them to exercise lazy removal
+    for alert in alerts[::10]:
+        alert_system.cancel_alert(alert)
+
+    time.sleep(window + 1.0)
+    alert_system.stop()
+
+    fired = [alert for alert in alerts if alert['triggered']]
+    lateness = sorted((alert['triggered_at'] - alert['event_time']).total_seconds() for alert in fired)
+    print(f"{len(fired)} of {num_alerts} alerts fired ({sum(a['cancelled'] for a in alerts)} cancelled)")
+    print(f"Lateness median {lateness[len(lateness) // 2] * 1000:.2f} ms, "
+          f"p99 {lateness[int(len(lateness) * 0.99)] * 1000:.2f} ms, max {lateness[-1] * 1000:.2f} ms")
+    assert not any(alert['triggered'] for alert in alerts if alert['cancelled'])
+    assert lateness[-1] < 1.0
+
 
 # Example Usage
 if __name__ == "__main__":
+    import sys
+
+    if "--benchmark" in sys.argv:
+        benchmark()
+        sys.exit()
+
     alert_system = AlertSystem()
     # Example alert for 1 minute in the future with a test sound file
     alert_time = datetime.now() + timedelta(minutes=1)
     alert_system.add_alert(alert_time, "alert_sound.wav")  # Make sure "alert_sound.wav" is in the current directory
     alert_system.start()
+    alert_system.thread.join()
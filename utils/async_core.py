@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+
+class Wakeup:
+    """Thread-safe signal for a coroutine that sleeps until a deadline.
+
+    set() may be called from any thread; wait(timeout) returns when the
+    timeout expires or set() was called, whichever comes first.
+    """
+    def __init__(self, loop):
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def set(self):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout=None):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.event.clear()
+
+
+class AsyncCore:
+    """One asyncio event loop that runs the app's background work.
+
+    Clock ticks, alerts, refresh timers and fetch jobs run as tasks on this
+    loop instead of as threads with their own sleep loops, and blocking network
+    calls share one bounded executor. Results reach wx through dispatch
+    (wx.CallAfter in the desktop app). stop() cancels every task, waits for
+    them and joins the loop thread, so shutdown is deterministic.
+
+    Pass loop to run on an existing event loop (the daemon's) instead of
+    starting a thread; close it with aclose() from that loop.
+    """
+    def __init__(self, dispatch=None, max_workers=4, loop=None):
+        self.dispatch = dispatch  # Runs a callback on the UI thread; None calls it in place
+        self.max_workers = max_workers
+        self.loop = loop
+        self.owns_loop = loop is None
+        self.thread = None
+        self.executor = None
+        self.tasks = set()
+        if loop is not None:
+            self.install_executor()
+
+    def install_executor(self):
+        # Blocking calls (HTTP, disk) share these threads instead of each job starting its own
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='AsyncCoreIO')
+        self.loop.set_default_executor(self.executor)
+
+    def start(self):
+        """Start the loop thread (no-op when running on a borrowed loop); returns self."""
+        if not self.owns_loop or self.thread is not None:
+            return self
+        self.loop = asyncio.new_event_loop()
+        self.install_executor()
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(ready,), name='AsyncCore', daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    def run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def spawn(self, coro):
+        """Schedule a coroutine from any thread; return a concurrent.futures.Future for its result."""
+        return asyncio.run_coroutine_threadsafe(self.track(coro), self.loop)
+
+    async def track(self, coro):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            return await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background task failed")
+            raise
+        finally:
+            self.tasks.discard(task)
+
+    def call_soon(self, callback, *args):
+        """Run callback on the loop thread."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        """Run callback on the loop thread after delay seconds; callable from any thread."""
+        self.loop.call_soon_threadsafe(self.loop.call_later, delay, callback, *args)
+
+    def run_blocking(self, func, *args):
+        """Await a blocking call on the shared executor."""
+        return self.loop.run_in_executor(None, func, *args)
+
+    def to_ui(self, callback, *args):
+        """Hand a result to the UI thread."""
+        if self.dispatch is None:
+            callback(*args)
+        else:
+            self.dispatch(callback, *args)
+
+    def wakeup(self):
+        return Wakeup(self.loop)
+
+    async def cancel_tasks(self):
+        tasks = [task for task in self.tasks if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def aclose(self):
+        """Cancel every task on a borrowed loop and release the executor."""
+        await self.cancel_tasks()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self, timeout=35.0):
+        """Cancel every task, then stop the loop thread and its executor.
+
+        Blocking calls already running finish first (HTTP requests time out
+        after 30 s); queued ones are dropped.
+        """
+        if not self.owns_loop or self.thread is None:
+            return
+        if self.thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self.cancel_tasks(), self.loop).result(timeout)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.thread = None
+
+
+def idle_benchmark(seconds=5.0):
+    """Compare the idle app's background threads, wakeups and shutdown with and without the core.
+
+    Runs the clock with a once-a-second subscriber, the alert scheduler with
+    an alert an hour away and the refresh service over an in-memory cache, as
+    the desktop app does between releases.
+    """
+    import resource
+    import time
+    from datetime import datetime, timedelta
+    from db.fetch_coordinator import FetchCoordinator
+    from db.refresh_service import RefreshService
+    from utils.alert_system import AlertSystem
+    from utils.audio_dispatcher import AudioDispatcher, NullSink
+    from utils.cache_handler import CacheHandler
+    from utils.internal_timer import InternalTimer
+
+    class EmptyEngine:
+        """Fetch engine stand-in that returns no records immediately."""
+        def fetch(self, segments, on_chunk=None, cancel_event=None):
+            return [], []
+
+        async def fetch_async(self, segments, on_chunk=None, cancel_event=None):
+            return [], []
+
+    def measure(use_core):
+        baseline = threading.active_count()
+        core = AsyncCore().start() if use_core else None
+        timer = InternalTimer()
+        timer.subscribe(lambda tick: None)
+        alerts = AlertSystem(AudioDispatcher(NullSink()))
+        alerts.add_alert(datetime.now() + timedelta(hours=1), None)
+        service = RefreshService(CacheHandler(cache_file=None), FetchCoordinator(EmptyEngine(), core=core),
+                                 on_update=lambda records: None)
+        for component in (timer, alerts, service):
+            component.start(core)
+        time.sleep(0.5)  # Let the first refresh complete
+
+        switches = resource.getrusage(resource.RUSAGE_SELF).ru_nvcsw
+        time.sleep(seconds)
+        switches = resource.getrusage(resource.RUSAGE_SELF).ru_nvcsw - switches
+        threads = threading.active_count() - baseline
+
+        started = time.perf_counter()
+        for component in (service, alerts, timer):
+            component.stop()
+        if core is not None:
+            core.stop()
+        shutdown = time.perf_counter() - started
+        leftover = threading.active_count() - baseline
+        return threads, switches * 60 / seconds, shutdown, leftover
+
+    for name, use_core in (("Thread per service", False), ("AsyncCore", True)):
+        threads, wakeups, shutdown, leftover = measure(use_core)
+        print(f"{name}: {threads} background threads, {wakeups:.0f} context switches/min idle, "
+              f"shutdown {shutdown * 1000:.1f} ms, {leftover} threads left")
+
+
+if __name__ == "__main__":
+    idle_benchmark()
@@ -0,0 +1,179 @@
+import logging
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+
+class NullSink:
+    """Sink that plays nothing; used on machines without an audio device."""
+    def __init__(self):
+        self.played = []
+
+    def play(self, sample):
+        self.played.append(sample['path'])
+
+
+def is_wav(data):
+    """Return True if data holds a RIFF/WAVE file, the only format winsound plays."""
+    return data is not None and data[:4] == b'RIFF' and data[8:12] == b'WAVE'
+
+
+class PlaysoundSink:
+    """Sink that plays files through playsound, which plays any format but only from a path.
+
+    playsound cannot play from a buffer, so it reads the file itself on every
+    play; samples that failed to load are skipped instead of read again.
+    """
+    def play(self, sample):
+        if sample['data'] is None:
+            return
+        from playsound import playsound
+        playsound(sample['path'])
+
+
+class WinsoundSink:
+    """Sink that plays preloaded WAV bytes from memory on Windows, and other formats through playsound."""
+    def __init__(self):
+        self.fallback = PlaysoundSink()
+
+    def play(self, sample):
+        if not is_wav(sample['data']):
+            # The bundled alerts are mp3, which SND_MEMORY cannot play
+            self.fallback.play(sample)
+            return
+        import winsound
+        winsound.PlaySound(sample['data'], winsound.SND_MEMORY)
+
+
+def default_sink():
+    """Return the best available sink for this platform."""
+    if sys.platform == 'win32':
+        return WinsoundSink()
+    return PlaysoundSink()
+
+
+class AudioDispatcher:
+    def __init__(self, sink=None):
+        """Initialize the dispatcher with a sink and an empty sample cache."""
+        self.sink = sink or default_sink()
+        self.samples = {}  # sound_file -> sample, so each file is read from disk once
+        self.samples_lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.latencies = deque(maxlen=1000)  # Seconds between dispatch() and the start of recent playbacks
+        self.thread = None
+
+    def preload(self, sound_file):
+        """Read a sound file into the sample cache if it is not there yet."""
+        with self.samples_lock:
+            sample = self.samples.get(sound_file)
+            if sample is None:
+                try:
+                    with open(sound_file, 'rb') as f:
+                        data = f.read()
+                except OSError as e:
+                    logger.error("Error loading sound %s: %s", sound_file, e)
+                    data = None
+                sample = self.samples[sound_file] = {'path': sound_file, 'data': data}
+            return sample
+
+    def start(self):
+        """Start the playback worker thread."""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the playback worker once queued sounds are handled."""
+        self.queue.put(None)
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+
+    def dispatch(self, *sound_files):
+        """Queue sounds for playback without blocking the caller; a sound repeated in one call plays once."""
+        if self.thread is None:
+            self.start()
+        self.queue.put((sound_files, time.perf_counter()))
+
+    def queue_preload(self, *sound_files):
+        """Have the worker read sounds into the sample cache without blocking the caller."""
+        if self.thread is None:
+            self.start()
+        self.queue.put((sound_files, None))  # No dispatch time: load, don't play
+
+    def drain(self, first):
+        """Collect everything already queued, coalescing repeats of the same sound.
+
+        Returns the sounds to play, the sounds only to preload, and whether a
+        stop request was reached.
+        """
+        batch, preloads = {}, []
+        item = first
+        while item is not None:
+            sound_files, queued_at = item
+            if queued_at is None:
+                preloads.extend(sound_files)
+            else:
+                for sound_file in sound_files:
+                    batch.setdefault(sound_file, queued_at)
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return batch, preloads, False
+        return batch, preloads, True
+
+    def run(self):
+        """Worker loop that plays queued sounds one after another."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch, preloads, stop = self.drain(item)
+            for sound_file, queued_at in batch.items():
+                sample = self.preload(sound_file)
+                self.latencies.append(time.perf_counter() - queued_at)
+                try:
+                    self.sink.play(sample)
+                except Exception as e:
+                    # A broken sound backend must not stop the worker
+                    logger.error("Error playing sound %s: %s", sound_file, e)
+            # Loading comes after playing, so a file read never delays a due sound
+            for sound_file in preloads:
+                self.preload(sound_file)
+            if stop:
+                break
+
+
+def benchmark(num_alerts=2000, window=2.0):
+    """Measure scheduler-to-dispatch latency with a null sink and a slow sink."""
+    import random
+    from datetime import datetime, timedelta
+    from utils.alert_system import AlertSystem
+
+    class SlowSink(NullSink):
+        def play(self, sample):
+            super().play(sample)
+            time.sleep(0.05)
+
+    for sink in (NullSink(), SlowSink()):
+        dispatcher = AudioDispatcher(sink)
+        alert_system = AlertSystem(dispatcher)
+        alert_system.start()
+        base = datetime.now() + timedelta(seconds=0.5)
+        for i in range(num_alerts):
+            # Several alerts share a sound and a time, so they coalesce into one playback
+            alert_system.add_alert(base + timedelta(seconds=round(random.uniform(0, window), 1)), f"sound{i % 3}.wav")
+        time.sleep(window + 1.0)
+        alert_system.stop()
+        dispatcher.stop()
+
+        latencies = sorted(dispatcher.latencies)
+        print(f"{type(sink).__name__}: {num_alerts} alerts -> {len(sink.played)} playbacks, "
+              f"dispatch latency median {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+              f"max {latencies[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,54 +1,494 @@
+"""Date-indexed cache of calendar events, persisted as JSON, a binary snapshot or a store.
+
+    python -m utils.cache_handler --benchmark    # bisect index against a linear scan
+"""
 import json
+import logging
 import os
-from datetime import datetime
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time
+from utils.cache_journal import CacheJournal, atomic_write_json, fsync_directory
+from utils.cache_retention import ColdArchive, is_pending
+from utils.cache_snapshot import SnapshotReader, stage_snapshot
+from utils.event_table import EventTable
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+HOT_DAYS = 7  # Days before today that a cache backed by a snapshot or a store keeps in memory
 
 
 class CacheHandler:
-    def __init__(self, cache_file='cache.json'):
-        """Initialize the CacheHandler with the specified cache file."""
-        self.cache_file = os.path.join(os.path.dirname(__file__), cache_file)
+    def __init__(self, cache_file='cache.json', journaled=False, retention=None, snapshot=False, store=None,
+                 hot_days=HOT_DAYS):
+        """Initialize the CacheHandler with the specified cache file.
+
+        With journaled=True, changes are appended to a journal next to the cache
+        file instead of rewriting the whole file, and folded back into it once
+        the journal grows large. retention is an optional RetentionPolicy that
+        bounds the cache, moving finalized old events to a cold archive. With
+        snapshot=True the cache is stored as a binary snapshot (cache.snap, see
+        utils/cache_snapshot.py) instead of JSON; an existing cache.json is
+        converted on first load. cache_file=None keeps the cache in memory only.
+        store is an optional database (e.g. db.db_handler.DBHandler) that the
+        cache is loaded from and writes only changed and removed rows to; it
+        takes the place of the cache file, its journal and the snapshot.
+
+        A snapshot stays mapped and a store stays open: only the days from
+        hot_days before today onwards are loaded as records, and older days
+        are read from the file or the database when a query asks for them
+        (hot_days=None loads everything).
+
+        Reads and writes of the index hold self.lock. Code that reads cached
+        records on another thread than the one merging into the cache (e.g. the
+        refresh service on the AsyncCore loop) holds it while it looks at them.
+        """
+        self.lock = threading.RLock()
+        self.store = store
+        self.cache_file = os.path.join(os.path.dirname(__file__), cache_file) if cache_file else None
+        self.snapshot_file = f"{os.path.splitext(self.cache_file)[0]}.snap" if snapshot and cache_file else None
+        self.journal = None
+        if journaled and cache_file and store is None:
+            if snapshot:
+                self.journal = CacheJournal(self.snapshot_file, write=self.write_snapshot_file)
+            else:
+                self.journal = CacheJournal(self.cache_file)
+        self.retention = retention
+        self.archive = None
+        if retention is not None and retention.archive and cache_file:
+            self.archive = ColdArchive(f"{os.path.splitext(self.cache_file)[0]}_archive")
+        self.hot_days = hot_days
+        self.snapshot_reader = None  # Mapped snapshot holding the days that were not loaded
+        # (first, last) ordinal days left in the snapshot or the store; a first of None is unbounded
+        self.unloaded_days = None
+        self.snapshot_removed = set()  # Ids deleted since the mapped snapshot was written
+        # Lookups answered from the hot tier alone, and lookups that also read the archive or the unloaded days
+        self.stats = {'hot_lookups': 0, 'archive_lookups': 0, 'unloaded_lookups': 0, 'evictions': 0,
+                      'archived': 0}
+        self.record_bytes = None  # Sampled average record size, see average_record_bytes
+        self.converted = False  # True when a snapshot-mode cache was loaded from cache.json
+        self.listeners = []  # Called with the added and changed records after each merge
+        self.eviction_listeners = []  # Called with the ids that retention removed after a merge
         self.cache = self.load_cache()
+        if self.journal is not None:
+            self.cache.setdefault("data", [])
+            recovered = os.path.exists(self.journal.journal_file) or os.path.exists(self.journal.rotated_file)
+            self.journal.replay(self.cache["data"], on_delete=self.forget_unloaded)
+            if self.converted:
+                # The snapshot must exist before the JSON cache stops being the one that is read
+                self.journal.compact(self.snapshot_records)
+                self.discard_json_journal()
+            elif recovered and self.snapshot_reader is None:
+                # New appends go to a fresh journal; the old one is folded into the snapshot in the background.
+                # A mapped snapshot waits until the journal is large, since folding reads every day left in the file
+                self.journal.maybe_compact(self.snapshot_records, force=True)
+        elif self.converted:
+            self.save_cache()
+            self.discard_json_journal()
+        self.build_index()
+        evicted = self.enforce_retention()
+        if evicted:
+            self.persist([], evicted)
 
     def load_cache(self):
-        """Load cached data from the cache file."""
+        """Load cached data from the store, or the snapshot or the cache file, whichever was written last."""
+        if self.store is not None:
+            return {"data": self.load_window(self.store)}
+        if self.cache_file is None:
+            return {"data": []}
+        if self.snapshot_file is not None:
+            if os.path.exists(self.snapshot_file) and (
+                    not os.path.exists(self.cache_file)
+                    or os.path.getmtime(self.snapshot_file) >= os.path.getmtime(self.cache_file)):
+                try:
+                    return {"data": self.open_snapshot()}
+                except (OSError, ValueError) as e:
+                    logger.error("Snapshot %s is unreadable, falling back to %s: %s",
+                                 self.snapshot_file, self.cache_file, e)
+            if not os.path.exists(self.cache_file):
+                return {"data": []}
+            self.converted = True
         if os.path.exists(self.cache_file):
             with open(self.cache_file, 'r') as f:
                 try:
-                    return json.load(f)
-                except json.JSONDecodeError:
+                    cache = json.load(f)
+                except json.JSONDecodeError as e:
+                    logger.error("Cache file %s is unreadable, starting empty: %s", self.cache_file, e)
                     return {"data": []}
+            if self.converted:
+                # Changes journaled while the cache was still kept as JSON belong in the snapshot too
+                CacheJournal(self.cache_file).replay(cache.setdefault("data", []))
+                logger.info("Converting %s to the snapshot %s", self.cache_file, self.snapshot_file)
+            return cache
         return {"data": []}
 
+    def load_window(self, source):
+        """Return the records to load from a snapshot reader or a store.
+
+        That is the hot window and any days past max_age_days; the days in
+        between are left in source, and unloaded_days is set to them. Days past max_age_days are loaded so enforce_retention moves
+        them out as usual.
+        """
+        today = datetime.now().toordinal()
+        first_day = None
+        if self.retention is not None and self.retention.max_age_days is not None:
+            first_day = today - self.retention.max_age_days
+        last_day = None if self.hot_days is None else today - self.hot_days - 1
+        if last_day is None or (first_day is not None and first_day > last_day):
+            return source.records()
+        self.unloaded_days = (first_day, last_day)
+        records = [] if first_day is None else source.records(None, first_day - 1)
+        return records + source.records(last_day + 1)
+
+    def open_snapshot(self):
+        """Map the snapshot and return the records to load; the mapping is kept while days are left in it."""
+        reader = SnapshotReader(self.snapshot_file)
+        try:
+            records = self.load_window(reader)
+        except Exception:
+            self.unloaded_days = None
+            reader.close()
+            raise
+        if self.unloaded_days is None:
+            reader.close()
+        else:
+            self.snapshot_reader = reader
+        return records
+
+    def unloaded_records(self, first_day=None, last_day=None):
+        """Return the records left in the snapshot or the store dated between two ordinal days (default: all)."""
+        if self.unloaded_days is None:
+            return []
+        unloaded_first, unloaded_last = self.unloaded_days
+        if unloaded_first is not None:
+            first_day = unloaded_first if first_day is None else max(first_day, unloaded_first)
+        last_day = unloaded_last if last_day is None else min(last_day, unloaded_last)
+        if first_day is not None and first_day > last_day:
+            return []
+        source = self.snapshot_reader if self.snapshot_reader is not None else self.store
+        # Records merged or deleted since the snapshot was written take the place of its rows
+        return [record for record in source.records(first_day, last_day)
+                if record['id'] not in self.records_by_id and record['id'] not in self.snapshot_removed]
+
+    def write_snapshot_file(self, path, records):
+        """Write the snapshot file, holding self.lock only to swap it in.
+
+        records is a copy taken under the lock (see snapshot_records), so the
+        encoding and the fsync run without blocking readers. The lock is taken
+        again to unmap the old file for the rename (a mapped file can't be
+        replaced on Windows) and map the new one. Writes must not overlap: the
+        journal runs one compaction at a time, and save_cache writes under the lock.
+        """
+        tmp_path = stage_snapshot(path, records)
+        with self.lock:
+            if self.snapshot_reader is not None:
+                self.snapshot_reader.close()
+                try:
+                    os.replace(tmp_path, path)
+                finally:
+                    # The new file holds the same unloaded days (or, if the rename failed, the old one still does)
+                    self.snapshot_reader = SnapshotReader(path)
+            else:
+                os.replace(tmp_path, path)
+        fsync_directory(path)
+        return os.path.getsize(path)
+
+    def forget_unloaded(self, ids):
+        """Hide deleted ids from the unloaded days, or all of them when ids is None (the cache was cleared)."""
+        if ids is None:
+            self.close_snapshot()
+            self.unloaded_days = None
+        elif self.snapshot_reader is not None:
+            self.snapshot_removed.update(ids)  # A store deletes them itself
+
+    def close_snapshot(self):
+        if self.snapshot_reader is not None:
+            self.snapshot_reader.close()
+            self.snapshot_reader = None
+
+    def discard_json_journal(self):
+        """Remove the JSON cache's journal once a conversion has folded it into the snapshot."""
+        json_journal = CacheJournal(self.cache_file)
+        for path in (json_journal.journal_file, json_journal.rotated_file):
+            if os.path.exists(path):
+                os.remove(path)
+                fsync_directory(path)
+
     def save_cache(self):
-        """Save the current cache data to the cache file."""
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f, indent=4)
+        """Save the current cache data to the store, the snapshot or the cache file."""
+        if self.store is not None:
+            self.store.replace(self.snapshot_records())
+            return
+        if self.cache_file is None:
+            return
+        if self.snapshot_file is not None:
+            with self.lock:  # Unjournaled saves run on every merge, which holds the lock already
+                self.write_snapshot_file(self.snapshot_file, self.snapshot_records())
+        else:
+            atomic_write_json(self.cache_file, self.cache, indent=4)
+
+    def snapshot_records(self):
+        """Return a copy of every record for a journal compaction or a full save, including the unloaded days."""
+        with self.lock:
+            return [dict(record) for record in self.cache.get('data', [])] + self.unloaded_records()
+
+    def persist(self, records, deleted_ids=()):
+        """Write changed and removed records: upserted into the store, appended to the journal, or a full save."""
+        if self.store is not None:
+            self.store.add_to_cache(records)
+            if deleted_ids:
+                self.store.delete(deleted_ids)
+            return
+        if self.journal is None:
+            self.save_cache()
+            return
+        self.journal.append(records)
+        if deleted_ids:
+            self.journal.append_delete(deleted_ids)
+        self.journal.maybe_compact(self.snapshot_records)
+
+    @staticmethod
+    def record_day(record, parsed_days=None):
+        """Return the record's date as a proleptic ordinal day number."""
+        if parsed_days is None:
+            return datetime.strptime(record['date'], '%d/%m/%Y').toordinal()
+        # Many records share a date, so each distinct string is parsed only once
+        day = parsed_days.get(record['date'])
+        if day is None:
+            day = parsed_days[record['date']] = datetime.strptime(record['date'], '%d/%m/%Y').toordinal()
+        return day
+
+    def build_index(self):
+        """Build the date-sorted index over the cached records."""
+        records = self.cache.get("data", [])
+        self.records_by_id = {record['id']: record for record in records}
+        self.record_bytes = None
+        parsed_days = {}
+        pairs = sorted(((self.record_day(record, parsed_days), i) for i, record in enumerate(records)))
+        # Ordinal days in a compact array, with the matching records kept in parallel
+        self.day_index = array('l', (day for day, _ in pairs))
+        self.sorted_records = [records[i] for _, i in pairs]
 
     def get_cached_data(self, start_date, end_date):
         """Retrieve cached data within the specified date range."""
-        cached_data = []
-        for record in self.cache.get("data", []):
-            record_date = datetime.strptime(record['date'], '%d/%m/%Y')
-            if start_date <= record_date <= end_date:
-                cached_data.append(record)
-        return cached_data
+        with self.lock:
+            # Records are dated at midnight, so a start with a time of day excludes its own date
+            first_day = start_date.toordinal()
+            if start_date.time() != time.min:
+                first_day += 1
+            last_day = end_date.toordinal()
+            lo = bisect_left(self.day_index, first_day)
+            hi = bisect_right(self.day_index, last_day)
+            records = self.sorted_records[lo:hi]
+            unloaded = self.unloaded_records(first_day, last_day)
+            if unloaded:
+                self.stats['unloaded_lookups'] += 1
+                parsed_days = {}
+                records = sorted(unloaded + records, key=lambda record: self.record_day(record, parsed_days))
+            # The archive only holds days older than the hot tier's oldest day
+            if self.archive is None or (self.day_index and first_day >= self.day_index[0]):
+                self.stats['hot_lookups'] += 1
+                return records
+            self.stats['archive_lookups'] += 1
+            hot_ids = {record['id'] for record in records}
+            cold = [record for record in self.archive.get(first_day, last_day) if record['id'] not in hot_ids]
+            if not cold:
+                return records
+            parsed_days = {}
+            return sorted(cold + records, key=lambda record: self.record_day(record, parsed_days))
+
+    def get_cached_table(self, start_date, end_date):
+        """Retrieve cached data within the specified date range as an EventTable."""
+        with self.lock:
+            return EventTable.from_records(self.get_cached_data(start_date, end_date))
 
     def add_to_cache(self, new_data):
-        """Add new data to the cache, avoiding duplicates."""
-        existing_ids = {record['id'] for record in self.cache.get("data", [])}
-        self.cache.setdefault("data", [])
-        for record in new_data:
-            if record['id'] not in existing_ids:
-                self.cache['data'].append(record)
-        self.save_cache()
+        """Add new data (records or an EventTable) to the cache, updating records whose values changed."""
+        if isinstance(new_data, EventTable):
+            new_data = new_data.to_records()
+        with self.lock:
+            self.cache.setdefault("data", [])
+            added = []
+            changed = []
+            rebuild = False
+            for record in new_data:
+                existing = self.records_by_id.get(record['id'])
+                if existing is None:
+                    self.records_by_id[record['id']] = record
+                    self.cache['data'].append(record)
+                    added.append(record)
+                elif existing != record:
+                    # Update in place so the date index keeps pointing at the same dict
+                    rebuild = rebuild or existing['date'] != record['date']
+                    existing.clear()
+                    existing.update(record)
+                    changed.append(existing)
+
+            if not added and not changed:
+                return
+
+            # Insert small batches in place; re-sort when a batch is large relative to the index
+            if rebuild or len(added) > len(self.day_index) // 8:
+                self.build_index()
+            else:
+                for record in added:
+                    day = self.record_day(record)
+                    pos = bisect_right(self.day_index, day)
+                    self.day_index.insert(pos, day)
+                    self.sorted_records.insert(pos, record)
+            evicted = self.enforce_retention()
+            merged = added + changed
+            if evicted:
+                # A merged record can land in a day that was just moved out of the hot tier
+                merged = [record for record in merged if record['id'] in self.records_by_id]
+            self.persist(merged, evicted)
+            for listener in self.listeners:
+                listener(merged)
+            if evicted:
+                for listener in self.eviction_listeners:
+                    listener(evicted)
+
+    def add_listener(self, callback):
+        """Call callback with the list of added and changed records after every add_to_cache."""
+        self.listeners.append(callback)
+
+    def add_eviction_listener(self, callback):
+        """Call callback with the ids of the records retention evicted or archived during an add_to_cache."""
+        self.eviction_listeners.append(callback)
+
+    def average_record_bytes(self, sample_size=64):
+        """Estimate the serialized size of a record from an evenly spaced sample.
+
+        The sample is taken once per index build, not on every merge.
+        """
+        if self.record_bytes is None:
+            records = self.sorted_records
+            if not records:
+                return 0
+            step = max(1, len(records) // sample_size)
+            sample = records[::step]
+            self.record_bytes = sum(len(json.dumps(record)) for record in sample) / len(sample)
+        return self.record_bytes
+
+    def enforce_retention(self, today=None):
+        """Move the oldest days out of the hot tier until the retention policy holds.
+
+        Finalized records go to the cold archive; records still waiting for an
+        actual are dropped. Returns the ids removed from the hot tier.
+        """
+        with self.lock:
+            policy = self.retention
+            if policy is None or not self.day_index:
+                return []
+            total = len(self.day_index)
+            count = 0
+            if policy.max_age_days is not None:
+                cutoff = (today or datetime.now()).toordinal() - policy.max_age_days
+                count = bisect_left(self.day_index, cutoff)
+            keep = total
+            if policy.max_records is not None:
+                keep = min(keep, policy.max_records)
+            if policy.max_bytes is not None:
+                keep = min(keep, int(policy.max_bytes // max(1, self.average_record_bytes())))
+            count = max(count, total - keep)
+            if count == 0:
+                return []
+            # Whole days only, so a day is never split between the two tiers
+            count = bisect_right(self.day_index, self.day_index[count - 1])
+
+            moved = self.sorted_records[:count]
+            if self.archive is not None:
+                archived = [(record, day) for record, day in zip(moved, self.day_index[:count])
+                            if not is_pending(record)]
+                self.archive.add([record for record, _ in archived], [day for _, day in archived])
+                self.stats['archived'] += len(archived)
+            self.stats['evictions'] += len(moved)
+
+            self.sorted_records = self.sorted_records[count:]
+            self.day_index = self.day_index[count:]
+            evicted = [record['id'] for record in moved]
+            for record_id in evicted:
+                del self.records_by_id[record_id]
+            self.forget_unloaded(evicted)
+            self.cache['data'] = list(self.sorted_records)
+            return evicted
+
+    def cache_stats(self):
+        """Return lookup and eviction counters along with the size of each tier."""
+        hot_records = len(self.sorted_records)
+        return dict(
+            self.stats,
+            hot_records=hot_records,
+            hot_bytes=int(hot_records * self.average_record_bytes()),
+            archive_bytes=self.archive.size_bytes() if self.archive is not None else 0,
+        )
 
     def clear_cache(self):
         """Clear the cache data."""
-        self.cache = {"data": []}
-        self.save_cache()
+        with self.lock:
+            self.cache = {"data": []}
+            self.build_index()
+            self.forget_unloaded(None)
+        if self.store is not None:
+            self.store.clear_cache()
+        elif self.journal is not None:
+            self.journal.append_clear()
+        else:
+            self.save_cache()
+
+    def close(self):
+        """Flush the journal to disk and close the store or the mapped snapshot."""
+        if self.journal is not None:
+            self.journal.close()
+        if self.store is not None:
+            self.store.close()
+        with self.lock:
+            self.close_snapshot()
+
+
+def benchmark(num_events=100000, num_queries=200):
+    """Compare the linear strptime scan with the bisect index on synthetic events."""
+    import random
+    import timeit
+    from datetime import timedelta
+
+    base = datetime(2020, 1, 1)
+    records = [
+        {"id": str(i), "date": (base + timedelta(days=random.randrange(1500))).strftime('%d/%m/%Y')}
+        for i in range(num_events)
+    ]
+    handler = CacheHandler(cache_file=None)
+    handler.cache = {"data": records}
+    build_time = timeit.timeit(handler.build_index, number=1)
+
+    ranges = []
+    for _ in range(num_queries):
+        start = base + timedelta(days=random.randrange(1490), hours=12)
+        ranges.append((start, start + timedelta(days=8)))
+
+    def linear_scan(start_date, end_date):
+        return [r for r in records if start_date <= datetime.strptime(r['date'], '%d/%m/%Y') <= end_date]
+
+    linear = timeit.timeit(lambda: [linear_scan(s, e) for s, e in ranges[:5]], number=1) / 5
+    indexed = timeit.timeit(lambda: [handler.get_cached_data(s, e) for s, e in ranges], number=1) / num_queries
+    for start, end in ranges[:5]:
+        expected = sorted(r['id'] for r in linear_scan(start, end))
+        assert expected == sorted(r['id'] for r in handler.get_cached_data(start, end))
+
+    print(f"{num_events} events, index build: {build_time * 1000:.1f} ms")
+    print(f"Linear scan per query: {linear * 1000:.2f} ms")
+    print(f"Indexed lookup per query: {indexed * 1000:.4f} ms ({linear / indexed:.0f}x faster)")
+
 
 # Example usage
 if __name__ == "__main__":
+    import sys
+
+    if "--benchmark" in sys.argv:
+        benchmark()
+        sys.exit()
+
     # Create a CacheHandler instance
     cache_handler = CacheHandler()
 
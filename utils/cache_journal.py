@@ -0,0 +1,252 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+
+def fsync_directory(path):
+    """Make a rename or removal inside path's directory durable (a no-op where directories can't be opened)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return  # Windows
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path, data, indent=None):
+    """Write JSON to a temporary file, fsync it, then rename it over path."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(path)
+    return os.path.getsize(path)
+
+
+def write_json_records(path, records):
+    """Write records as a cache.json snapshot; return its size."""
+    return atomic_write_json(path, {"data": records})
+
+
+class CacheJournal:
+    """Append-only JSON-lines journal next to a JSON snapshot.
+
+    Every change is appended as one line and flushed to the OS immediately, so a
+    crashed process loses nothing; fsync is batched by count and time to bound
+    what a power loss can take. Once the journal grows past compact_bytes, the
+    snapshot is rewritten in the background and the journal starts over. An
+    open journal is closed (and synced) at interpreter exit if close() was not
+    called. write(path, records) writes the snapshot file; it defaults to JSON.
+    """
+    def __init__(self, snapshot_file, sync_every=64, sync_interval=1.0, compact_bytes=4 * 1024 * 1024,
+                 write=write_json_records):
+        self.snapshot_file = snapshot_file
+        self.write = write
+        self.journal_file = f"{snapshot_file}.journal"
+        self.rotated_file = f"{snapshot_file}.journal.old"  # Journal being folded into the snapshot
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_bytes = compact_bytes
+        self.lock = threading.Lock()
+        self.handle = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.compaction_thread = None
+        self.bytes_written = 0  # Everything written to disk, for write-amplification stats
+
+    def replay(self, records, on_delete=None):
+        """Apply the rotated and current journals to a list of snapshot records in place.
+
+        on_delete, if given, is called with the ids of each delete entry and with
+        None for a clear, for callers that keep records outside the list.
+        """
+        by_id = {record['id']: i for i, record in enumerate(records)}
+        for path in (self.rotated_file, self.journal_file):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn line from a crash mid-append; rotate() keeps whatever followed it intact
+                        continue
+                    if entry['op'] == 'clear':
+                        records.clear()
+                        by_id.clear()
+                        if on_delete is not None:
+                            on_delete(None)
+                    elif entry['op'] == 'delete':
+                        removed = set(entry['ids'])
+                        if on_delete is not None:
+                            on_delete(removed)
+                        records[:] = [record for record in records if record['id'] not in removed]
+                        by_id = {record['id']: i for i, record in enumerate(records)}
+                    elif entry['op'] == 'upsert':
+                        record = entry['record']
+                        if record['id'] in by_id:
+                            records[by_id[record['id']]] = record
+                        else:
+                            by_id[record['id']] = len(records)
+                            records.append(record)
+        return records
+
+    def open(self):
+        if self.handle is None:
+            self.handle = open(self.journal_file, 'a')
+            atexit.register(self.close)
+
+    def append(self, records):
+        """Append upserts for the given records to the journal."""
+        self.write_lines(json.dumps({'op': 'upsert', 'record': record}) for record in records)
+
+    def append_delete(self, ids):
+        """Append the removal of the given record ids."""
+        self.write_lines([json.dumps({'op': 'delete', 'ids': list(ids)})])
+
+    def append_clear(self):
+        self.write_lines([json.dumps({'op': 'clear'})])
+
+    def write_lines(self, lines):
+        with self.lock:
+            self.open()
+            text = ''.join(f"{line}\n" for line in lines)
+            if not text:
+                return
+            self.handle.write(text)
+            self.handle.flush()
+            self.bytes_written += len(text)
+            self.unsynced += text.count('\n')
+            if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+                self.sync_locked()
+
+    def sync_locked(self):
+        if self.handle is not None and self.unsynced:
+            os.fsync(self.handle.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def sync(self):
+        """Force pending journal lines to disk."""
+        with self.lock:
+            self.sync_locked()
+
+    def journal_size(self):
+        with self.lock:
+            return self.handle.tell() if self.handle is not None else 0
+
+    def maybe_compact(self, get_records, force=False):
+        """Start a background compaction if the journal is large enough, or always with force=True.
+
+        get_records() must return a consistent copy of all records; it is called
+        on the caller's thread, and the snapshot is written on a worker thread.
+        """
+        if not force and self.journal_size() < self.compact_bytes:
+            return False
+        if self.compaction_thread is not None and self.compaction_thread.is_alive():
+            return False
+        records = self.rotate(get_records)
+        self.compaction_thread = threading.Thread(target=self.write_snapshot, args=(records,), daemon=True)
+        self.compaction_thread.start()
+        return True
+
+    def compact(self, get_records):
+        """Fold the journal into the snapshot synchronously."""
+        if self.compaction_thread is not None:
+            self.compaction_thread.join()
+        self.write_snapshot(self.rotate(get_records))
+
+    def rotate(self, get_records):
+        """Move the current journal aside so new appends go to a fresh one."""
+        with self.lock:
+            self.sync_locked()
+            if self.handle is not None:
+                self.handle.close()
+                self.handle = None
+            if os.path.exists(self.journal_file):
+                if os.path.exists(self.rotated_file):
+                    # An earlier compaction did not finish; keep its entries ahead of the new ones
+                    with open(self.journal_file, 'rb') as src, open(self.rotated_file, 'r+b') as dst:
+                        if dst.seek(0, os.SEEK_END):
+                            dst.seek(-1, os.SEEK_END)
+                            if dst.read(1) != b'\n':
+                                dst.write(b'\n')  # End a torn line so the next entry starts on its own
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.journal_file)
+                else:
+                    os.replace(self.journal_file, self.rotated_file)
+                fsync_directory(self.journal_file)
+            # Taken under the lock so it contains exactly what the rotated journal covered
+            return get_records()
+
+    def write_snapshot(self, records):
+        size = self.write(self.snapshot_file, records)
+        with self.lock:
+            self.bytes_written += size
+        # The snapshot now includes the rotated journal
+        if os.path.exists(self.rotated_file):
+            os.remove(self.rotated_file)
+            fsync_directory(self.rotated_file)
+
+    def close(self):
+        """Wait for a running compaction, then sync and close the journal."""
+        if self.compaction_thread is not None:
+            self.compaction_thread.join()
+        with self.lock:
+            self.sync_locked()
+            if self.handle is not None:
+                self.handle.close()
+                self.handle = None
+                atexit.unregister(self.close)
+
+
+def benchmark(num_events=20000, refreshes=50, batch=5):
+    """Compare bytes written by full rewrites and by the journal."""
+    import random
+    import tempfile
+    import timeit
+    from datetime import date, timedelta
+    from utils.cache_handler import CacheHandler
+
+    base = date(2024, 1, 1)
+    records = [
+        {"id": str(i), "date": (base + timedelta(days=i % 365)).strftime('%d/%m/%Y'), "time": "14:30",
+         "zone": "united states", "currency": "USD", "importance": "high", "event": f"Event {i}",
+         "actual": None, "forecast": "0.2%", "previous": "0.1%"}
+        for i in range(num_events)
+    ]
+    updates = []
+    for n in range(refreshes):
+        picked = random.sample(records, batch)
+        updates.append([dict(record, actual=f"{n % 10}.{n % 7}%") for record in picked])
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for journaled in (False, True):
+            path = os.path.join(directory, f"cache_{journaled}.json")
+            atomic_write_json(path, {"data": records})
+            handler = CacheHandler(path, journaled=journaled)
+            seconds = timeit.timeit(lambda: [handler.add_to_cache(batch) for batch in updates], number=1)
+            handler.close()
+            # Without a journal every refresh rewrites the whole file
+            written = handler.journal.bytes_written if journaled else refreshes * os.path.getsize(path)
+            results[journaled] = (written, seconds)
+
+        rewrite_bytes, rewrite_seconds = results[False]
+        journal_bytes, journal_seconds = results[True]
+        print(f"{refreshes} refreshes of {batch} events on a {num_events}-event cache:")
+        print(f"  Full rewrite: {rewrite_bytes / 1e6:.1f} MB written, {rewrite_seconds * 1000:.0f} ms")
+        print(f"  Journal:      {journal_bytes / 1e6:.3f} MB written, {journal_seconds * 1000:.0f} ms "
+              f"({rewrite_bytes / journal_bytes:.0f}x less)")
+
+
+if __name__ == "__main__":
+    benchmark()
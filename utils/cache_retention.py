@@ -0,0 +1,203 @@
+import configparser
+import gzip
+import json
+import os
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
+SIZE_UNITS = {'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3}
+
+
+def is_pending(record):
+    """Return True if a cached event is still waiting for its actual value.
+
+    Events without a previous value (speeches, auctions, holidays) never get an
+    actual either, so they do not keep their day stale.
+    """
+    return not record.get('actual') and record.get('previous') is not None
+
+
+def parse_size(text):
+    """Parse a byte count such as "65536", "512KB" or "64MB"; empty means no bound."""
+    text = text.strip().lower()
+    if not text:
+        return None
+    for suffix, factor in SIZE_UNITS.items():
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+class RetentionPolicy:
+    """Bounds on the hot cache tier; a bound of None is not enforced.
+
+    Records older than max_age_days are moved out of the hot tier, then the
+    oldest days are moved out until it is within max_records and max_bytes.
+    With archive enabled, finalized records go to the cold archive instead of
+    being dropped; records still waiting for an actual are always dropped, since
+    they will be fetched again anyway.
+    """
+    def __init__(self, max_age_days=None, max_records=None, max_bytes=None, archive=True):
+        self.max_age_days = max_age_days
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.archive = archive
+
+    @classmethod
+    def from_config(cls, path=DEFAULT_CONFIG, section='cache'):
+        """Read the policy from the [cache] section of config.ini; missing options are unbounded."""
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        if not parser.has_section(section):
+            return cls()
+        options = parser[section]
+
+        def bound(key):
+            value = options.get(key, '').strip()
+            return int(value) if value else None
+
+        return cls(
+            max_age_days=bound('max_age_days'),
+            max_records=bound('max_records'),
+            max_bytes=parse_size(options.get('max_bytes', '')),
+            archive=options.getboolean('archive', fallback=True),
+        )
+
+
+class ColdArchive:
+    """Append-only store for finalized past events, partitioned by month.
+
+    Each month is a gzip file of JSON lines; every write appends a new gzip
+    member, so archiving never rewrites existing data. Later lines for the same
+    id win. Only the most recently used months are kept in memory.
+    """
+    def __init__(self, directory, max_loaded_months=3):
+        self.directory = directory
+        self.max_loaded_months = max_loaded_months
+        self.loaded = OrderedDict()  # Month -> (sorted ordinal days, records), least recently used first
+
+    @staticmethod
+    def month_key(day):
+        moment = date.fromordinal(day)
+        return f"{moment.year:04d}-{moment.month:02d}"
+
+    def month_path(self, month):
+        return os.path.join(self.directory, f"{month}.jsonl.gz")
+
+    def add(self, records, days):
+        """Append records (with their ordinal days) to their month files; return bytes written."""
+        by_month = {}
+        for record, day in zip(records, days):
+            by_month.setdefault(self.month_key(day), []).append(record)
+        if not by_month:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        written = 0
+        for month, batch in by_month.items():
+            path = self.month_path(month)
+            before = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                    f.write(''.join(f"{json.dumps(record)}\n" for record in batch).encode())
+                raw.flush()
+                os.fsync(raw.fileno())
+            written += os.path.getsize(path) - before
+            # Re-read on next use so the month's day index stays sorted
+            self.loaded.pop(month, None)
+        return written
+
+    def load_month(self, month):
+        """Return (sorted ordinal days, records) for a month, reading its file on first use."""
+        if month in self.loaded:
+            self.loaded.move_to_end(month)
+            return self.loaded[month]
+        records = {}
+        path = self.month_path(month)
+        if os.path.exists(path):
+            try:
+                with gzip.open(path, 'rt') as f:
+                    for line in f:
+                        record = json.loads(line)
+                        records[record['id']] = record
+            except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+                # A member cut short by a crash; the complete members before it are kept
+                pass
+        pairs = sorted(((datetime.strptime(record['date'], '%d/%m/%Y').toordinal(), record)
+                        for record in records.values()), key=lambda pair: pair[0])
+        self.loaded[month] = ([day for day, _ in pairs], [record for _, record in pairs])
+        while len(self.loaded) > self.max_loaded_months:
+            self.loaded.popitem(last=False)
+        return self.loaded[month]
+
+    def get(self, first_day, last_day):
+        """Return archived records dated first_day..last_day (ordinal days), sorted by day."""
+        if first_day > last_day or not os.path.isdir(self.directory):
+            return []
+        months = []
+        moment = date.fromordinal(first_day).replace(day=1)
+        last = date.fromordinal(last_day)
+        while moment <= last:
+            months.append(f"{moment.year:04d}-{moment.month:02d}")
+            moment = date(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+        found = []
+        for month in months:
+            if not os.path.exists(self.month_path(month)):
+                continue
+            days, records = self.load_month(month)
+            found.extend(records[bisect_left(days, first_day):bisect_right(days, last_day)])
+        return found
+
+    def size_bytes(self):
+        """Return the archive's total size on disk."""
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory))
+
+
+def benchmark(num_events=150000, days=1100):
+    """Apply a policy to a long-running cache and compare hot and cold lookups."""
+    import tempfile
+    import timeit
+    from datetime import timedelta
+    from utils.cache_handler import CacheHandler
+    from utils.cache_journal import atomic_write_json
+
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    first = today - timedelta(days=days - 8)
+    records = [
+        {"id": str(i), "date": (first + timedelta(days=i * days // num_events)).strftime('%d/%m/%Y'),
+         "time": "14:30", "zone": "united states", "currency": "USD", "importance": "high",
+         "event": f"Event {i}", "actual": "0.3%", "forecast": "0.2%", "previous": "0.1%"}
+        for i in range(num_events)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.json")
+        atomic_write_json(path, {"data": records})
+        unbounded = CacheHandler(path)
+        window = (today - timedelta(days=1), today + timedelta(days=7))
+        before = timeit.timeit(lambda: unbounded.get_cached_data(*window), number=1000)
+
+        policy = RetentionPolicy(max_age_days=90, max_records=50000, max_bytes=64 * 1024 ** 2)
+        start = datetime.now()
+        bounded = CacheHandler(path, journaled=True, retention=policy)
+        load_seconds = (datetime.now() - start).total_seconds()
+        hot = timeit.timeit(lambda: bounded.get_cached_data(*window), number=1000)
+        cold_window = (today - timedelta(days=400), today - timedelta(days=393))
+        cold_first = timeit.timeit(lambda: bounded.get_cached_data(*cold_window), number=1)
+        cold_warm = timeit.timeit(lambda: bounded.get_cached_data(*cold_window), number=100) / 100
+        assert len(bounded.get_cached_data(*cold_window)) == len(unbounded.get_cached_data(*cold_window))
+        assert len(bounded.get_cached_data(*window)) == len(unbounded.get_cached_data(*window))
+        bounded.close()
+
+        print(f"{num_events} events over {days} days, policy: 90 days / 50000 records / 64 MB")
+        print(f"  First load with eviction: {load_seconds * 1000:.0f} ms")
+        print(f"  Hot window lookup: {before / 1000 * 1e6:.1f} us unbounded, {hot / 1000 * 1e6:.1f} us bounded")
+        print(f"  Cold week lookup: {cold_first * 1000:.1f} ms first, {cold_warm * 1000:.2f} ms once loaded")
+        print(f"  Stats: {bounded.cache_stats()}")
+
+
+if __name__ == "__main__":
+    benchmark()
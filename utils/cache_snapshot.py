@@ -0,0 +1,312 @@
+"""Binary snapshot format for the event cache, loaded with numpy.memmap.
+
+    python -m utils.cache_snapshot convert cache.json cache.snap
+    python -m utils.cache_snapshot export cache.snap cache.json
+    python -m utils.cache_snapshot benchmark
+
+Layout (all integers little-endian):
+
+    magic "BBSNAP\\r\\n" | uint16 version | uint16 flags | uint32 header length
+    JSON header: row count, day range and {section: [offset, bytes, dtype]}
+    sections, each starting on a 64-byte boundary
+
+Rows are sorted by day. Fixed-width columns hold the ordinal day (int64),
+importance (uint8), one int32 code per text field and the parsed
+actual/forecast/previous numbers (float64). Text fields reference a string
+table of their distinct values; ids, which are unique, are one string table
+with an offset per row. Opening a snapshot maps the file without reading
+it, and a date range query binary-searches the day column and copies only
+the rows in range, so only their pages are read from disk.
+"""
+import configparser
+import json
+import os
+import struct
+import sys
+from datetime import date
+
+import numpy as np
+from utils.cache_journal import fsync_directory
+from utils.event_table import CATEGORICAL_FIELDS, VALUE_FIELDS, EventTable, pack_strings, unpack_strings
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
+MAGIC = b'BBSNAP\r\n'  # The CR/LF pair detects files mangled by text-mode transfers
+VERSION = 1
+PREFIX = struct.Struct('<8sHHI')
+ALIGNMENT = 64
+
+
+def snapshot_enabled(path=DEFAULT_CONFIG, section='cache'):
+    """Return True if config.ini stores the cache as a binary snapshot ([cache] format = snapshot)."""
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    return parser.get(section, 'format', fallback='json').strip().lower() == 'snapshot'
+
+
+def snapshot_sections(table):
+    """Return the (name, array) sections that store a day-sorted EventTable."""
+    ids = table.ids.tolist()
+    for value in ids:
+        if not isinstance(value, str):
+            # Stored as text, an int id would come back as a different key than the one in the cache
+            raise TypeError(f"Snapshot ids must be strings, got {type(value).__name__} {value!r}")
+    id_block = pack_strings(ids)
+    # Offset of each id in the block; ids are separated by one byte
+    lengths = np.fromiter((len(value.encode('utf-8')) + 1 for value in ids), dtype=np.int64, count=len(ids))
+    id_offsets = np.concatenate(([0], np.cumsum(lengths)))
+    sections = [
+        ('days', table.days.astype('<i8')),
+        ('importance', table.importance.astype('u1')),
+        ('id.offsets', id_offsets.astype('<i8')),
+        ('id.strings', np.frombuffer(id_block, dtype='u1')),
+    ]
+    for field in CATEGORICAL_FIELDS:
+        sections.append((f"{field}.codes", table.codes[field].astype('<i4')))
+        sections.append((f"{field}.strings", np.frombuffer(pack_strings(table.categories[field]), dtype='u1')))
+    for field in VALUE_FIELDS:
+        sections.append((f"{field}.values", table.values[field].astype('<f8')))
+    return sections
+
+
+def write_snapshot(path, records):
+    """Write records as a snapshot: to a temporary file, fsynced, then renamed over path.
+
+    Only the calendar fields of EventTable are stored; ids must be strings
+    (TypeError otherwise). Returns the size of the file.
+    """
+    tmp_path = stage_snapshot(path, records)
+    os.replace(tmp_path, path)
+    fsync_directory(path)
+    return os.path.getsize(path)
+
+
+def stage_snapshot(path, records):
+    """Write records as a snapshot to a temporary file beside path, fsynced, and return its path."""
+    table = EventTable.from_records(records)
+    table = table.take(np.argsort(table.days, kind='stable'))  # Same-day rows keep their order
+    sections = snapshot_sections(table)
+    counts = {field: len(table.categories[field]) for field in CATEGORICAL_FIELDS}
+
+    # Section offsets depend on the header length, which depends on the offsets; two passes settle it
+    header_size = 0
+    for _ in range(2):
+        offset = -(-(PREFIX.size + header_size) // ALIGNMENT) * ALIGNMENT
+        layout = {}
+        for name, array in sections:
+            layout[name] = [offset, array.nbytes, array.dtype.str]
+            offset = -(-(offset + array.nbytes) // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({
+            'rows': len(table),
+            'days': [int(table.days[0]), int(table.days[-1])] if len(table) else None,
+            'string_counts': counts,
+            'sections': layout,
+        }).encode('utf-8')
+        header_size = len(header)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, 0, len(header)))
+        f.write(header)
+        for name, array in sections:
+            f.write(b'\0' * (layout[name][0] - f.tell()))
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+class SnapshotReader:
+    """Memory-mapped view of a snapshot file.
+
+    Columns are views into the mapping, so nothing is read until a query
+    touches it. String tables are decoded on first use and kept.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            prefix = f.read(PREFIX.size)
+            if len(prefix) < PREFIX.size:
+                raise ValueError(f"{path} is not a cache snapshot")
+            magic, version, _, header_length = PREFIX.unpack(prefix)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a cache snapshot")
+            if version != VERSION:
+                raise ValueError(f"{path} is snapshot version {version}; this build reads version {VERSION}")
+            self.header = json.loads(f.read(header_length))
+        self.rows = self.header['rows']
+        self.map = np.memmap(path, dtype='u1', mode='r')
+        self.categories = {}
+
+    def __len__(self):
+        return self.rows
+
+    def section(self, name):
+        offset, size, dtype = self.header['sections'][name]
+        return self.map[offset:offset + size].view(dtype)
+
+    def strings(self, field):
+        """Return the distinct values of a text field, decoded once."""
+        values = self.categories.get(field)
+        if values is None:
+            block = self.section(f"{field}.strings").tobytes()
+            values = self.categories[field] = unpack_strings(block, self.header['string_counts'][field])
+        return values
+
+    def bounds(self, first_day=None, last_day=None):
+        """Return the (lo, hi) rows dated between two ordinal days, inclusive."""
+        days = self.section('days')
+        lo = 0 if first_day is None else int(np.searchsorted(days, first_day, 'left'))
+        hi = self.rows if last_day is None else int(np.searchsorted(days, last_day, 'right'))
+        return lo, max(lo, hi)
+
+    def table(self, first_day=None, last_day=None):
+        """Return the rows dated between two ordinal days (default: all) as an EventTable."""
+        lo, hi = self.bounds(first_day, last_day)
+        offsets = self.section('id.offsets')
+        start, end = int(offsets[lo]), int(offsets[hi])
+        # The block for the range ends with a separator; leave it out so the split yields hi - lo ids
+        id_block = self.section('id.strings')[start:max(start, end - 1)].tobytes()
+        ids = np.array(unpack_strings(id_block, hi - lo), dtype=object)
+        codes = {field: np.array(self.section(f"{field}.codes")[lo:hi]) for field in CATEGORICAL_FIELDS}
+        categories = {field: self.strings(field) for field in CATEGORICAL_FIELDS}
+        values = {field: np.array(self.section(f"{field}.values")[lo:hi]) for field in VALUE_FIELDS}
+        missing = {field: np.isnan(values[field]) for field in VALUE_FIELDS}
+        return EventTable(ids, np.array(self.section('days')[lo:hi]), np.array(self.section('importance')[lo:hi]),
+                          codes, categories, values, missing)
+
+    def records(self, first_day=None, last_day=None):
+        """Return the rows dated between two ordinal days (default: all) as record dicts."""
+        return self.table(first_day, last_day).to_records()
+
+    def close(self):
+        # The mapping must be released before the file can be replaced on Windows
+        if self.map is not None:
+            self.map._mmap.close()
+            self.map = None
+
+
+def read_snapshot(path):
+    """Return every record in a snapshot file."""
+    reader = SnapshotReader(path)
+    try:
+        return reader.records()
+    finally:
+        reader.close()
+
+
+def convert(json_path, snapshot_path):
+    """Write a snapshot from a cache.json file (and its journal, if there is one); return the row count."""
+    from utils.cache_journal import CacheJournal
+    with open(json_path, 'r') as f:
+        records = json.load(f).get('data', [])
+    CacheJournal(json_path).replay(records)
+    write_snapshot(snapshot_path, records)
+    return len(records)
+
+
+def export(snapshot_path, json_path):
+    """Write a cache.json file from a snapshot; return the row count."""
+    from utils.cache_journal import atomic_write_json
+    records = read_snapshot(snapshot_path)
+    atomic_write_json(json_path, {"data": records}, indent=4)
+    return len(records)
+
+
+def drop_page_cache(path):
+    """Ask the OS to evict a file's pages so the next read comes from disk (POSIX only)."""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def benchmark(days=365, events_per_day=300):
+    """Compare cold and warm loads of a year of history from JSON and from a snapshot."""
+    import random
+    import tempfile
+    import time
+    from utils.cache_journal import atomic_write_json
+    from utils.value_parser import synthetic_calendar
+
+    records = synthetic_calendar(days=days, events_per_day=events_per_day)
+    currencies = ['USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'CHF', 'NZD']
+    for i, record in enumerate(records):
+        record['currency'] = currencies[i % len(currencies)]
+        record['importance'] = random.choice(['low', 'medium', 'high'])
+        record['id'] = str(400000 + i)
+    week_start = date(2024, 6, 3).toordinal()
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'cache.json')
+        snapshot_path = os.path.join(directory, 'cache.snap')
+        json_size = atomic_write_json(json_path, {"data": records}, indent=4)
+        snapshot_size = write_snapshot(snapshot_path, records)
+        print(f"{len(records)} events over {days} days: JSON {json_size / 1e6:.1f} MB, "
+              f"snapshot {snapshot_size / 1e6:.1f} MB")
+
+        def load_json():
+            with open(json_path, 'r') as f:
+                return json.load(f)['data']
+
+        def open_snapshot():
+            SnapshotReader(snapshot_path).close()
+
+        def query_week():
+            reader = SnapshotReader(snapshot_path)
+            table = reader.table(week_start, week_start + 6)
+            reader.close()
+            return table
+
+        def load_snapshot_records():
+            return read_snapshot(snapshot_path)
+
+        cases = [
+            ("JSON, json.load of everything", json_path, load_json),
+            ("Snapshot, open", snapshot_path, open_snapshot),
+            ("Snapshot, open + one week as EventTable", snapshot_path, query_week),
+            ("Snapshot, every record as dicts", snapshot_path, load_snapshot_records),
+        ]
+        cold_supported = drop_page_cache(json_path)
+        for name, path, load in cases:
+            timings = []
+            for cold in (True, False):
+                if cold:
+                    drop_page_cache(path)
+                started = time.perf_counter()
+                load()
+                timings.append(time.perf_counter() - started)
+            print(f"  {name:<42} cold {timings[0] * 1000:8.2f} ms, warm {timings[1] * 1000:8.2f} ms")
+        if not cold_supported:
+            print("  (no posix_fadvise here: cold timings include the OS page cache)")
+        print(f"One week is {len(query_week())} rows")
+
+        from utils.cache_handler import CacheHandler
+        timings = []
+        for options in ({'snapshot': False}, {'snapshot': True, 'hot_days': None}, {'snapshot': True}):
+            started = time.perf_counter()
+            CacheHandler(json_path, **options).close()
+            timings.append(time.perf_counter() - started)
+        print(f"CacheHandler start-up: JSON {timings[0] * 1000:.0f} ms, snapshot loading every record "
+              f"{timings[1] * 1000:.0f} ms, snapshot loading the last week {timings[2] * 1000:.1f} ms")
+
+
+def main(argv):
+    if len(argv) == 3 and argv[0] == 'convert':
+        print(f"Wrote {convert(argv[1], argv[2])} records to {argv[2]}")
+    elif len(argv) == 3 and argv[0] == 'export':
+        print(f"Wrote {export(argv[1], argv[2])} records to {argv[2]}")
+    elif argv in ([], ['benchmark']):
+        benchmark()
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,153 @@
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+import numpy as np
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def fetch_utc_offset(moment=None):
+    """Return the UTC offset in seconds that the calendar is fetched in: the local offset now.
+
+    The calendar is requested in one fixed "GMT +h:mm" offset for every day
+    (see api/investpy_wrapper.py local_time_zone), so release times convert
+    back with that same offset, also on days across a DST change from now.
+    Offsets are truncated to the half hour, like the GMT offsets investpy offers.
+    """
+    seconds = int((moment or datetime.now()).astimezone().utcoffset().total_seconds())
+    hours, rest = divmod(abs(seconds), 3600)
+    rounded = hours * 3600 + (1800 if rest >= 1800 else 0)
+    return rounded if seconds >= 0 else -rounded
+
+
+@lru_cache(maxsize=4096)
+def utc_offset(zone, day):
+    """Return the UTC offset in seconds of an IANA timezone on an ordinal day.
+
+    Results are cached per (zone, day), so each date is converted once.
+    """
+    from zoneinfo import ZoneInfo
+    # Noon avoids the ambiguous hour around DST switches
+    moment = datetime.fromordinal(day).replace(hour=12)
+    return moment.replace(tzinfo=ZoneInfo(zone)).utcoffset().total_seconds()
+
+
+def time_seconds(text):
+    """Return seconds after midnight for an "HH:MM" string, or NaN (e.g. "All Day")."""
+    try:
+        hours, minutes = text.split(':')
+        return int(hours) * 3600 + int(minutes) * 60
+    except (AttributeError, ValueError):
+        return np.nan
+
+
+def release_time(record, offset=None):
+    """Return the event's release as a local datetime, or None for all-day events.
+
+    The record's date and time are in the UTC offset the calendar was fetched
+    in (fetch_utc_offset() unless given), and the result is the local wall-clock
+    time of that moment, which differs from it across a DST change.
+    """
+    try:
+        released = datetime.strptime(f"{record['date']} {record['time']}", '%d/%m/%Y %H:%M')
+    except (TypeError, ValueError):
+        return None
+    if offset is None:
+        offset = fetch_utc_offset()
+    released = (released - timedelta(seconds=offset)).replace(tzinfo=timezone.utc)
+    return released.astimezone().replace(tzinfo=None)
+
+
+def format_countdown(seconds):
+    """Format seconds until a release for the countdown column."""
+    if seconds is None or np.isnan(seconds):
+        return ''
+    if seconds <= 0:
+        return 'Released'
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d {hours:02d}h"
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    return f"{minutes}m {seconds:02d}s"
+
+
+class CountdownEngine:
+    """Keeps every event's release as a UTC epoch, sorted for fast lookups.
+
+    Conversion happens once when events are ingested; per tick, "next N events"
+    is a binary search and a row's countdown is a dictionary lookup.
+    """
+    def __init__(self, zone=None):
+        self.zone = zone  # IANA timezone the source reports times in (None = the fetch offset)
+        self.epoch_by_id = {}
+        self.sorted_epochs = np.empty(0, dtype=np.float64)
+        self.sorted_ids = np.empty(0, dtype=object)
+
+    def ingest_table(self, table):
+        """Convert an EventTable's date/time columns to UTC epochs and index them.
+
+        The table replaces what was ingested before, so the index covers the
+        window being displayed rather than every event seen since start-up.
+        """
+        if not len(table):
+            self.epoch_by_id = {}
+            self.rebuild_index()
+            return
+        seconds_by_code = np.append([time_seconds(text) for text in table.categories['time']], np.nan)
+        if self.zone is None:
+            offsets = float(fetch_utc_offset())
+        else:
+            unique_days, day_codes = np.unique(table.days, return_inverse=True)
+            offsets = np.array([utc_offset(self.zone, int(day)) for day in unique_days], dtype=np.float64)[day_codes]
+        epochs = (table.days - EPOCH_ORDINAL) * 86400 + seconds_by_code[table.codes['time']] - offsets
+        self.epoch_by_id = dict(zip(table.ids, epochs))
+        self.rebuild_index()
+
+    def rebuild_index(self):
+        """Rebuild the sorted epoch index, leaving out all-day events."""
+        ids = np.array(list(self.epoch_by_id.keys()), dtype=object)
+        epochs = np.array(list(self.epoch_by_id.values()), dtype=np.float64)
+        timed = ~np.isnan(epochs)
+        order = np.argsort(epochs[timed], kind='stable')
+        self.sorted_epochs = epochs[timed][order]
+        self.sorted_ids = ids[timed][order]
+
+    def next_events(self, now, count=5):
+        """Return [(event id, seconds until release)] for the next count events after now."""
+        start = np.searchsorted(self.sorted_epochs, now, side='right')
+        return [(event_id, epoch - now) for event_id, epoch in
+                zip(self.sorted_ids[start:start + count], self.sorted_epochs[start:start + count])]
+
+    def seconds_until(self, event_id, now):
+        """Return seconds until an event's release (negative once released), or None."""
+        epoch = self.epoch_by_id.get(event_id)
+        if epoch is None or np.isnan(epoch):
+            return None
+        return epoch - now
+
+    def countdown_text(self, event_id, now):
+        return format_countdown(self.seconds_until(event_id, now))
+
+
+# Example usage
+if __name__ == "__main__":
+    import json
+    import os
+    import timeit
+    from utils.event_table import EventTable
+
+    with open(os.path.join(os.path.dirname(__file__), 'cache.json'), 'r') as f:
+        table = EventTable.from_records(json.load(f)["data"])
+
+    engine = CountdownEngine()
+    print(f"Ingest {len(table)} events: {timeit.timeit(lambda: engine.ingest_table(table), number=1) * 1000:.1f} ms")
+    now = engine.sorted_epochs[len(engine.sorted_epochs) // 2]
+    for event_id, seconds in engine.next_events(now, 3):
+        print(f"  {event_id}: {format_countdown(seconds)}")
+    visible = list(table.ids[:30])
+    per_tick = timeit.timeit(lambda: [engine.countdown_text(event_id, now) for event_id in visible], number=1000)
+    print(f"Countdowns for 30 visible rows: {per_tick:.3f} ms per tick")
@@ -0,0 +1,185 @@
+import re
+from bisect import bisect_left
+
+import numpy as np
+from utils.event_table import IMPORTANCE_CODES, IMPORTANCE_LABELS
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens."""
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+
+def postings(codes, size):
+    """Return, for each code 0..size-1, the ascending row indexes holding it (code -1 is skipped)."""
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(size + 1))
+    return [order[bounds[code]:bounds[code + 1]] for code in range(size)]
+
+
+class EventIndex:
+    """Inverted indexes over an EventTable for interactive filtering.
+
+    Currency, zone and importance map each value to the rows holding it, and a
+    token index maps every word of the event names to the names containing it.
+    Each condition of a query becomes a row bitmap and the bitmaps are
+    intersected. Query words match as prefixes, and while the user types, a
+    query that only extends the previous text narrows the previous matches
+    instead of starting over.
+    """
+    def __init__(self, table):
+        self.table = table
+        self.postings = {field: postings(table.codes[field], len(table.categories[field]))
+                         for field in ('currency', 'zone', 'event')}
+        self.code_of = {field: {value: code for code, value in enumerate(table.categories[field])}
+                        for field in ('currency', 'zone')}
+        self.importance_postings = postings(table.importance.astype(np.int32), len(IMPORTANCE_LABELS))
+
+        # Token -> event name codes, with the tokens sorted for prefix lookups
+        self.event_tokens = [set(tokenize(name)) for name in table.categories['event']]
+        self.token_codes = {}
+        for code, words in enumerate(self.event_tokens):
+            for word in words:
+                self.token_codes.setdefault(word, []).append(code)
+        self.sorted_tokens = sorted(self.token_codes)
+        self.last = None  # (text, filters, matching event codes, rows) of the previous query
+
+    def __len__(self):
+        return len(self.table)
+
+    def bitmap(self, row_lists):
+        """Return a boolean row bitmap with the rows of every given posting list set."""
+        bitmap = np.zeros(len(self), dtype=bool)
+        for rows in row_lists:
+            bitmap[rows] = True
+        return bitmap
+
+    def prefix_codes(self, prefix):
+        """Return the event name codes with a word starting with prefix."""
+        codes = set()
+        position = bisect_left(self.sorted_tokens, prefix)
+        while position < len(self.sorted_tokens) and self.sorted_tokens[position].startswith(prefix):
+            codes.update(self.token_codes[self.sorted_tokens[position]])
+            position += 1
+        return codes
+
+    def text_codes(self, tokens, candidates=None):
+        """Return the event name codes matching every token as a word prefix.
+
+        With candidates, only those codes are checked, which is how a query is
+        narrowed as more text is typed.
+        """
+        if candidates is not None:
+            return {code for code in candidates
+                    if all(any(word.startswith(token) for word in self.event_tokens[code]) for token in tokens)}
+        codes = None
+        for token in tokens:
+            matched = self.prefix_codes(token)
+            codes = matched if codes is None else codes & matched
+            if not codes:
+                break
+        return codes or set()
+
+    def filter_bitmap(self, currencies=None, zones=None, min_importance=None):
+        """Return the bitmap of rows matching the categorical conditions, or None if there are none."""
+        bitmap = None
+        for field, wanted in (('currency', currencies), ('zone', zones)):
+            if wanted is None:
+                continue
+            codes = [self.code_of[field][value] for value in wanted if value in self.code_of[field]]
+            matched = self.bitmap(self.postings[field][code] for code in codes)
+            bitmap = matched if bitmap is None else bitmap & matched
+        if min_importance is not None:
+            matched = self.bitmap(self.importance_postings[IMPORTANCE_CODES[min_importance]:])
+            bitmap = matched if bitmap is None else bitmap & matched
+        return bitmap
+
+    def search(self, text='', currencies=None, zones=None, min_importance=None):
+        """Return the ascending row indexes matching the text and every given filter."""
+        text = (text or '').lower()
+        tokens = tokenize(text)
+        filters = (frozenset(currencies) if currencies is not None else None,
+                   frozenset(zones) if zones is not None else None, min_importance)
+
+        last = self.last
+        if last is not None and tokens and last[2] is not None and last[1] == filters and text.startswith(last[0]):
+            # The new text only narrows the previous query, so only its matches are checked
+            codes = self.text_codes(tokens, candidates=last[2])
+            previous_rows = last[3]
+            rows = previous_rows[np.isin(self.table.codes['event'][previous_rows], list(codes))]
+        else:
+            bitmap = self.filter_bitmap(currencies, zones, min_importance)
+            codes = None
+            if tokens:
+                codes = self.text_codes(tokens)
+                matched = self.bitmap(self.postings['event'][code] for code in codes)
+                bitmap = matched if bitmap is None else bitmap & matched
+            rows = np.arange(len(self)) if bitmap is None else np.flatnonzero(bitmap)
+
+        self.last = (text, filters, codes if tokens else None, rows)
+        return rows
+
+    def filter_table(self, **conditions):
+        """Return the EventTable rows matching the conditions accepted by search()."""
+        return self.table.take(self.search(**conditions))
+
+
+def benchmark(num_events=100000):
+    """Time index builds and keystroke-by-keystroke searches against scanning record dicts."""
+    import json
+    import os
+    import random
+    import timeit
+    from utils.event_table import EventTable
+
+    with open(os.path.join(os.path.dirname(__file__), 'cache.json'), 'r') as f:
+        sample = json.load(f)["data"]
+    records = []
+    for i in range(num_events):
+        record = dict(random.choice(sample))
+        record['id'] = str(i)
+        records.append(record)
+    table = EventTable.from_records(records)
+
+    build = timeit.timeit(lambda: EventIndex(table), number=3) / 3
+    index = EventIndex(table)
+    print(f"{num_events} events, {len(index.sorted_tokens)} distinct words: index build {build * 1000:.1f} ms")
+
+    # Pick a multi-word name from the data and type it one character at a time
+    name = max(table.categories['event'], key=lambda event: len(tokenize(event)))
+    typed = [name[:length] for length in range(1, len(name) + 1)]
+    filters = dict(currencies={'USD', 'EUR'}, min_importance='medium')
+
+    def scan(text):
+        text = text.lower()
+        return [record for record in records
+                if record['currency'] in filters['currencies']
+                and IMPORTANCE_CODES.get(record['importance'], 0) >= IMPORTANCE_CODES['medium']
+                and all(any(word.startswith(token) for word in tokenize(record['event'])) for token in tokenize(text))]
+
+    def fresh(text):
+        index.last = None
+        return index.search(text, **filters)
+
+    def incremental():
+        index.last = None
+        return [index.search(text, **filters) for text in typed]
+
+    for text, rows in zip(typed, incremental()):
+        assert len(rows) == len(scan(text)), text
+    scanned = timeit.timeit(lambda: [scan(text) for text in typed[:5]], number=1) / 5
+    indexed = timeit.timeit(lambda: [fresh(text) for text in typed], number=3) / (3 * len(typed))
+    narrowed = timeit.timeit(incremental, number=3) / (3 * len(typed))
+    only_filters = timeit.timeit(lambda: fresh(''), number=20) / 20
+
+    print(f"Typing {name!r} with currency and importance filters, per keystroke:")
+    print(f"  Scanning dicts:        {scanned * 1000:.2f} ms")
+    print(f"  Indexed, from scratch: {indexed * 1000:.3f} ms")
+    print(f"  Indexed, incremental:  {narrowed * 1000:.3f} ms")
+    print(f"Currency and importance filters alone: {only_filters * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
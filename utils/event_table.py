@@ -0,0 +1,247 @@
+import sys
+from datetime import datetime, date
+
+import numpy as np
+from utils.value_parser import parse_values
+
+# Importance levels as stored in the uint8 importance column
+IMPORTANCE_CODES = {None: 0, 'low': 1, 'medium': 2, 'high': 3}
+IMPORTANCE_LABELS = [None, 'low', 'medium', 'high']
+
+# Text columns stored as categorical codes into a per-table list of categories
+CATEGORICAL_FIELDS = ['time', 'zone', 'currency', 'event', 'actual', 'forecast', 'previous']
+VALUE_FIELDS = ['actual', 'forecast', 'previous']
+RECORD_FIELDS = ['id', 'date', 'time', 'zone', 'currency', 'importance', 'event', 'actual', 'forecast', 'previous']
+
+# Separates the strings of a packed string block; calendar text never contains it
+STRING_SEPARATOR = '\0'
+
+
+def encode(values):
+    """Encode a sequence of strings (or None) as (int32 codes, categories); None becomes -1."""
+    categories = []
+    lookup = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+            continue
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(categories)
+            categories.append(value)
+        codes[i] = code
+    return codes, categories
+
+
+def pack_strings(values):
+    """Pack strings (or None) into one UTF-8 block; None is stored as an empty string."""
+    text = STRING_SEPARATOR.join(['' if value is None else value for value in values])
+    if text.count(STRING_SEPARATOR) != max(len(values) - 1, 0):
+        raise ValueError("strings in a packed block must not contain NUL characters")
+    return text.encode('utf-8')
+
+
+def unpack_strings(block, count):
+    """Return the count strings of a block made by pack_strings."""
+    if count == 0:
+        return []
+    return block.decode('utf-8').split(STRING_SEPARATOR)
+
+
+class EventTable:
+    """Compact column-oriented table of calendar events backed by numpy arrays.
+
+    Dates are int64 ordinal days, importance is a uint8 code, text fields are
+    categorical codes, and actual/forecast/previous are also parsed to float64
+    with a boolean mask marking missing values.
+    """
+    def __init__(self, ids, days, importance, codes, categories, values, missing):
+        self.ids = ids                # object array of investpy ids
+        self.days = days              # int64 ordinal days
+        self.importance = importance  # uint8 importance codes
+        self.codes = codes            # field -> int32 codes (-1 for missing)
+        self.categories = categories  # field -> list of distinct strings
+        self.values = values          # field -> float64 parsed numbers
+        self.missing = missing        # field -> bool mask of missing numbers
+
+    @classmethod
+    def empty(cls):
+        return cls.from_records([])
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a table from a list of investpy record dicts."""
+        records = list(records)
+        ids = np.array([record['id'] for record in records], dtype=object)
+        parsed_days = {}
+        days = np.empty(len(records), dtype=np.int64)
+        for i, record in enumerate(records):
+            day = parsed_days.get(record['date'])
+            if day is None:
+                day = parsed_days[record['date']] = datetime.strptime(record['date'], '%d/%m/%Y').toordinal()
+            days[i] = day
+        importance = np.array([IMPORTANCE_CODES.get(record.get('importance'), 0) for record in records],
+                              dtype=np.uint8)
+
+        codes, categories = {}, {}
+        for field in CATEGORICAL_FIELDS:
+            codes[field], categories[field] = encode([record.get(field) for record in records])
+
+        values, missing = {}, {}
+        for field in VALUE_FIELDS:
+            # Parse each distinct string once, then gather by code
+            parsed = np.append(parse_values(categories[field]), np.nan)
+            values[field] = parsed[codes[field]]  # Code -1 picks the trailing NaN
+            missing[field] = np.isnan(values[field])
+        return cls(ids, days, importance, codes, categories, values, missing)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Build a table from the DataFrame returned by investpy.economic_calendar."""
+        frame = frame.where(frame.notna(), None)
+        return cls.from_records(frame.to_dict(orient='records'))
+
+    @classmethod
+    def from_buffers(cls, buffers):
+        """Rebuild a table from the buffers returned by to_buffers()."""
+        ids = np.array(unpack_strings(buffers['ids'], buffers['count']), dtype=object)
+        categories = {field: unpack_strings(block, size) for field, (block, size) in buffers['categories'].items()}
+        values = buffers['values']
+        missing = {field: np.isnan(values[field]) for field in VALUE_FIELDS}
+        return cls(ids, buffers['days'], buffers['importance'], buffers['codes'], categories, values, missing)
+
+    def to_buffers(self):
+        """Return the table as fixed-width numpy arrays and packed string blocks.
+
+        Pickling these is a handful of memory copies instead of one object per
+        string, which is what makes handing tables between processes cheap.
+        """
+        return {
+            'count': len(self),
+            'ids': pack_strings(self.ids.tolist()),
+            'days': self.days,
+            'importance': self.importance,
+            'codes': dict(self.codes),
+            'categories': {field: (pack_strings(values), len(values)) for field, values in self.categories.items()},
+            'values': dict(self.values),
+        }
+
+    @classmethod
+    def concat(cls, tables):
+        """Concatenate tables, re-encoding categorical columns into shared categories."""
+        records = []
+        for table in tables:
+            records.extend(table.to_records())
+        return cls.from_records(records)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, field):
+        """Return a field as an object array of display values (strings or None)."""
+        if field == 'id':
+            return self.ids
+        if field == 'date':
+            # Format each distinct day once
+            days, positions = np.unique(self.days, return_inverse=True)
+            labels = np.array([date.fromordinal(day).strftime('%d/%m/%Y') for day in days.tolist()], dtype=object)
+            return labels[positions]
+        if field == 'importance':
+            return np.array(IMPORTANCE_LABELS, dtype=object)[self.importance]
+        lookup = np.array(self.categories[field] + [None], dtype=object)
+        return lookup[self.codes[field]]
+
+    def to_records(self):
+        """Convert back to the list-of-dicts representation used by investpy."""
+        columns = [self.column(field) for field in RECORD_FIELDS]
+        return [dict(zip(RECORD_FIELDS, row)) for row in zip(*columns)]
+
+    def take(self, indices):
+        """Return a new table with the rows at the given indexes (or boolean mask)."""
+        return EventTable(
+            self.ids[indices], self.days[indices], self.importance[indices],
+            {field: codes[indices] for field, codes in self.codes.items()},
+            self.categories,
+            {field: values[indices] for field, values in self.values.items()},
+            {field: missing[indices] for field, missing in self.missing.items()},
+        )
+
+    def mask(self, start_day=None, end_day=None, currencies=None, zones=None, min_importance=None):
+        """Return a boolean mask of rows matching all given conditions."""
+        mask = np.ones(len(self), dtype=bool)
+        if start_day is not None:
+            mask &= self.days >= start_day
+        if end_day is not None:
+            mask &= self.days <= end_day
+        if currencies is not None:
+            mask &= self.category_mask('currency', currencies)
+        if zones is not None:
+            mask &= self.category_mask('zone', zones)
+        if min_importance is not None:
+            mask &= self.importance >= IMPORTANCE_CODES[min_importance]
+        return mask
+
+    def category_mask(self, field, wanted):
+        """Return a mask of rows whose categorical field is one of the wanted values."""
+        wanted_codes = [code for code, value in enumerate(self.categories[field]) if value in wanted]
+        return np.isin(self.codes[field], wanted_codes)
+
+    def filter(self, **conditions):
+        """Return the rows matching the conditions accepted by mask()."""
+        return self.take(self.mask(**conditions))
+
+    def sort(self):
+        """Return the table sorted by date, then time."""
+        # Categories are in first-seen order, so sort times by their string rank
+        time_rank = np.argsort(np.argsort(np.array(self.categories['time'] + [''], dtype=object)))
+        order = np.lexsort((time_rank[self.codes['time']], self.days))
+        return self.take(order)
+
+    def memory_bytes(self):
+        """Return the approximate memory used by the arrays and category lists."""
+        total = self.ids.nbytes + sum(sys.getsizeof(value) for value in self.ids)
+        total += self.days.nbytes + self.importance.nbytes
+        for field in CATEGORICAL_FIELDS:
+            total += self.codes[field].nbytes + sum(sys.getsizeof(value) for value in self.categories[field])
+        for field in VALUE_FIELDS:
+            total += self.values[field].nbytes + self.missing[field].nbytes
+        return total
+
+
+def records_memory_bytes(records):
+    """Return the approximate memory used by a list of record dicts."""
+    total = sys.getsizeof(records)
+    for record in records:
+        total += sys.getsizeof(record)
+        total += sum(sys.getsizeof(value) for value in record.values())
+    return total
+
+
+# Example usage
+if __name__ == "__main__":
+    import json
+    import os
+    import random
+    import timeit
+
+    cache_file = os.path.join(os.path.dirname(__file__), 'cache.json')
+    with open(cache_file, 'r') as f:
+        sample = json.load(f)["data"]
+
+    # Blow the cached sample up to a long history with distinct string objects per record
+    records = []
+    for i in range(100000):
+        record = json.loads(json.dumps(random.choice(sample)))
+        record['id'] = str(i)
+        records.append(record)
+
+    table = EventTable.from_records(records)
+    print(f"{len(records)} events: dicts {records_memory_bytes(records) / 1e6:.1f} MB, "
+          f"EventTable {table.memory_bytes() / 1e6:.1f} MB")
+
+    dict_filter = timeit.timeit(
+        lambda: [r for r in records if r['currency'] in ('USD', 'EUR') and r['importance'] == 'high'], number=5) / 5
+    table_filter = timeit.timeit(
+        lambda: table.filter(currencies=('USD', 'EUR'), min_importance='high'), number=5) / 5
+    print(f"Filter USD/EUR high: dicts {dict_filter * 1000:.1f} ms, EventTable {table_filter * 1000:.1f} ms")
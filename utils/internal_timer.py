@@ -1,51 +1,224 @@
+import heapq
+import itertools
+import logging
+import math
 import threading
 import time
-from datetime import datetime
-import pytz
+from datetime import datetime, timezone
+
+logger = logging.getLogger(f"BullionBell.{__name__}")
+
+
+class WallClock:
+    """Real clock; the tick service only talks to time through this interface."""
+    def time(self):
+        return time.time()
+
+    def wait(self, condition, timeout):
+        """Wait on a held condition for up to timeout seconds (None waits forever)."""
+        condition.wait(timeout)
+
+
+class ManualClock:
+    """Clock for tests: waiting advances time instantly instead of sleeping."""
+    def __init__(self, start=0.0):
+        self.current = start
+
+    def time(self):
+        return self.current
+
+    def wait(self, condition, timeout):
+        if timeout is None:
+            condition.wait(0.01)  # Nothing scheduled; yield so subscribe/stop can get in
+        else:
+            self.current += timeout
+
+
+class Tick:
+    """One tick shared by every subscriber due at the same moment.
+
+    The datetime and formatted strings are only computed if a subscriber asks,
+    and each format is computed once per tick however many subscribers use it.
+    A timezone of None means the local timezone, with the UTC offset in effect
+    at the tick's own moment.
+    """
+    def __init__(self, epoch, timezone):
+        self.epoch = epoch
+        self.timezone = timezone
+        self._datetime = None
+        self._formatted = {}
+
+    @property
+    def datetime(self):
+        if self._datetime is None:
+            self._datetime = datetime.fromtimestamp(self.epoch, timezone.utc).astimezone(self.timezone)
+        return self._datetime
+
+    def format(self, fmt='%Y-%m-%d %H:%M:%S %Z%z'):
+        text = self._formatted.get(fmt)
+        if text is None:
+            text = self._formatted[fmt] = self.datetime.strftime(fmt)
+        return text
+
 
 class InternalTimer:
-    def __init__(self):
+    def __init__(self, clock=None):
         self.is_running = False
-        self.current_time = None
+        self.clock = clock or WallClock()
         self.timezone = self.detect_timezone()
-        self.interval = 1  # Update interval in seconds
+        self.subscribers = []  # Min-heap of (next due epoch, sequence, subscription)
+        self.condition = threading.Condition()
+        self.counter = itertools.count()
+        self.thread = None
+        self.core = None  # AsyncCore the timer runs on instead of its own thread
+        self.wakeup = None
 
     def detect_timezone(self):
-        """Detect and return the user's current timezone."""
-        # Detect the local timezone
-        local_timezone = pytz.timezone('UTC')  # Default to UTC if detection fails
+        """Return None to use the local timezone, or UTC if it cannot be determined.
+
+        The local offset is looked up for each moment rather than captured here,
+        so times stay right across DST changes in a long-running app.
+        """
         try:
-            local_timezone = pytz.timezone(pytz.localize(datetime.now()).tzinfo.zone)
+            datetime.now().astimezone()
+            return None
         except Exception as e:
-            print(f"Timezone detection failed. Defaulting to UTC. Error: {e}")
-        return local_timezone
+            logger.warning("Timezone detection failed. Defaulting to UTC. Error: %s", e)
+            return timezone.utc
 
-    def start(self):
-        """Start the internal clock timer."""
+    def next_boundary(self, now, resolution):
+        """Return the first multiple of resolution seconds strictly after now."""
+        return (math.floor(now / resolution) + 1) * resolution
+
+    def subscribe(self, callback, resolution=1):
+        """Call callback(tick) on every resolution-second wall-clock boundary.
+
+        Returns a subscription dict that can be passed to unsubscribe().
+        """
+        subscription = {'callback': callback, 'resolution': resolution, 'active': True}
+        with self.condition:
+            due = self.next_boundary(self.clock.time(), resolution)
+            heapq.heappush(self.subscribers, (due, next(self.counter), subscription))
+            self.notify()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop a subscription; it is dropped lazily from the schedule."""
+        with self.condition:
+            subscription['active'] = False
+            self.notify()
+
+    def notify(self):
+        """Wake the scheduler, whether it is a thread or a task; call with the condition held."""
+        self.condition.notify()
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def start(self, core=None):
+        """Start driving every subscriber, as a task on core or on a single timer thread."""
         self.is_running = True
-        self.thread = threading.Thread(target=self.run)
+        if core is not None:
+            self.core = core
+            self.wakeup = core.wakeup()
+            core.spawn(self.run_async())
+            return
+        self.thread = threading.Thread(target=self.run, daemon=True)
         self.thread.start()
 
     def stop(self):
-        """Stop the internal clock timer."""
-        self.is_running = False
-        if self.thread.is_alive():
+        """Stop the timer thread or task."""
+        with self.condition:
+            self.is_running = False
+            self.notify()
+        if self.thread is not None and self.thread.is_alive():
             self.thread.join()
 
+    def collect_due(self):
+        """Return (tick, subscriptions) if subscribers are due, else the seconds to wait (None = no subscribers).
+
+        Call with the condition held.
+        """
+        while self.subscribers and not self.subscribers[0][2]['active']:
+            heapq.heappop(self.subscribers)
+        if not self.subscribers:
+            return None
+
+        now = self.clock.time()
+        due, _, first = self.subscribers[0]
+        if due > now:
+            return due - now
+
+        # Everyone due by now shares one tick. After a suspend or a stall the missed
+        # boundaries are skipped: the tick is the latest one, and the schedule resumes from now.
+        resolution = first['resolution']
+        epoch = max(due, math.floor(now / resolution) * resolution)
+        fired = []
+        while self.subscribers and self.subscribers[0][0] <= now:
+            _, _, subscription = heapq.heappop(self.subscribers)
+            if subscription['active']:
+                fired.append(subscription)
+                next_at = self.next_boundary(now, subscription['resolution'])
+                heapq.heappush(self.subscribers, (next_at, next(self.counter), subscription))
+        return Tick(epoch, self.timezone), fired
+
+    def next_due(self):
+        """Block until subscribers are due; return (tick, subscriptions) or None once stopped."""
+        with self.condition:
+            while self.is_running:
+                due = self.collect_due()
+                if isinstance(due, tuple):
+                    return due
+                self.clock.wait(self.condition, due)
+            return None
+
+    def fire(self, tick, fired):
+        for subscription in fired:
+            try:
+                subscription['callback'](tick)
+            except Exception:
+                logger.exception("Error in timer subscriber")
+
     def run(self):
         """Main loop for the internal clock."""
+        while True:
+            due = self.next_due()
+            if due is None:
+                break
+            self.fire(*due)
+
+    async def run_async(self):
+        """Main loop for the internal clock as a task on an AsyncCore."""
         while self.is_running:
-            self.current_time = datetime.now(self.timezone)
-            print(f"Internal Time: {self.current_time.strftime('%Y-%m-%d %H:%M:%S %Z%z')}")
-            time.sleep(self.interval)
+            with self.condition:
+                due = self.collect_due()
+            if isinstance(due, tuple):
+                self.fire(*due)
+            else:
+                await self.wakeup.wait(due)
 
     def get_current_time(self):
         """Return the current time as a datetime object."""
-        return self.current_time
+        return datetime.fromtimestamp(self.clock.time(), timezone.utc).astimezone(self.timezone)
 
 # Example usage
 if __name__ == "__main__":
+    # Simulated minute: a per-second clock and a per-15-second countdown share one timer
+    clock = ManualClock(start=1727740800.4)
+    timer = InternalTimer(clock)
+    ticks = {'clock': [], 'countdown': []}
+    timer.subscribe(lambda tick: ticks['clock'].append(tick.format('%H:%M:%S')), resolution=1)
+    timer.subscribe(lambda tick: ticks['countdown'].append(tick.epoch), resolution=15)
+    timer.is_running = True
+    for _ in range(64):
+        due = timer.next_due()
+        for subscription in due[1]:
+            subscription['callback'](due[0])
+    print(f"Clock ticks: {len(ticks['clock'])}, first {ticks['clock'][0]}, last {ticks['clock'][-1]}")
+    print(f"Countdown ticks on 15 s boundaries: {[epoch % 15 for epoch in ticks['countdown']]}")
+
+    # Real clock for a few seconds
     timer = InternalTimer()
+    timer.subscribe(lambda tick: print(f"Internal Time: {tick.format()}"))
     timer.start()
-    time.sleep(10)  # Let it run for 10 seconds
+    time.sleep(3)
     timer.stop()
@@ -1,19 +1,186 @@
+import atexit
+import configparser
 import logging
+import logging.handlers
+import os
+import queue
+import threading
 
-def setup_logging():
-    # Create a custom logger
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None  # QueueListener writing log records on its own thread
+_queue_handler = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats every record before queueing it, which would put
+    the cost of building messages back on the thread that logs, usually the UI
+    thread. Arguments are therefore formatted later and must not be mutated
+    after logging; pass summarize(data) rather than live payloads.
+    """
+    def prepare(self, record):
+        return record
+
+
+class SampleFilter(logging.Filter):
+    """Let through only every Nth DEBUG record from the same call site.
+
+    Chatty per-chunk and per-row messages stay visible without flooding the
+    log; a kept record notes how many similar ones were dropped before it.
+    Records are filtered on whichever thread logs them, so the counts are
+    kept under a lock, and only the max_sites most recently seen call sites
+    are tracked.
+    """
+    def __init__(self, every=10, max_sites=1024):
+        super().__init__()
+        self.every = every
+        self.max_sites = max_sites
+        self.counts = {}  # (path, line) -> records seen, least recently seen first
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            count = self.counts.pop(key, 0)
+            self.counts[key] = count + 1
+            if len(self.counts) > self.max_sites:
+                del self.counts[next(iter(self.counts))]
+        if count % self.every:
+            return False
+        if count:
+            record.msg = f"{record.msg} [{self.every - 1} similar suppressed]"
+        return True
+
+
+class PayloadSummary:
+    """Log-friendly stand-in for a large payload: its type, size and first few ids.
+
+    Everything is captured when the summary is made, in O(max_ids), so the
+    payload can change or be freed before the message is formatted.
+    """
+    def __init__(self, data, max_ids=5):
+        self.kind = type(data).__name__
+        self.count = len(data) if hasattr(data, '__len__') else None
+        ids = []
+        if hasattr(data, 'ids'):  # EventTable
+            ids = data.ids[:max_ids]
+        elif hasattr(data, 'columns') and 'id' in data.columns:  # DataFrame
+            ids = data['id'].iloc[:max_ids]
+        elif isinstance(data, list):
+            ids = [record.get('id') for record in data[:max_ids] if isinstance(record, dict)]
+        self.ids = [str(record_id) for record_id in ids]
+
+    def __str__(self):
+        text = self.kind if self.count is None else f"{self.count} rows ({self.kind})"
+        if self.ids:
+            more = ', ...' if self.count is not None and self.count > len(self.ids) else ''
+            text += f", ids {', '.join(self.ids)}{more}"
+        return text
+
+
+def summarize(data, max_ids=5):
+    """Return a PayloadSummary to log in place of data."""
+    return PayloadSummary(data, max_ids)
+
+
+def read_logging_config(path=DEFAULT_CONFIG, section='logging'):
+    """Return the [logging] options from config.ini, with defaults for missing ones."""
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    options = parser[section] if parser.has_section(section) else {}
+    return {
+        'level': options.get('level', 'DEBUG').upper(),
+        'max_bytes': int(options.get('max_bytes', 5 * 1024 * 1024)),
+        'backup_count': int(options.get('backup_count', 3)),
+        'sample_debug_every': int(options.get('sample_debug_every', 10)),
+    }
+
+
+def setup_logging(log_file='BullionBell.log', config_path=DEFAULT_CONFIG):
+    """Log to a rotating file through a queue, so file I/O happens on a listener thread."""
+    global _listener, _queue_handler
     logger = logging.getLogger('BullionBell')
-    logger.setLevel(logging.DEBUG)  # Set the base level of logging
+    if _listener is not None:
+        return logger
+    options = read_logging_config(config_path)
+    logger.setLevel(options['level'])  # Set the base level of logging
+
+    # Start every run with a fresh file, keeping the previous runs as backups
+    f_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=options['max_bytes'], backupCount=options['backup_count'], delay=True)
+    if os.path.exists(log_file) and os.path.getsize(log_file):
+        f_handler.doRollover()
+    f_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    # Loggers only enqueue records; the listener formats and writes them
+    log_queue = queue.SimpleQueue()
+    _queue_handler = DeferredQueueHandler(log_queue)
+    _queue_handler.addFilter(SampleFilter(options['sample_debug_every']))
+    logger.addHandler(_queue_handler)
+    _listener = logging.handlers.QueueListener(log_queue, f_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    return logger
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger('BullionBell').removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = _queue_handler = None
+
+
+def benchmark(num_rows=5000, repeats=20):
+    """Measure logging time on the calling thread for a fetched chunk, before and after."""
+    import tempfile
+    import time
+    from utils.event_table import EventTable
+    from utils.value_parser import synthetic_calendar
+
+    records = synthetic_calendar(days=num_rows // 80 + 1)[:num_rows]
+    table = EventTable.from_records(records)
+
+    def time_calls(logger, log):
+        started = time.perf_counter()
+        for _ in range(repeats):
+            log(logger)
+        return (time.perf_counter() - started) / repeats
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Before: synchronous FileHandler and the whole payload formatted into the message
+        old_logger = logging.getLogger('benchmark.sync')
+        old_logger.propagate = False
+        old_logger.setLevel(logging.DEBUG)
+        handler = logging.FileHandler(os.path.join(directory, 'sync.log'), mode='w')
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        old_logger.addHandler(handler)
+        before = time_calls(old_logger, lambda logger: logger.info(f"Data received: {records}"))
+        small_before = time_calls(old_logger, lambda logger: [logger.info("Row %d", i) for i in range(1000)])
+        handler.close()
 
-    # Create handlers with 'w' mode to overwrite the old file
-    f_handler = logging.FileHandler('BullionBell.log', mode='w')  # Open the file in write mode
-    f_handler.setLevel(logging.DEBUG)
+        # After: queued records, deferred formatting and a summary of the payload
+        new_logger = setup_logging(os.path.join(directory, 'queued.log'))
+        after = time_calls(new_logger, lambda logger: logger.info("Data received: %s", summarize(table)))
+        small_after = time_calls(new_logger, lambda logger: [logger.info("Row %d", i) for i in range(1000)])
+        stop_logging()
+        with open(os.path.join(directory, 'queued.log')) as f:
+            print(f"Logged line: {f.readline().strip()}")
 
-    # Create formatter and add it to the handler
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    f_handler.setFormatter(formatter)
+    print(f"{num_rows}-row fetch, UI-thread time per chunk log: "
+          f"{before * 1000:.2f} ms before, {after * 1000:.3f} ms after ({before / after:.0f}x less)")
+    print(f"1000 small messages: {small_before * 1000:.2f} ms synchronous, {small_after * 1000:.2f} ms queued")
 
-    # Add handler to the logger
-    logger.addHandler(f_handler)
 
-    return logger
\ No newline at end of file
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,100 @@
+from bisect import bisect_left
+
+
+def longest_increasing_run(positions):
+    """Return the set of indexes forming a longest increasing subsequence of positions."""
+    tails = []  # tails[k] = index of the smallest tail of an increasing run of length k + 1
+    tail_values = []
+    previous = [-1] * len(positions)
+    for i, pos in enumerate(positions):
+        k = bisect_left(tail_values, pos)
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(pos)
+        else:
+            tails[k] = i
+            tail_values[k] = pos
+        previous[i] = tails[k - 1] if k > 0 else -1
+
+    keep = set()
+    i = tails[-1] if tails else -1
+    while i != -1:
+        keep.add(i)
+        i = previous[i]
+    return keep
+
+
+def diff_records(old_records, new_records, key='id'):
+    """Compute the operations that turn old_records into new_records.
+
+    Returns a dict with:
+      'deletes': old row indexes to remove, in descending order
+      'inserts': (new row index, record) pairs, in ascending order
+      'updates': (new row index, record, changed field names) for rows kept in place
+
+    Applying the deletes, then the inserts, then the updates yields new_records.
+    Rows that moved are expressed as a delete plus an insert; the rows kept are
+    the longest run already in the right relative order.
+    """
+    old_index = {record[key]: i for i, record in enumerate(old_records)}
+    new_ids = {record[key] for record in new_records}
+
+    # New rows that already exist, paired with their old position
+    common = [(j, old_index[record[key]]) for j, record in enumerate(new_records) if record[key] in old_index]
+    keep = longest_increasing_run([old_pos for _, old_pos in common])
+    kept_old = {common[i][1]: common[i][0] for i in keep}
+
+    deletes = [i for i in range(len(old_records) - 1, -1, -1)
+               if old_records[i][key] not in new_ids or i not in kept_old]
+    inserts = []
+    updates = []
+    kept_new = set(kept_old.values())
+    for j, record in enumerate(new_records):
+        if j not in kept_new:
+            inserts.append((j, record))
+            continue
+        old_record = old_records[old_index[record[key]]]
+        changed = [field for field in record if old_record.get(field) != record[field]]
+        if changed:
+            updates.append((j, record, changed))
+    return {'deletes': deletes, 'inserts': inserts, 'updates': updates}
+
+
+def apply_diff(records, diff):
+    """Apply a diff to a list of records in place (used to check the diff is complete)."""
+    for i in diff['deletes']:
+        del records[i]
+    for j, record in diff['inserts']:
+        records.insert(j, record)
+    for j, record, _ in diff['updates']:
+        records[j] = record
+    return records
+
+
+def benchmark(num_rows=5000, num_changes=25):
+    """Time the keyed diff and compare cells touched against a full redraw."""
+    import random
+    import timeit
+
+    fields = ['date', 'time', 'zone', 'currency', 'importance', 'event', 'actual', 'forecast', 'previous']
+    old = [dict({'id': str(i)}, **{field: f"{field}{i}" for field in fields}) for i in range(num_rows)]
+    new = [dict(record) for record in old]
+    for record in random.sample(new, num_changes):
+        record['actual'] = '1.0%'
+    for i in sorted(random.sample(range(num_rows), 5), reverse=True):
+        del new[i]
+    for _ in range(5):
+        new.insert(random.randrange(len(new)), dict(old[0], id=f"new{random.random()}"))
+
+    diff = diff_records(old, new)
+    assert apply_diff(list(old), diff) == new
+
+    diff_time = timeit.timeit(lambda: diff_records(old, new), number=10) / 10
+    cells = len(diff['inserts']) * len(fields) + sum(len(changed) for _, _, changed in diff['updates'])
+    print(f"{num_rows} rows: diff {diff_time * 1000:.2f} ms -> {len(diff['deletes'])} deletes, "
+          f"{len(diff['inserts'])} inserts, {len(diff['updates'])} updates ({cells} cells touched)")
+    print(f"Full redraw: {len(new) * len(fields)} cells touched")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,47 @@
+import builtins
+import sys
+import time
+
+
+class StartupProfiler:
+    def __init__(self):
+        """Initialize the profiler; times are measured from construction."""
+        self.start_time = time.perf_counter()
+        self.imports = {}  # Top-level module name -> seconds spent importing it (inclusive)
+        self.marks = []    # (label, seconds since start) milestones such as the first frame
+        self.original_import = None
+
+    def install(self):
+        """Start timing first-time imports of top-level modules."""
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.timed_import
+
+    def uninstall(self):
+        """Stop timing imports."""
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        root = name.partition('.')[0]
+        if level or root in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        started = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.imports[root] = self.imports.get(root, 0.0) + time.perf_counter() - started
+
+    def mark(self, label):
+        """Record a startup milestone."""
+        self.marks.append((label, time.perf_counter() - self.start_time))
+
+    def report(self, limit=20):
+        """Return a text report of milestones and the slowest imports."""
+        lines = ["Startup profile:"]
+        for label, elapsed in self.marks:
+            lines.append(f"  {label:<30} {elapsed * 1000:8.1f} ms")
+        lines.append("Slowest imports (inclusive):")
+        for name, elapsed in sorted(self.imports.items(), key=lambda item: item[1], reverse=True)[:limit]:
+            lines.append(f"  {name:<30} {elapsed * 1000:8.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,213 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Multipliers for the suffixes investpy uses on values ("250K", "7,080B", "3.142T")
+VALUE_SUFFIXES = {'': 1.0, '%': 1.0, 'K': 1e3, 'M': 1e6, 'B': 1e9, 'T': 1e12}
+
+# Trailing reference period on event names, e.g. "CPI (MoM)  (Sep)" or "GDP (QoQ)  (Q3)"
+PERIOD_PATTERN = r'\s*\((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec|Q[1-4]|H[12])\)\s*$'
+
+
+def parse_values(values):
+    """Parse calendar value strings ("1.2%", "250K", "-0.3B") into a float64 array.
+
+    Works on whole columns with pandas string operations, parsing each distinct
+    string once; anything that is not a number with an optional unit suffix
+    becomes NaN.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    text = pd.Series(uniques, dtype=object).astype(str).str.replace(',', '', regex=False).str.strip()
+    parts = text.str.extract(r'^([-+]?\d*\.?\d+)\s*([KMBT%]?)$', flags=re.IGNORECASE, expand=True)
+    numbers = pd.to_numeric(parts[0], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    multipliers = parts[1].fillna('').str.upper().map(VALUE_SUFFIXES).to_numpy(dtype=np.float64, na_value=1.0)
+    # Missing values have code -1, which picks the trailing NaN
+    parsed = np.append(numbers * multipliers, np.nan)
+    return parsed[codes]
+
+
+def format_surprise(surprise, surprise_z=np.nan):
+    """Format a surprise for display: the difference with a unit suffix, then the standardized surprise."""
+    if surprise is None or np.isnan(surprise):
+        return ''
+    for suffix in ('T', 'B', 'M', 'K', ''):
+        if abs(surprise) >= VALUE_SUFFIXES[suffix]:
+            break
+    text = f"{surprise / VALUE_SUFFIXES[suffix]:+.3g}{suffix}"
+    if not np.isnan(surprise_z):
+        text += f" ({surprise_z:+.1f}\u03c3)"
+    return text
+
+
+def base_event_names(names):
+    """Strip the reference period from event names so monthly releases share a history."""
+    return pd.Series(names, dtype=object).astype('string').str.replace(PERIOD_PATTERN, '', regex=True).str.strip()
+
+
+class ValueAnalyzer:
+    """Derives surprise columns for an EventTable, memoized per event id.
+
+    Parsed actual/forecast values and the surprise are kept per id together with
+    the raw strings they came from, so repeated renders only parse rows that are
+    new or whose values changed.
+    """
+    def __init__(self):
+        self.memo = {}  # id -> (raw actual, raw forecast, parsed actual, parsed forecast)
+
+    def parse(self, table):
+        """Return the parsed actual and forecast columns of a table, parsing only rows not in the memo."""
+        raw_actual = table.column('actual')
+        raw_forecast = table.column('forecast')
+        actual = np.empty(len(table), dtype=np.float64)
+        forecast = np.empty(len(table), dtype=np.float64)
+
+        stale = []
+        for i, event_id in enumerate(table.ids):
+            cached = self.memo.get(event_id)
+            if cached is not None and cached[0] == raw_actual[i] and cached[1] == raw_forecast[i]:
+                actual[i], forecast[i] = cached[2], cached[3]
+            else:
+                stale.append(i)
+
+        if stale:
+            # Parse every stale cell in one vectorized pass
+            stale = np.array(stale)
+            parsed = parse_values(np.concatenate([raw_actual[stale], raw_forecast[stale]]))
+            actual[stale], forecast[stale] = parsed[:len(stale)], parsed[len(stale):]
+            for i in stale:
+                self.memo[table.ids[i]] = (raw_actual[i], raw_forecast[i], actual[i], forecast[i])
+        return actual, forecast
+
+    def analyze(self, table, history=None):
+        """Return a DataFrame with actual, forecast, surprise and standardized surprise per row.
+
+        history is an optional EventTable of earlier releases, not overlapping the
+        table, that joins the table's rows in setting each event's scale.
+        """
+        actual, forecast = self.parse(table)
+        surprise = actual - forecast
+        history_surprise = None
+        if history is not None:
+            history_actual, history_forecast = self.parse(history)
+            history_surprise = history_actual - history_forecast
+        return pd.DataFrame({
+            'id': table.ids,
+            'actual': actual,
+            'forecast': forecast,
+            'surprise': surprise,
+            'surprise_z': self.standardize(surprise, table, history_surprise, history),
+        })
+
+    def surprises(self, table, history=None):
+        """Return {id: (surprise, standardized surprise)} for the rows with a numeric actual and forecast.
+
+        Memo entries of ids that are in neither table are dropped, so the memo
+        follows the window being displayed and its history.
+        """
+        analysis = self.analyze(table, history)
+        kept = table.ids if history is None else np.concatenate([table.ids, history.ids])
+        self.memo = {event_id: self.memo[event_id] for event_id in kept}
+        known = analysis['surprise'].notna().to_numpy()
+        return dict(zip(analysis['id'][known], zip(analysis['surprise'][known], analysis['surprise_z'][known])))
+
+    @staticmethod
+    def standardize(surprise, table, history_surprise=None, history=None):
+        """Scale each surprise by the standard deviation of its event's other surprises.
+
+        An event's surprises are those of its rows in the table and in history.
+        Each row's own release is left out, so a repeated event is not scaled by
+        itself and a release needs two others to get a score.
+        """
+        tables, surprises = [table], [surprise]
+        if history is not None:
+            tables.append(history)
+            surprises.append(history_surprise)
+        # Map categories to base names once, then group rows by base name code
+        names = [list(t.categories['event']) + [None] for t in tables]
+        codes = pd.factorize(base_event_names([name for block in names for name in block]))[0]
+        unnamed = codes.max() + 1
+        codes = np.where(codes < 0, unnamed, codes)
+        groups, offset = [], 0
+        for t, block in zip(tables, names):
+            groups.append(codes[offset:offset + len(block)][t.codes['event']])
+            offset += len(block)
+
+        pool_groups = np.concatenate(groups)
+        pool = np.concatenate(surprises)
+        known = ~np.isnan(pool)
+        pool_groups, pool = pool_groups[known], pool[known]
+        count = np.bincount(pool_groups, minlength=unnamed + 1)
+        mean = np.bincount(pool_groups, pool, minlength=unnamed + 1) / np.maximum(count, 1)
+        squares = np.bincount(pool_groups, (pool - mean[pool_groups]) ** 2, minlength=unnamed + 1)
+
+        # Take each row's own surprise out of its group's sum of squares
+        group = groups[0]
+        n = count[group]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            others = np.maximum(squares[group] - (surprise - mean[group]) ** 2 * n / (n - 1), 0)
+            std = np.sqrt(others / (n - 2))
+            # Rounding leaves a tiny spread where the other surprises are all equal
+            spread = std > 1e-9 * np.abs(mean[group])
+            return np.where((n > 2) & spread & (group != unnamed), surprise / std, np.nan)
+
+
+def synthetic_calendar(days=182, events_per_day=80):
+    """Build a synthetic six-month calendar of records with realistic value strings."""
+    import random
+    from datetime import date, timedelta
+
+    names = [f"Indicator {i} (MoM)" for i in range(200)]
+    suffixes = ['%', 'K', 'M', 'B', '']
+    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    start = date(2024, 1, 1)
+    records = []
+    for day in range(days):
+        current = start + timedelta(days=day)
+        for i in range(events_per_day):
+            suffix = suffixes[i % len(suffixes)]
+            forecast = round(random.uniform(-5, 5), 1)
+            records.append({
+                'id': f"{day}-{i}", 'date': current.strftime('%d/%m/%Y'), 'time': '14:30',
+                'zone': 'united states', 'currency': 'USD', 'importance': 'high',
+                'event': f"{random.choice(names)}  ({months[current.month - 1]})",
+                'actual': f"{forecast + round(random.gauss(0, 0.4), 1):,}{suffix}" if random.random() < 0.9 else None,
+                'forecast': f"{forecast:,}{suffix}" if random.random() < 0.8 else None,
+                'previous': f"{round(random.uniform(-5, 5), 1):,}{suffix}",
+            })
+    return records
+
+
+def benchmark():
+    """Compare per-cell and vectorized parsing, and cold and memoized analysis."""
+    import timeit
+    from utils.event_table import EventTable
+
+    records = synthetic_calendar()
+    values = [record['actual'] for record in records]
+
+    def parse_cell(text):
+        if text is None:
+            return np.nan
+        text = text.replace(',', '').strip()
+        multiplier = VALUE_SUFFIXES.get(text[-1:].upper(), 1.0)
+        if text[-1:].upper() in VALUE_SUFFIXES:
+            text = text[:-1]
+        try:
+            return float(text) * multiplier
+        except ValueError:
+            return np.nan
+
+    per_cell = timeit.timeit(lambda: [parse_cell(value) for value in values], number=5) / 5
+    vectorized = timeit.timeit(lambda: parse_values(values), number=5) / 5
+    print(f"{len(values)} values: per-cell {per_cell * 1000:.1f} ms, vectorized {vectorized * 1000:.1f} ms")
+
+    table = EventTable.from_records(records)
+    analyzer = ValueAnalyzer()
+    cold = timeit.timeit(lambda: analyzer.analyze(table), number=1)
+    warm = timeit.timeit(lambda: analyzer.analyze(table), number=5) / 5
+    print(f"Surprise analysis: cold {cold * 1000:.1f} ms, memoized {warm * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()